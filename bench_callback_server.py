@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# bench_callback_server.py - Bandingkan throughput Flask handler vs callback_server (ASGI)
+
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from bench_callbacks import BENCH_ENV, duitku_request, tripay_request, xendit_request
+from callback_inbox import InboxRecord
+from callback_replay import RawHttpSender, replay
+
+TOTAL_REQUESTS = int(os.getenv("BENCH_REQUESTS", 3000))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", 100))
+
+GATEWAYS = {
+    "duitku": ("duitku_callback", duitku_request),
+    "tripay": ("tripay_callback", tripay_request),
+    "xendit": ("xendit_webhook", xendit_request),
+}
+
+
+def start_server(argv, port):
+    # Dedup & order store baru per server: run sebelumnya (atau DB asli dari .env) tidak membuat request jadi duplikat
+    state_dir = tempfile.mkdtemp(prefix="bench-callback-server-")
+    env = {
+        **os.environ,
+        **BENCH_ENV,
+        "CALLBACK_DEDUP_PATH": os.path.join(state_dir, "dedup.db"),
+        "ORDER_STORE_PATH": os.path.join(state_dir, "orders.db"),
+    }
+    proc = subprocess.Popen(
+        [sys.executable, *argv],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    proc.state_dir = state_dir
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=0.5)
+            return proc
+        except httpx.TransportError:
+            time.sleep(0.1)
+    stop_server(proc)
+    raise RuntimeError(f"Server di port {port} tidak bisa start")
+
+
+def stop_server(proc):
+    proc.terminate()
+    proc.wait()
+    shutil.rmtree(proc.state_dir, ignore_errors=True)
+
+
+def start_flask(module, port):
+    code = f"import {module} as m; m.app.run(host='127.0.0.1', port={port}, debug=False, threaded=True)"
+    return start_server(["-c", code], port)
+
+
+def start_asgi(port):
+    argv = ["-m", "uvicorn", "callback_server:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    return start_server(argv, port)
+
+
+def make_records(gateway, make_request):
+    """Satu callback unik + signature sendiri per request, supaya yang diukur jalur proses penuh, bukan dedup"""
+    records = []
+    for index in range(1, TOTAL_REQUESTS + 1):
+        path, body, headers = make_request(index)
+        records.append(InboxRecord(gateway, headers, body, 0))
+    return records
+
+
+async def run_load(port, gateway, make_request):
+    records = make_records(gateway, make_request)
+    sender = RawHttpSender(f"http://127.0.0.1:{port}")
+    try:
+        stats = await replay(records, sender.send, TOTAL_REQUESTS, concurrency=CONCURRENCY)
+    finally:
+        await sender.close()
+    return stats["throughput"], stats["p99_ms"], round(stats["error_rate"] * stats["requests"])
+
+
+def report(label, gateway, result):
+    rps, p99_ms, errors = result
+    print(f"{label:<6} {gateway:<7} {rps:>10.0f} req/s   p99 {p99_ms:>8.1f} ms   errors {errors}")
+
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print(f"📊 CALLBACK BENCHMARK ({TOTAL_REQUESTS} requests, concurrency {CONCURRENCY})")
+    print("=" * 70)
+
+    for index, (gateway, (module, make_request)) in enumerate(GATEWAYS.items()):
+        port = 5101 + index
+        proc = start_flask(module, port)
+        try:
+            report("flask", gateway, asyncio.run(run_load(port, gateway, make_request)))
+        finally:
+            stop_server(proc)
+
+    proc = start_asgi(5100)
+    try:
+        for gateway, (module, make_request) in GATEWAYS.items():
+            report("asgi", gateway, asyncio.run(run_load(5100, gateway, make_request)))
+    finally:
+        stop_server(proc)
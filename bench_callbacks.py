@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# bench_callbacks.py - Benchmark per-stage handler callback (parse, verify, process, respond) + baseline JSON
+
+import argparse
+import hashlib
+import hmac
+import importlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+
+BASELINE_FILE = os.getenv("BENCH_BASELINE_FILE", "bench_baseline.json")
+ITERATIONS = int(os.getenv("BENCH_ITERATIONS", 3000))
+# Stage dianggap regresi kalau p50 lebih lambat dari baseline x (1 + toleransi)
+TOLERANCE = float(os.getenv("BENCH_TOLERANCE", 0.25))
+
+BENCH_ENV = {
+    "DUITKU_MERCHANT_CODE": "DS00000",
+    "DUITKU_API_KEY": "bench-duitku-api-key",
+    "TRIPAY_PRIVATE_KEY": "bench-tripay-private-key",
+    "XENDIT_WEBHOOK_TOKEN": "bench-xendit-webhook-token",
+}
+
+GATEWAY_MODULES = {
+    "duitku": "duitku_callback",
+    "tripay": "tripay_callback",
+    "xendit": "xendit_webhook",
+}
+
+STAGES = ("parse", "verify", "process", "respond", "total")
+
+
+def duitku_request(index=1):
+    """Form post Duitku dengan signature MD5(merchantCode + amount + merchantOrderId + apiKey)"""
+    merchant_order_id = f"ORDER-BENCH-{index}"
+    amount = "40000"
+    signature = hashlib.md5(
+        (BENCH_ENV["DUITKU_MERCHANT_CODE"] + amount + merchant_order_id + BENCH_ENV["DUITKU_API_KEY"]).encode()
+    ).hexdigest()
+    body = urlencode(
+        {
+            "merchantCode": BENCH_ENV["DUITKU_MERCHANT_CODE"],
+            "amount": amount,
+            "merchantOrderId": merchant_order_id,
+            "productDetails": "Test Product",
+            "paymentCode": "SP",
+            "resultCode": "00",
+            "reference": f"DS00000{index:08d}",
+            "signature": signature,
+        }
+    ).encode()
+    return "/callback/duitku", body, {"Content-Type": "application/x-www-form-urlencoded"}
+
+
+def tripay_request(index=1):
+    """JSON callback Tripay dengan X-Callback-Signature HMAC-SHA256(raw body)"""
+    body = json.dumps(
+        {
+            "reference": f"T00000{index:08d}",
+            "merchant_ref": f"INV-BENCH-{index}",
+            "payment_method": "QRIS2",
+            "payment_method_code": "QRIS2",
+            "total_amount": 100000,
+            "fee_merchant": 1000,
+            "fee_customer": 0,
+            "total_fee": 1000,
+            "amount_received": 99000,
+            "is_closed_payment": 1,
+            "status": "PAID",
+            "paid_at": 1760000000,
+            "note": None,
+        }
+    ).encode()
+    signature = hmac.new(BENCH_ENV["TRIPAY_PRIVATE_KEY"].encode(), body, hashlib.sha256).hexdigest()
+    return "/callback", body, {"Content-Type": "application/json", "X-Callback-Signature": signature}
+
+
+def xendit_request(index=1):
+    """Webhook Xendit dengan x-xendit-signature HMAC-SHA256(raw body, webhook token)"""
+    body = json.dumps(
+        {
+            "event": "payment_request.succeeded",
+            "business_id": "bench-business",
+            "created": "2026-01-01T00:00:00.000Z",
+            "data": {
+                "id": f"pr-bench-{index}",
+                "amount": 500,
+                "currency": "IDR",
+                "reference_id": f"order_bench_{index}",
+                "status": "SUCCEEDED",
+                "channel_code": "QRIS",
+            },
+        }
+    ).encode()
+    signature = hmac.new(BENCH_ENV["XENDIT_WEBHOOK_TOKEN"].encode(), body, hashlib.sha256).hexdigest()
+    return "/webhook/xendit", body, {"Content-Type": "application/json", "x-xendit-signature": signature}
+
+
+REQUEST_BUILDERS = {
+    "duitku": duitku_request,
+    "tripay": tripay_request,
+    "xendit": xendit_request,
+}
+
+
+class StageClock:
+    """Akumulasi durasi per stage untuk satu request"""
+
+    def __init__(self):
+        self.durations = dict.fromkeys(STAGES, 0.0)
+
+    def wrap(self, stage, func):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.durations[stage] += time.perf_counter() - started
+
+        return timed
+
+
+class TimedVerifier:
+    def __init__(self, clock, verifier):
+        self.sign = clock.wrap("verify", verifier.sign)
+        self.verify = clock.wrap("verify", verifier.verify)
+
+
+def instrument(gateway, module, clock):
+    """Pasang timer di fungsi yang dipanggil handler; return fungsi untuk restore"""
+    process_name = {
+        "duitku": "process_duitku_callback",
+        "tripay": "process_tripay_callback",
+        "xendit": "process_xendit_webhook",
+    }[gateway]
+    originals = {name: getattr(module, name) for name in (process_name, "jsonify")}
+    setattr(module, process_name, clock.wrap("process", originals[process_name]))
+    module.jsonify = clock.wrap("respond", originals["jsonify"])
+
+    if gateway == "duitku":
+        originals["verify_callback_signature"] = module.verify_callback_signature
+        module.verify_callback_signature = clock.wrap("verify", module.verify_callback_signature)
+    elif gateway == "tripay":
+        originals["TRIPAY_VERIFIER"] = module.TRIPAY_VERIFIER
+        module.TRIPAY_VERIFIER = TimedVerifier(clock, module.TRIPAY_VERIFIER)
+    else:
+        originals["verify_webhook_signature"] = module.verify_webhook_signature
+        module.verify_webhook_signature = clock.wrap("verify", module.verify_webhook_signature)
+
+    def restore():
+        for name, value in originals.items():
+            setattr(module, name, value)
+
+    return restore
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def bench_gateway(gateway, iterations=ITERATIONS):
+    """Jalankan handler lewat Flask test client; return statistik per stage dalam mikrodetik"""
+    module = importlib.import_module(GATEWAY_MODULES[gateway])
+    client = module.app.test_client()
+    requests = [REQUEST_BUILDERS[gateway](index) for index in range(1, iterations + 1)]
+    samples = {stage: [] for stage in STAGES}
+
+    for path, body, headers in requests[: min(200, iterations)]:
+        # 🔥 Warm-up (import lazy, cache Flask) tanpa dicatat
+        client.post(path, data=body, headers=headers)
+
+    for path, body, headers in requests:
+        clock = StageClock()
+        restore = instrument(gateway, module, clock)
+        try:
+            started = time.perf_counter()
+            response = client.post(path, data=body, headers=headers)
+            total = time.perf_counter() - started
+        finally:
+            restore()
+        if response.status_code != 200:
+            raise RuntimeError(f"{gateway}: status {response.status_code} {response.get_data(as_text=True)}")
+
+        durations = clock.durations
+        durations["total"] = total
+        # process = isi process_* di luar verifikasi; parse = semua sebelum/ di luar stage lain (routing, body/form parsing)
+        durations["process"] -= durations["verify"]
+        durations["parse"] = total - durations["process"] - durations["verify"] - durations["respond"]
+        for stage in STAGES:
+            samples[stage].append(durations[stage] * 1_000_000)
+
+    result = {}
+    for stage, values in samples.items():
+        values.sort()
+        result[stage] = {
+            "mean_us": round(sum(values) / len(values), 2),
+            "p50_us": round(percentile(values, 50), 2),
+            "p99_us": round(percentile(values, 99), 2),
+        }
+    result["throughput_rps"] = round(1_000_000 / result["total"]["mean_us"], 1)
+    return result
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Return daftar regresi (gateway, stage, baseline_us, current_us)"""
+    regressions = []
+    for gateway, stages in results.items():
+        for stage in STAGES:
+            base = baseline.get("results", {}).get(gateway, {}).get(stage)
+            if not base:
+                continue
+            current = stages[stage]["p50_us"]
+            # Abaikan stage < 1us, noise timer lebih besar dari perubahannya
+            if current > 1 and current > base["p50_us"] * (1 + tolerance):
+                regressions.append((gateway, stage, base["p50_us"], current))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-stage handler callback Duitku/Tripay/Xendit")
+    parser.add_argument("--iterations", type=int, default=ITERATIONS)
+    parser.add_argument("--gateway", choices=sorted(REQUEST_BUILDERS), action="append")
+    parser.add_argument("--save", action="store_true", help=f"Simpan hasil sebagai baseline ({BASELINE_FILE})")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    # Env bench di-set sebelum modul handler di-import supaya signature cocok & .env asli tidak dipakai
+    os.environ.update(BENCH_ENV)
+    os.environ.setdefault("EVENT_LOG_LEVEL", "WARNING")
+    state_dir = tempfile.mkdtemp(prefix="bench-callbacks-")
+    os.environ.setdefault("CALLBACK_DEDUP_PATH", os.path.join(state_dir, "dedup.db"))
+    os.environ.setdefault("ORDER_STORE_PATH", os.path.join(state_dir, "orders.db"))
+
+    results = {gateway: bench_gateway(gateway, args.iterations) for gateway in args.gateway or REQUEST_BUILDERS}
+
+    print("=" * 70)
+    print(f"⏱️  CALLBACK HANDLER BENCHMARK ({args.iterations:,} request per gateway, p50 / p99 dalam µs)")
+    print("=" * 70)
+    print(f"{'gateway':<8}" + "".join(f"{stage:>16}" for stage in STAGES) + f"{'req/s':>10}")
+    for gateway, stages in results.items():
+        cells = "".join(f"{stages[stage]['p50_us']:>8.1f}/{stages[stage]['p99_us']:<7.1f}" for stage in STAGES)
+        print(f"{gateway:<8}{cells}{stages['throughput_rps']:>10,.0f}")
+
+    if args.save:
+        baseline = {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "iterations": args.iterations,
+            "results": results,
+        }
+        with open(BASELINE_FILE, "w") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        print(f"\n💾 Baseline disimpan ke {BASELINE_FILE}")
+        return
+
+    if not os.path.exists(BASELINE_FILE):
+        print(f"\nℹ️  {BASELINE_FILE} belum ada, jalankan dengan --save untuk membuat baseline")
+        return
+
+    with open(BASELINE_FILE) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n❌ REGRESI (> {args.tolerance:.0%} dari baseline p50):")
+        for gateway, stage, base_us, current_us in regressions:
+            print(f"   - {gateway}.{stage}: {base_us:.1f}µs -> {current_us:.1f}µs")
+        sys.exit(1)
+    print(f"\n✅ Tidak ada regresi (toleransi {args.tolerance:.0%})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# bench_json.py - Microbenchmark backend json_codec (json / msgspec / orjson) dengan payload callback & response gateway
+
+import os
+import timeit
+
+from bench_callbacks import tripay_request, xendit_request
+from json_codec import available_codecs
+
+ITERATIONS = int(os.getenv("BENCH_ITERATIONS", 50_000))
+
+
+def xendit_payment_request_body():
+    """Response POST /v3/payment_requests QRIS (action QR_STRING + redirect)"""
+    codec = available_codecs()[-1]
+    return codec.dumps(
+        {
+            "payment_request_id": "pr-bench-1",
+            "reference_id": "order_bench_1",
+            "business_id": "bench-business",
+            "country": "ID",
+            "currency": "IDR",
+            "request_amount": 500,
+            "capture_method": "AUTOMATIC",
+            "channel_code": "QRIS",
+            "channel_properties": {"expires_at": "2026-01-01T01:00:00.000Z"},
+            "type": "PAY",
+            "status": "REQUIRES_ACTION",
+            "actions": [
+                {
+                    "type": "PRESENT_TO_CUSTOMER",
+                    "descriptor": "QR_STRING",
+                    "value": "00020101021226670016COM.NOBUBANK.WWW01189360050300000898400214"
+                    "0000000000000030303UMI51440014ID.CO.QRIS.WWW0215ID10200000000000303UMI"
+                    "520454995303360540450005802ID5912XENDIT BENCH6007JAKARTA61051234062070703A016304ABCD",
+                },
+                {"type": "REDIRECT_CUSTOMER", "descriptor": "WEB_URL", "value": "https://checkout.xendit.co/pr-bench-1"},
+            ],
+            "created": "2026-01-01T00:00:00.000Z",
+            "updated": "2026-01-01T00:00:00.000Z",
+        }
+    )
+
+
+def tripay_transactions_page_body(per_page=50):
+    """Satu halaman /merchant/transactions (export, tripay_transactions.py)"""
+    codec = available_codecs()[-1]
+    transactions = [
+        {
+            "reference": f"T00000{index:08d}",
+            "merchant_ref": f"INV-BENCH-{index}",
+            "payment_selection_type": "static",
+            "payment_method": "QRIS2",
+            "payment_name": "QRIS",
+            "customer_name": "Budi Santoso",
+            "customer_email": "budi@example.com",
+            "customer_phone": "081234567890",
+            "amount": 100000,
+            "fee_merchant": 1000,
+            "fee_customer": 0,
+            "total_fee": 1000,
+            "amount_received": 99000,
+            "checkout_url": f"https://tripay.co.id/checkout/T00000{index:08d}",
+            "status": "PAID",
+            "paid_at": 1760000000,
+            "expired_at": 1760086400,
+            "created_at": 1760000000 - index * 60,
+            "order_items": [{"sku": "SKU-1", "name": "Produk Bench", "price": 100000, "quantity": 1, "subtotal": 100000}],
+        }
+        for index in range(per_page)
+    ]
+    return codec.dumps({"success": True, "message": "", "data": transactions, "pagination": {"total": 5000}})
+
+
+PAYLOADS = {
+    "tripay_callback": tripay_request()[1],
+    "xendit_webhook": xendit_request()[1],
+    "xendit_payment": xendit_payment_request_body(),
+    "tripay_page": tripay_transactions_page_body(),
+}
+
+
+def ops_per_second(func, arg):
+    best = min(timeit.repeat(lambda: func(arg), number=ITERATIONS, repeat=3))
+    return ITERATIONS / best
+
+
+if __name__ == "__main__":
+    codecs = available_codecs()
+    print("=" * 78)
+    print(f"🧾 JSON CODEC BENCHMARK ({ITERATIONS:,} iterasi, best of 3) - backend: {', '.join(c.name for c in codecs)}")
+    print("=" * 78)
+    for name, body in PAYLOADS.items():
+        data = codecs[-1].loads(body)
+        print(f"\n{name} ({len(body):,} bytes)")
+        baseline = None
+        # json stdlib ada di akhir available_codecs() -> jadi pembanding
+        for codec in reversed(codecs):
+            assert codec.loads(body) == data, f"{codec.name} hasil decode beda"
+            decode_rate = ops_per_second(codec.loads, body)
+            encode_rate = ops_per_second(codec.dumps, data)
+            if baseline is None:
+                baseline = (decode_rate, encode_rate)
+            print(
+                f"  {codec.name:<8} loads {decode_rate:>11,.0f}/s ({decode_rate / baseline[0]:.2f}x)   "
+                f"dumps {encode_rate:>11,.0f}/s ({encode_rate / baseline[1]:.2f}x)"
+            )
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# bench_signature.py - Microbenchmark verifikasi signature callback: implementasi lama vs callback_signature
+
+import hashlib
+import hmac
+import json
+import os
+import timeit
+
+from callback_signature import HmacSha256Verifier, duitku_callback_signature, signature_matches
+
+ITERATIONS = int(os.getenv("BENCH_ITERATIONS", 200_000))
+
+TRIPAY_KEY = "bench-tripay-private-key"
+XENDIT_TOKEN = "bench-xendit-webhook-token"
+DUITKU_API_KEY = "bench-duitku-api-key"
+
+TRIPAY_BODY = json.dumps(
+    {
+        "reference": "T0000000000001",
+        "merchant_ref": "INV-BENCH-1",
+        "payment_method": "QRIS2",
+        "status": "PAID",
+        "total_amount": 100000,
+        "amount_received": 99000,
+        "fee_merchant": 1000,
+        "paid_at": 1760000000,
+    }
+).encode()
+TRIPAY_SIGNATURE = hmac.new(TRIPAY_KEY.encode(), TRIPAY_BODY, hashlib.sha256).hexdigest()
+
+XENDIT_BODY = json.dumps(
+    {"event": "payment_request.succeeded", "data": {"id": "pr-bench-1", "amount": 500, "reference_id": "order_bench_1"}}
+).encode()
+XENDIT_SIGNATURE = hmac.new(XENDIT_TOKEN.encode(), XENDIT_BODY, hashlib.sha256).hexdigest()
+
+DUITKU_FIELDS = ("DS00000", "40000", "ORDER-BENCH-1")
+DUITKU_SIGNATURE = hashlib.md5(("".join(DUITKU_FIELDS) + DUITKU_API_KEY).encode()).hexdigest()
+
+
+# Implementasi lama (disalin dari handler sebelum callback_signature)
+def tripay_before():
+    raw_body = TRIPAY_BODY.decode("latin-1")
+    calculated = hmac.new(bytes(TRIPAY_KEY, "latin-1"), bytes(raw_body, "latin-1"), hashlib.sha256).hexdigest()
+    return TRIPAY_SIGNATURE == calculated
+
+
+def xendit_before():
+    payload = XENDIT_BODY.decode()
+    expected = hmac.new(XENDIT_TOKEN.encode(), payload.encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, XENDIT_SIGNATURE)
+
+
+def duitku_before():
+    merchant_code, amount, merchant_order_id = DUITKU_FIELDS
+    signature_string = merchant_code + amount + merchant_order_id + DUITKU_API_KEY
+    return hashlib.md5(signature_string.encode()).hexdigest() == DUITKU_SIGNATURE
+
+
+TRIPAY_VERIFIER = HmacSha256Verifier(TRIPAY_KEY, encoding="latin-1")
+XENDIT_VERIFIER = HmacSha256Verifier(XENDIT_TOKEN)
+
+
+def tripay_after():
+    return TRIPAY_VERIFIER.verify(TRIPAY_BODY, TRIPAY_SIGNATURE)
+
+
+def xendit_after():
+    return XENDIT_VERIFIER.verify(XENDIT_BODY, XENDIT_SIGNATURE)
+
+
+def duitku_after():
+    return signature_matches(duitku_callback_signature(*DUITKU_FIELDS, DUITKU_API_KEY), DUITKU_SIGNATURE)
+
+
+CASES = {
+    "tripay": (tripay_before, tripay_after),
+    "xendit": (xendit_before, xendit_after),
+    "duitku": (duitku_before, duitku_after),
+}
+
+
+def verifications_per_second(func):
+    assert func(), f"{func.__name__} gagal verifikasi"
+    best = min(timeit.repeat(func, number=ITERATIONS, repeat=3))
+    return ITERATIONS / best
+
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print(f"🔐 SIGNATURE VERIFICATION BENCHMARK ({ITERATIONS:,} iterasi, best of 3)")
+    print("=" * 70)
+    for gateway, (before, after) in CASES.items():
+        before_rate = verifications_per_second(before)
+        after_rate = verifications_per_second(after)
+        print(
+            f"{gateway:<7} before {before_rate:>12,.0f}/s   after {after_rate:>12,.0f}/s   "
+            f"({after_rate / before_rate:.2f}x)"
+        )
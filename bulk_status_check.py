@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# bulk_status_check.py - Cek status ribuan transaksi Tripay/Duitku secara concurrent, output NDJSON
+
+import argparse
+import asyncio
+import sys
+import time
+from dotenv import load_dotenv
+from gateway_client import MAX_CONNECTIONS, aclose_clients, get_async_client
+from gateway_ratelimit import set_rate_limit
+from json_codec import DECODE_ERRORS, JSON_CONTENT_TYPE, dumps, dumps_str, response_json
+from status_lookup import duitku_status_payload
+
+load_dotenv()
+
+READ_BATCH_BYTES = 64 * 1024
+FLUSH_EVERY = 100
+# Antre di belakang request checkout live (gateway_ratelimit)
+BULK_EXTENSIONS = {"priority": "batch", "flow": "bulk_status"}
+
+
+async def check_tripay(reference):
+    return await get_async_client("tripay").get("/transaction/check-status", params={"reference": reference}, extensions=BULK_EXTENSIONS)
+
+
+async def check_duitku(merchant_order_id):
+    # Cek status read-only -> aman di-retry walau POST
+    return await get_async_client("duitku").post(
+        "/transactionStatus",
+        content=dumps(duitku_status_payload(merchant_order_id)),
+        headers=JSON_CONTENT_TYPE,
+        extensions={**BULK_EXTENSIONS, "idempotent": True},
+    )
+
+
+CHECKERS = {
+    "tripay": check_tripay,
+    "duitku": check_duitku,
+}
+
+
+async def check_one(gateway, reference):
+    """Satu baris hasil NDJSON; error jaringan dicatat per baris, tidak menghentikan batch"""
+    result = {"gateway": gateway, "reference": reference}
+    try:
+        response = await CHECKERS[gateway](reference)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        return result
+    result["http_status"] = response.status_code
+    try:
+        result["response"] = response_json(response)
+    except DECODE_ERRORS:
+        result["response"] = response.text
+    return result
+
+
+async def read_references(source, queue, workers):
+    """Stream reference (satu per baris, '#' komentar) ke queue bounded, lalu kirim sinyal selesai"""
+    loop = asyncio.get_running_loop()
+    while True:
+        # readlines(hint) di thread: stdin/file besar tidak pernah dibaca sekaligus dan tidak block loop
+        lines = await loop.run_in_executor(None, source.readlines, READ_BATCH_BYTES)
+        if not lines:
+            break
+        for line in lines:
+            reference = line.split("#", 1)[0].strip()
+            if reference:
+                await queue.put(reference)
+    for _ in range(workers):
+        await queue.put(None)
+
+
+async def run_bulk(gateway, source, output, concurrency=MAX_CONNECTIONS):
+    """Cek semua reference dari source, tulis hasil ke output begitu selesai; return statistik"""
+    queue = asyncio.Queue(concurrency * 2)
+    stats = {"total": 0, "ok": 0, "failed": 0}
+    started = time.perf_counter()
+
+    async def worker():
+        while True:
+            reference = await queue.get()
+            if reference is None:
+                return
+            result = await check_one(gateway, reference)
+            output.write(dumps_str(result) + "\n")
+            stats["total"] += 1
+            if "error" in result or result["http_status"] >= 400:
+                stats["failed"] += 1
+            else:
+                stats["ok"] += 1
+            if stats["total"] % FLUSH_EVERY == 0:
+                output.flush()
+
+    try:
+        await asyncio.gather(read_references(source, queue, concurrency), *(worker() for _ in range(concurrency)))
+    finally:
+        output.flush()
+        await aclose_clients()
+    stats["elapsed_seconds"] = round(time.perf_counter() - started, 2)
+    return stats
+
+
+def run_cli(gateway=None, argv=None):
+    parser = argparse.ArgumentParser(description="Bulk cek status transaksi (NDJSON)")
+    if gateway is None:
+        parser.add_argument("gateway", choices=sorted(CHECKERS))
+    parser.add_argument("input", help="File berisi reference/merchantOrderId per baris, '-' untuk stdin")
+    parser.add_argument("-o", "--output", default="-", help="File NDJSON (default stdout)")
+    parser.add_argument("-c", "--concurrency", type=int, default=MAX_CONNECTIONS)
+    parser.add_argument(
+        "--rate",
+        type=float,
+        help="Request/detik ke gateway untuk job ini (default {GATEWAY}_RATE_LIMIT_PER_SECOND, 0 = tanpa limit)",
+    )
+    args = parser.parse_args(argv)
+    gateway = gateway or args.gateway
+    if args.rate is not None:
+        set_rate_limit(gateway, args.rate)
+    if args.concurrency > MAX_CONNECTIONS:
+        print(
+            f"⚠️  Concurrency {args.concurrency} > GATEWAY_HTTP_MAX_CONNECTIONS={MAX_CONNECTIONS}, sisanya antre di pool",
+            file=sys.stderr,
+        )
+
+    source = sys.stdin if args.input == "-" else open(args.input)
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        stats = asyncio.run(run_bulk(gateway, source, output, args.concurrency))
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+    rate = stats["total"] / stats["elapsed_seconds"] if stats["elapsed_seconds"] else 0
+    # Ringkasan ke stderr supaya stdout tetap NDJSON murni
+    print(
+        f"✅ {stats['total']:,} dicek ({stats['ok']:,} ok, {stats['failed']:,} gagal) "
+        f"dalam {stats['elapsed_seconds']}s, {rate:,.0f}/s",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    run_cli()
@@ -0,0 +1,175 @@
+# callback_dedup.py - Dedup index untuk retry callback (LRU + Bloom pre-check + persistent set SQLite dengan retensi)
+
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEDUP_PATH = os.getenv("CALLBACK_DEDUP_PATH", "callback_dedup.db")
+LRU_SIZE = int(os.getenv("CALLBACK_DEDUP_LRU_SIZE", 100_000))
+# Gateway berhenti retry jauh sebelum ini; key yang lebih tua dihapus saat start & berkala
+RETENTION_SECONDS = float(os.getenv("CALLBACK_DEDUP_RETENTION_DAYS", 30)) * 86400
+PRUNE_INTERVAL_SECONDS = float(os.getenv("CALLBACK_DEDUP_PRUNE_INTERVAL_SECONDS", 3600))
+BLOOM_CAPACITY = int(os.getenv("CALLBACK_DEDUP_BLOOM_CAPACITY", 1_000_000))
+BLOOM_ERROR_RATE = float(os.getenv("CALLBACK_DEDUP_BLOOM_ERROR_RATE", 0.01))
+
+
+class BloomFilter:
+    """Bloom filter sederhana di atas bytearray (double hashing dari satu digest blake2b)"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class CallbackDedup:
+    """Cek duplikat callback: LRU -> Bloom pre-check -> SQLite (INSERT OR IGNORE sebagai penentu).
+
+    SQLite dipakai bersama beberapa proses (uvicorn workers, shard process), jadi Bloom proses ini
+    tidak pernah memutuskan "belum pernah" sendirian. Bloom hanya memilih jalur: negatif -> langsung
+    INSERT (hampir pasti key baru); positif -> SELECT dulu, jadi retry storm dijawab dengan read
+    tanpa write lock lintas proses. Insert tetap yang menentukan kalau SELECT tidak menemukan key.
+    """
+
+    def __init__(
+        self,
+        path=DEDUP_PATH,
+        lru_size=LRU_SIZE,
+        retention_seconds=RETENTION_SECONDS,
+        prune_interval=PRUNE_INTERVAL_SECONDS,
+        bloom_capacity=BLOOM_CAPACITY,
+        bloom_error_rate=BLOOM_ERROR_RATE,
+    ):
+        self.lru_size = lru_size
+        self.lru = OrderedDict()
+        self.retention_seconds = retention_seconds
+        self.prune_interval = prune_interval
+        self.bloom_capacity = bloom_capacity
+        self.bloom_error_rate = bloom_error_rate
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "lru_hits": 0,
+            "bloom_negative": 0,
+            "bloom_false_positive": 0,
+            "store_hits": 0,
+            "pruned": 0,
+        }
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS seen_callbacks (key TEXT PRIMARY KEY, seen_at REAL NOT NULL)")
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(seen_callbacks)")}
+        if "seen_at" not in columns:
+            # DB lama tanpa timestamp: anggap semua key baru terlihat sekarang, terhapus setelah satu periode retensi
+            self._db.execute("ALTER TABLE seen_callbacks ADD COLUMN seen_at REAL NOT NULL DEFAULT 0")
+            self._db.execute("UPDATE seen_callbacks SET seen_at = ? WHERE seen_at = 0", (time.time(),))
+        self._db.execute("CREATE INDEX IF NOT EXISTS seen_callbacks_seen_at ON seen_callbacks (seen_at)")
+        self._next_prune = 0.0
+        self.bloom = None
+        with self._lock:
+            self._prune()
+            self._rebuild_bloom()
+
+    def _prune(self):
+        now = time.time()
+        cursor = self._db.execute("DELETE FROM seen_callbacks WHERE seen_at < ?", (now - self.retention_seconds,))
+        self.stats["pruned"] += cursor.rowcount
+        self._next_prune = now + self.prune_interval
+        if self.bloom is not None and self.bloom.count > self.bloom_capacity:
+            # Bloom tidak bisa menghapus key: kalau sudah lewat kapasitas, bangun ulang dari key dalam retensi
+            self._rebuild_bloom()
+
+    def _rebuild_bloom(self):
+        """Isi Bloom dengan key terbaru dalam retensi (paling banyak bloom_capacity)"""
+        self.bloom = BloomFilter(self.bloom_capacity, self.bloom_error_rate)
+        rows = self._db.execute("SELECT key FROM seen_callbacks ORDER BY seen_at DESC LIMIT ?", (self.bloom_capacity,))
+        for (key,) in rows:
+            self.bloom.add(key)
+
+    def _remember(self, key):
+        self.lru[key] = None
+        self.lru.move_to_end(key)
+        if len(self.lru) > self.lru_size:
+            self.lru.popitem(last=False)
+
+    def check_and_mark(self, key):
+        """Return True kalau key sudah pernah diproses; kalau belum, tandai sebagai sudah"""
+        with self._lock:
+            if key in self.lru:
+                # Hanya berisi key yang di-insert proses ini, jadi positif di sini pasti benar
+                self.lru.move_to_end(key)
+                self.stats["lru_hits"] += 1
+                self.stats["hits"] += 1
+                return True
+            now = time.time()
+            if now >= self._next_prune:
+                self._prune()
+            if key in self.bloom:
+                # Kemungkinan duplikat: cukup read (tanpa write lock) untuk memastikan
+                if self._db.execute("SELECT 1 FROM seen_callbacks WHERE key = ?", (key,)).fetchone():
+                    return self._store_hit()
+                self.stats["bloom_false_positive"] += 1
+            else:
+                self.stats["bloom_negative"] += 1
+            cursor = self._db.execute("INSERT OR IGNORE INTO seen_callbacks (key, seen_at) VALUES (?, ?)", (key, now))
+            self.bloom.add(key)
+            if cursor.rowcount == 0:
+                return self._store_hit()
+            self.stats["misses"] += 1
+            self._remember(key)
+            return False
+
+    def _store_hit(self):
+        # Ditandai proses lain: tidak masuk LRU, proses itu yang berhak discard kalau gagal
+        self.stats["store_hits"] += 1
+        self.stats["hits"] += 1
+        return True
+
+    def discard(self, key):
+        """Lepas tanda key (mis. proses gagal) supaya retry berikutnya diproses lagi"""
+        with self._lock:
+            self.lru.pop(key, None)
+            self._db.execute("DELETE FROM seen_callbacks WHERE key = ?", (key,))
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, lru_size=len(self.lru))
+
+
+_dedup = None
+_dedup_lock = threading.Lock()
+
+
+def get_dedup():
+    """Instance CallbackDedup bersama untuk semua handler (dibuat saat pertama dipakai)"""
+    global _dedup
+    if _dedup is None:
+        with _dedup_lock:
+            if _dedup is None:
+                _dedup = CallbackDedup()
+    return _dedup
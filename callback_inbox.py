@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+# callback_inbox.py - Write-ahead inbox (segmented log + group-commit fsync) untuk callback gateway
+
+import asyncio
+import fcntl
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from dotenv import load_dotenv
+from event_log import get_event_logger
+from json_codec import dumps, loads
+
+load_dotenv()
+
+log = get_event_logger("inbox")
+
+INBOX_DIR = os.getenv("CALLBACK_INBOX_DIR", "")
+SEGMENT_BYTES = int(os.getenv("CALLBACK_INBOX_SEGMENT_BYTES", 16 * 1024 * 1024))
+GROUP_COMMIT_MS = float(os.getenv("CALLBACK_INBOX_GROUP_COMMIT_MS", 2))
+POLL_INTERVAL_SECONDS = float(os.getenv("CALLBACK_INBOX_POLL_SECONDS", 0.05))
+# Record yang gagal diproses sebanyak ini dipindah ke dead letter supaya tidak menahan record sesudahnya
+MAX_ATTEMPTS = int(os.getenv("CALLBACK_INBOX_MAX_ATTEMPTS", 10))
+# Jeda retry record yang gagal: eksponensial 1, 2, 4, ... detik (maks RETRY_MAX_DELAY), jadi dengan
+# default record baru masuk dead letter setelah ~8 menit downstream gagal, bukan dalam hitungan poll
+RETRY_DELAY_SECONDS = float(os.getenv("CALLBACK_INBOX_RETRY_DELAY_SECONDS", 1))
+RETRY_MAX_DELAY_SECONDS = float(os.getenv("CALLBACK_INBOX_RETRY_MAX_DELAY_SECONDS", 300))
+
+# crc32, payload_len, received_at, gateway_len, headers_len
+RECORD_HEADER = struct.Struct("<IIdHI")
+SEGMENT_SUFFIX = ".log"
+CHECKPOINT_FILE = "checkpoint"
+# Format record sama dengan segment, bisa di-replay; suffix beda supaya tidak ikut list_segments
+DEAD_LETTER_FILE = "dead_letter.dlq"
+WRITER_LOCK_FILE = "writer.lock"
+CONSUMER_LOCK_FILE = "consumer.lock"
+
+
+class InboxLockedError(RuntimeError):
+    """Inbox dir sudah dipakai writer/consumer di proses lain"""
+
+
+def lock_file(path):
+    """flock eksklusif non-blocking; dilepas otomatis saat proses mati"""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        raise InboxLockedError(
+            f"{path} dipegang proses lain: satu inbox dir hanya untuk satu proses writer dan satu consumer "
+            "(CALLBACK_SERVER_WORKERS=1 atau CALLBACK_INBOX_DIR berbeda per proses)"
+        ) from None
+    return fd
+
+
+class InboxRecord:
+    __slots__ = ("gateway", "headers", "body", "received_at")
+
+    def __init__(self, gateway, headers, body, received_at):
+        self.gateway = gateway
+        self.headers = headers
+        self.body = body
+        self.received_at = received_at
+
+
+def encode_record(gateway, headers, body, received_at=None):
+    gateway_bytes = gateway.encode()
+    headers_bytes = dumps(headers)
+    payload = gateway_bytes + headers_bytes + body
+    header = RECORD_HEADER.pack(
+        zlib.crc32(payload),
+        len(payload),
+        received_at if received_at is not None else time.time(),
+        len(gateway_bytes),
+        len(headers_bytes),
+    )
+    return header + payload
+
+
+def decode_record(buffer, offset):
+    """Decode satu record di offset, return (record, next_offset) atau (None, offset) kalau belum lengkap/korup"""
+    end_of_header = offset + RECORD_HEADER.size
+    if end_of_header > len(buffer):
+        return None, offset
+    crc, payload_len, received_at, gateway_len, headers_len = RECORD_HEADER.unpack_from(buffer, offset)
+    end = end_of_header + payload_len
+    if end > len(buffer):
+        return None, offset
+    payload = memoryview(buffer)[end_of_header:end]
+    if zlib.crc32(payload) != crc:
+        return None, offset
+    headers_end = gateway_len + headers_len
+    record = InboxRecord(
+        bytes(payload[:gateway_len]).decode(),
+        loads(bytes(payload[gateway_len:headers_end])),
+        bytes(payload[headers_end:]),
+        received_at,
+    )
+    return record, end
+
+
+def segment_path(directory, segment_id):
+    return os.path.join(directory, f"{segment_id:012d}{SEGMENT_SUFFIX}")
+
+
+def list_segments(directory):
+    return sorted(
+        int(name[: -len(SEGMENT_SUFFIX)])
+        for name in os.listdir(directory)
+        if name.endswith(SEGMENT_SUFFIX)
+    )
+
+
+def valid_length(path):
+    """Panjang prefix segment yang berisi record utuh (sisanya torn write)"""
+    with open(path, "rb") as f:
+        buffer = f.read()
+    offset = 0
+    while True:
+        record, next_offset = decode_record(buffer, offset)
+        if record is None:
+            return offset
+        offset = next_offset
+
+
+class CallbackInbox:
+    """Append-only inbox; append() baru return setelah record di-fsync (group commit)"""
+
+    def __init__(self, directory, segment_bytes=SEGMENT_BYTES, group_commit_ms=GROUP_COMMIT_MS):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.group_commit_seconds = group_commit_ms / 1000
+        os.makedirs(directory, exist_ok=True)
+        # Dua writer di dir yang sama akan rotate sendiri-sendiri dan saling menimpa segment
+        self._lock_fd = lock_file(os.path.join(directory, WRITER_LOCK_FILE))
+
+        segments = list_segments(directory)
+        self.segment_id = segments[-1] if segments else 1
+        path = segment_path(directory, self.segment_id)
+        if os.path.exists(path):
+            # 🔧 Potong torn write dari crash sebelumnya
+            length = valid_length(path)
+            if length != os.path.getsize(path):
+                os.truncate(path, length)
+        self._file = open(path, "ab")
+
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._closed = False
+        self._thread = threading.Thread(target=self._commit_loop, name="callback-inbox-commit", daemon=True)
+        self._thread.start()
+
+    def _write(self, gateway, headers, body, waiter):
+        record = encode_record(gateway, headers, body)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Inbox sudah ditutup")
+            self._file.write(record)
+            self._waiters.append(waiter)
+            self._cond.notify()
+
+    def append(self, gateway, headers, body):
+        """Tulis callback ke inbox dan tunggu sampai durable (blocking)"""
+        done = threading.Event()
+        errors = []
+
+        def waiter(error):
+            if error is not None:
+                errors.append(error)
+            done.set()
+
+        self._write(gateway, headers, body, waiter)
+        done.wait()
+        if errors:
+            raise errors[0]
+
+    async def append_async(self, gateway, headers, body):
+        """Versi asyncio dari append(); event loop tidak ikut menunggu fsync"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def resolve(error):
+            if future.done():
+                return
+            if error is None:
+                future.set_result(None)
+            else:
+                future.set_exception(error)
+
+        self._write(gateway, headers, body, lambda error: loop.call_soon_threadsafe(resolve, error))
+        await future
+
+    def _commit_loop(self):
+        while True:
+            with self._cond:
+                while not self._waiters and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._waiters:
+                    return
+
+            # ⏳ Kumpulkan append lain supaya satu fsync melayani banyak callback
+            if self.group_commit_seconds:
+                time.sleep(self.group_commit_seconds)
+
+            with self._cond:
+                waiters, self._waiters = self._waiters, []
+                segment_file = self._file
+                error = None
+                try:
+                    segment_file.flush()
+                except OSError as e:
+                    error = e
+
+            if error is None:
+                try:
+                    os.fsync(segment_file.fileno())
+                except OSError as e:
+                    error = e
+
+            with self._cond:
+                if error is None and segment_file.tell() >= self.segment_bytes:
+                    self._rotate()
+
+            for waiter in waiters:
+                waiter(error)
+
+    def _rotate(self):
+        # Record yang masuk setelah fsync terakhir ikut di-fsync sebelum segment ditutup
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self.segment_id += 1
+        self._file = open(segment_path(self.directory, self.segment_id), "ab")
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self._file.close()
+        os.close(self._lock_fd)
+
+
+class InboxConsumer:
+    """Drain inbox dari checkpoint terakhir; record yang belum diproses di-replay saat restart.
+
+    handle_record(record) boleh return Future (mis. dari worker pool); record baru dianggap
+    selesai kalau handle_record / Future-nya tidak raise, dan checkpoint hanya maju sampai
+    record terakhir yang berhasil berturut-turut.
+    """
+
+    def __init__(
+        self,
+        directory,
+        handle_record,
+        poll_interval=POLL_INTERVAL_SECONDS,
+        barrier=None,
+        max_attempts=MAX_ATTEMPTS,
+        retry_delay=RETRY_DELAY_SECONDS,
+        retry_max_delay=RETRY_MAX_DELAY_SECONDS,
+    ):
+        self.directory = directory
+        self.handle_record = handle_record
+        # barrier(): tunggu state record yang sudah selesai durable (mis. flush order store) sebelum checkpoint maju
+        self.barrier = barrier
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.retry_max_delay = retry_max_delay
+        self.checkpoint_path = os.path.join(directory, CHECKPOINT_FILE)
+        os.makedirs(directory, exist_ok=True)
+        self._lock_fd = lock_file(os.path.join(directory, CONSUMER_LOCK_FILE))
+        self.segment_id, self.offset = self.load_checkpoint()
+        # (segment_id, offset) record yang sedang gagal -> (jumlah percobaan, monotonic retry berikutnya)
+        self._failures = {}
+        self._stopped = threading.Event()
+
+    def load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path) as f:
+                segment_id, offset = f.read().split()
+                return int(segment_id), int(offset)
+        except FileNotFoundError:
+            segments = list_segments(self.directory)
+            return (segments[0] if segments else 1), 0
+
+    def save_checkpoint(self):
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(f"{self.segment_id} {self.offset}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def dead_letter(self, raw_record):
+        with open(os.path.join(self.directory, DEAD_LETTER_FILE), "ab") as f:
+            f.write(raw_record)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _process_buffer(self, buffer):
+        """Proses record di buffer, return (jumlah bytes yang boleh di-checkpoint, jumlah record, ada yang gagal)"""
+        committed = 0
+        processed = 0
+        while True:
+            outcomes = []
+            offset = committed
+            while True:
+                record, next_offset = decode_record(buffer, offset)
+                if record is None:
+                    break
+                try:
+                    outcomes.append((offset, next_offset, record, self.handle_record(record), None))
+                except Exception as e:
+                    outcomes.append((offset, next_offset, record, None, e))
+                    # Record sesudahnya baru dibaca setelah yang ini berhasil / masuk dead letter
+                    break
+                offset = next_offset
+            if not outcomes:
+                self._failures.clear()
+                return committed, processed, False
+
+            for start, end, record, result, error in outcomes:
+                if error is None and hasattr(result, "result"):
+                    try:
+                        result.result()
+                    except Exception as e:
+                        error = e
+                if error is None:
+                    committed = end
+                    processed += 1
+                    continue
+                position = (self.segment_id, self.offset + start)
+                attempts = self._failures.get(position, (0, 0.0))[0] + 1
+                log.event(
+                    "inbox_record_error", logging.ERROR, exc_info=error, record_gateway=record.gateway,
+                    segment_id=position[0], offset=position[1], attempt=attempts, error=str(error),
+                )
+                if attempts < self.max_attempts:
+                    delay = min(self.retry_max_delay, self.retry_delay * 2 ** (attempts - 1))
+                    self._failures[position] = (attempts, time.monotonic() + delay)
+                    # Record sesudahnya (yang sudah jalan di worker lain) ikut di-replay; dedup yang menyaring
+                    return committed, processed, True
+                self._failures.pop(position, None)
+                self.dead_letter(buffer[start:end])
+                log.error("inbox_dead_letter", record_gateway=record.gateway, segment_id=position[0], offset=position[1])
+                committed = end
+
+    def drain_once(self):
+        """Proses semua record yang sudah ada, return jumlah record yang diproses"""
+        processed = 0
+        while True:
+            failure = self._failures.get((self.segment_id, self.offset))
+            if failure is not None and time.monotonic() < failure[1]:
+                # Record terdepan masih dalam jeda retry; record sesudahnya menunggu (urutan dijaga)
+                return processed
+            path = segment_path(self.directory, self.segment_id)
+            # Cek rotate SEBELUM membaca: writer flush + tutup segment lama sebelum membuat segment baru,
+            # jadi kalau segment baru sudah ada, bacaan berikut pasti sampai akhir segment lama
+            rotated = any(segment_id > self.segment_id for segment_id in list_segments(self.directory))
+            buffer = b""
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    f.seek(self.offset)
+                    buffer = f.read()
+
+            committed, count, failed = self._process_buffer(buffer)
+            processed += count
+            if committed:
+                if self.barrier is not None:
+                    self.barrier()
+                self.offset += committed
+                self.save_checkpoint()
+
+            if failed or not rotated:
+                return processed
+            if committed < len(buffer):
+                # Segment lama tidak akan ditulis lagi dan sudah dibaca sampai EOF, sisanya pasti korup
+                log.warning("inbox_corrupt_tail", segment_id=self.segment_id, skipped_bytes=len(buffer) - committed)
+            self.segment_id += 1
+            self.offset = 0
+            self.save_checkpoint()
+            if os.path.exists(path):
+                os.remove(path)
+
+    def run(self):
+        try:
+            while not self._stopped.is_set():
+                try:
+                    processed = self.drain_once()
+                except Exception as e:
+                    # Mis. barrier gagal karena shard worker mati: checkpoint belum maju, record diulang nanti
+                    log.event("inbox_drain_error", logging.ERROR, exc_info=True, error=str(e))
+                    processed = 0
+                if not processed:
+                    self._stopped.wait(self.poll_interval)
+        finally:
+            os.close(self._lock_fd)
+
+    def start(self):
+        thread = threading.Thread(target=self.run, name="callback-inbox-consumer", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stopped.set()
+
+
+if __name__ == "__main__":
+    from callback_server import make_inbox_consumer, start_worker_pool, stop_worker_pool
+
+    if not INBOX_DIR:
+        print("❌ CALLBACK_INBOX_DIR belum di-set")
+        exit(1)
+
+    print("=" * 70)
+    print("📥 CALLBACK INBOX CONSUMER")
+    print("=" * 70)
+    print(f"Inbox dir : {INBOX_DIR}")
+    print("=" * 70 + "\n")
+
+    start_worker_pool()
+    consumer = make_inbox_consumer()
+    try:
+        consumer.run()
+    except KeyboardInterrupt:
+        consumer.stop()
+    finally:
+        stop_worker_pool()
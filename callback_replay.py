@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+# callback_replay.py - Capture & replay callback gateway untuk load test (in-process atau lewat HTTP)
+
+import argparse
+import asyncio
+import os
+import queue
+import re
+import shutil
+import ssl
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+from dotenv import load_dotenv
+
+from callback_inbox import decode_record, encode_record
+
+load_dotenv()
+
+CAPTURE_FILE = os.getenv("CALLBACK_CAPTURE_FILE", "")
+# Record yang belum ditulis thread capture; kalau penuh record di-drop (capture tidak boleh menahan callback)
+CAPTURE_QUEUE_SIZE = int(os.getenv("CALLBACK_CAPTURE_QUEUE_SIZE", 10_000))
+
+GATEWAY_PATHS = {
+    "duitku": "/callback/duitku",
+    "tripay": "/callback",
+    "xendit": "/webhook/xendit",
+}
+
+GATEWAY_MODULES = {
+    "duitku": "duitku_callback",
+    "tripay": "tripay_callback",
+    "xendit": "xendit_webhook",
+}
+
+# Header yang dihitung ulang oleh client saat replay
+SKIP_HEADERS = {"host", "content-length", "connection", "transfer-encoding", "accept-encoding"}
+
+
+class CaptureWriter:
+    """Append callback masuk ke file capture (format record sama dengan callback_inbox, tanpa fsync).
+
+    write() hanya memasukkan record ke queue; file I/O jalan di thread sendiri supaya event loop
+    server tidak tertahan.
+    """
+
+    def __init__(self, path, queue_size=CAPTURE_QUEUE_SIZE):
+        self.path = path
+        self.dropped = 0
+        self._queue = queue.Queue(queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def write(self, gateway, headers, body):
+        if self._thread is None:
+            # Thread + file baru dibuka saat record pertama (proses shard yang ikut import modul ini tidak perlu)
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._write_loop, name="callback-capture", daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait(encode_record(gateway, headers, body))
+        except queue.Full:
+            self.dropped += 1
+
+    def _write_loop(self):
+        with open(self.path, "ab") as f:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    return
+                f.write(record)
+                # Ambil yang sudah antre sekalian, flush sekali per batch
+                while True:
+                    try:
+                        record = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if record is None:
+                        f.flush()
+                        return
+                    f.write(record)
+                f.flush()
+
+    def close(self):
+        """Tulis sisa record di queue lalu tutup file"""
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+
+def read_capture(path, gateway=None):
+    """Load semua record dari file capture (atau segment inbox)"""
+    with open(path, "rb") as f:
+        buffer = f.read()
+    records = []
+    offset = 0
+    while True:
+        record, offset = decode_record(buffer, offset)
+        if record is None:
+            break
+        if gateway is None or record.gateway == gateway:
+            records.append(record)
+    return records
+
+
+def replay_headers(record):
+    return {name: value for name, value in record.headers.items() if name.lower() not in SKIP_HEADERS}
+
+
+def isolate_handler_state():
+    """Dedup & order store sementara untuk sender in-process; return fungsi untuk membersihkannya.
+
+    Harus dipanggil sebelum handler di-import (path dibaca saat import): replay tidak menulis ke
+    order_status.db / callback_dedup.db asli, dan run berikutnya tidak berubah jadi dedup hit semua.
+    """
+    if "order_store" in sys.modules or "callback_dedup" in sys.modules:
+        raise RuntimeError("Handler sudah di-import, replay in-process akan memakai DB asli")
+    state_dir = tempfile.mkdtemp(prefix="callback-replay-")
+    os.environ["CALLBACK_DEDUP_PATH"] = os.path.join(state_dir, "dedup.db")
+    os.environ["ORDER_STORE_PATH"] = os.path.join(state_dir, "orders.db")
+    # Replay tidak ikut direkam ke file capture
+    os.environ["CALLBACK_CAPTURE_FILE"] = ""
+
+    def cleanup():
+        from order_store import flush_order_store
+
+        flush_order_store()
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+    return cleanup
+
+
+def flask_sender(concurrency):
+    """Kirim ke <gateway>.app lewat Flask test client (thread per slot concurrency)"""
+    import importlib
+    from concurrent.futures import ThreadPoolExecutor
+
+    cleanup = isolate_handler_state()
+    apps = {gateway: importlib.import_module(module).app for gateway, module in GATEWAY_MODULES.items()}
+    local = threading.local()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    def post(record):
+        clients = getattr(local, "clients", None)
+        if clients is None:
+            clients = local.clients = {}
+        client = clients.get(record.gateway)
+        if client is None:
+            client = clients[record.gateway] = apps[record.gateway].test_client()
+        response = client.post(GATEWAY_PATHS[record.gateway], data=record.body, headers=replay_headers(record))
+        return response.status_code
+
+    async def send(record):
+        return await asyncio.get_running_loop().run_in_executor(executor, post, record)
+
+    def close():
+        executor.shutdown()
+        cleanup()
+
+    return send, close
+
+
+def asgi_sender():
+    """Panggil callback_server.app langsung (tanpa socket)"""
+    cleanup = isolate_handler_state()
+    from callback_server import app
+
+    async def send(record):
+        messages = [{"type": "http.request", "body": record.body, "more_body": False}]
+        status = []
+
+        async def receive():
+            return messages.pop() if messages else {"type": "http.disconnect"}
+
+        async def send_message(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+
+        scope = {
+            "type": "http",
+            "method": "POST",
+            "path": GATEWAY_PATHS[record.gateway],
+            "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in record.headers.items()],
+            "client": ("127.0.0.1", 0),
+        }
+        await app(scope, receive, send_message)
+        return status[0]
+
+    return send, cleanup
+
+
+class RawHttpSender:
+    """Client HTTP/1.1 keep-alive minimal di atas asyncio streams (httpx sendiri jadi bottleneck saat load test)"""
+
+    def __init__(self, base_url):
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.ssl = ssl.create_default_context() if url.scheme == "https" else None
+        self.port = url.port or (443 if self.ssl else 80)
+        self.prefix = url.path.rstrip("/")
+        self.idle = []
+        self._requests = {}
+
+    def _request_bytes(self, record):
+        request_bytes = self._requests.get(id(record))
+        if request_bytes is None:
+            header_lines = "".join(f"{name}: {value}\r\n" for name, value in replay_headers(record).items())
+            request_bytes = (
+                f"POST {self.prefix}{GATEWAY_PATHS[record.gateway]} HTTP/1.1\r\n"
+                f"Host: {self.host}:{self.port}\r\n{header_lines}"
+                f"Content-Length: {len(record.body)}\r\n\r\n"
+            ).encode("latin-1") + record.body
+            self._requests[id(record)] = request_bytes
+        return request_bytes
+
+    async def send(self, record):
+        reader, writer = self.idle.pop() if self.idle else await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+        try:
+            writer.write(self._request_bytes(record))
+            head = await reader.readuntil(b"\r\n\r\n")
+            status_code = int(head[9:12])
+            length = re.search(rb"(?i)\r\ncontent-length: *(\d+)", head)
+            await reader.readexactly(int(length.group(1)) if length else 0)
+        except BaseException:
+            writer.close()
+            raise
+        if b"connection: close" in head.lower():
+            # Flask dev server menutup koneksi tiap response
+            writer.close()
+        else:
+            self.idle.append((reader, writer))
+        return status_code
+
+    async def close(self):
+        while self.idle:
+            self.idle.pop()[1].close()
+
+
+def http_sender(base_url):
+    sender = RawHttpSender(base_url)
+    return sender.send, sender.close
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+async def replay(records, send, total, rate=0.0, concurrency=50):
+    """Replay `total` request (record diulang berputar) dan return statistik.
+
+    Dengan rate > 0 latency dihitung dari jadwal kirim, jadi antrean di sisi client ikut terukur.
+    """
+    latencies = []
+    errors = 0
+    status_counts = {}
+    next_index = 0
+    started = time.perf_counter()
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < total:
+            index = next_index
+            next_index += 1
+            record = records[index % len(records)]
+            scheduled = started + index / rate if rate else None
+            if scheduled is not None:
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            request_started = scheduled if scheduled is not None else time.perf_counter()
+            try:
+                status_code = await send(record)
+            except Exception:
+                status_code = "exception"
+            latencies.append(time.perf_counter() - request_started)
+            status_counts[status_code] = status_counts.get(status_code, 0) + 1
+            if not isinstance(status_code, int) or status_code >= 400:
+                errors += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": total,
+        "elapsed_seconds": elapsed,
+        "throughput": total / elapsed if elapsed else 0.0,
+        "error_rate": errors / total if total else 0.0,
+        "status_counts": status_counts,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p90_ms": percentile(latencies, 90) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": (latencies[-1] * 1000) if latencies else 0.0,
+    }
+
+
+def print_report(stats):
+    print("=" * 70)
+    print("📊 REPLAY REPORT")
+    print("=" * 70)
+    print(f"Requests    : {stats['requests']:,} dalam {stats['elapsed_seconds']:.2f}s")
+    print(f"Throughput  : {stats['throughput']:,.0f} req/s")
+    print(f"Error rate  : {stats['error_rate']:.2%}  {stats['status_counts']}")
+    print(
+        f"Latency     : p50 {stats['p50_ms']:.1f} ms | p90 {stats['p90_ms']:.1f} ms | "
+        f"p99 {stats['p99_ms']:.1f} ms | max {stats['max_ms']:.1f} ms"
+    )
+    print("=" * 70)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay callback yang direkam ke handler Duitku/Tripay/Xendit")
+    parser.add_argument("capture", help="File capture (CALLBACK_CAPTURE_FILE) atau segment inbox .log")
+    parser.add_argument("--target", choices=["flask", "asgi", "http"], default="asgi")
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="Base URL untuk --target http")
+    parser.add_argument("--gateway", choices=sorted(GATEWAY_PATHS), help="Hanya replay gateway ini")
+    parser.add_argument("--requests", type=int, default=0, help="Total request (default: semua record sekali)")
+    parser.add_argument("--rate", type=float, default=0.0, help="Request per detik (0 = secepatnya)")
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    records = read_capture(args.capture, args.gateway)
+    if not records:
+        print("❌ Tidak ada record di file capture")
+        exit(1)
+    total = args.requests or len(records)
+
+    print(f"🎬 Replay {total:,} request dari {len(records):,} record -> {args.target}"
+          f" (rate {'max' if not args.rate else args.rate}, concurrency {args.concurrency})")
+
+    async def run():
+        if args.target == "flask":
+            send, close = flask_sender(args.concurrency)
+        elif args.target == "asgi":
+            send, close = asgi_sender()
+        else:
+            send, close = http_sender(args.url)
+        try:
+            return await replay(records, send, total, args.rate, args.concurrency)
+        finally:
+            result = close()
+            if asyncio.iscoroutine(result):
+                await result
+
+    print_report(asyncio.run(run()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# callback_server.py - Satu ASGI server untuk callback Duitku, Tripay & Xendit
+
+import os
+import queue
+from urllib.parse import parse_qsl
+
+from dotenv import load_dotenv
+
+from callback_dedup import get_dedup
+from callback_inbox import INBOX_DIR, CallbackInbox, InboxConsumer
+from callback_replay import CAPTURE_FILE, CaptureWriter
+from callback_workers import WORKERS, ShardedWorkerPool
+from duitku_callback import IP_GUARD as DUITKU_IP_GUARD, process_duitku_callback
+from event_log import get_event_logger
+from gateway_client import aclose_clients
+from json_codec import CODEC, dumps, loads
+from order_store import flush_order_store, get_order_store
+from qr_render import app as qr_app, get_qr_cache, shutdown_render_pool
+from status_lookup import ASYNC_STATUS_LOOKUPS, get_single_flight
+from tripay_callback import IP_GUARD as TRIPAY_IP_GUARD, process_tripay_callback
+from xendit_webhook import IP_GUARD as XENDIT_IP_GUARD, process_xendit_webhook
+
+load_dotenv()
+
+EMBEDDED_CONSUMER = os.getenv("CALLBACK_INBOX_EMBEDDED_CONSUMER", "True").lower() == "true"
+
+log = get_event_logger("server")
+
+JSON_HEADERS = [(b"content-type", b"application/json")]
+
+
+async def read_body(receive):
+    """Baca seluruh request body dari ASGI receive channel"""
+    chunks = []
+    more_body = True
+    while more_body:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        more_body = message.get("more_body", False)
+    return b"".join(chunks)
+
+
+async def send_json(send, body, status_code):
+    payload = dumps(body)
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": JSON_HEADERS + [(b"content-length", str(len(payload)).encode())],
+        }
+    )
+    await send({"type": "http.response.body", "body": payload})
+
+
+def handle_duitku(raw_body, headers):
+    # 📦 Parse form data (x-www-form-urlencoded)
+    data = dict(parse_qsl(raw_body.decode("utf-8"), keep_blank_values=True))
+    return process_duitku_callback(data)
+
+
+def handle_tripay(raw_body, headers):
+    return process_tripay_callback(raw_body, headers.get("x-callback-signature"))
+
+
+def handle_xendit(raw_body, headers):
+    return process_xendit_webhook(raw_body, headers.get("x-xendit-signature"))
+
+
+def duitku_order_key(raw_body):
+    return dict(parse_qsl(raw_body.decode("utf-8", "replace"))).get("merchantOrderId")
+
+
+def tripay_order_key(raw_body):
+    return loads(raw_body).get("merchant_ref")
+
+
+def xendit_order_key(raw_body):
+    data = loads(raw_body).get("data") or {}
+    return data.get("reference_id") or data.get("id")
+
+
+GATEWAY_HANDLERS = {
+    "duitku": handle_duitku,
+    "tripay": handle_tripay,
+    "xendit": handle_xendit,
+}
+
+# ID order per gateway untuk memilih shard worker (callback order yang sama diproses berurutan)
+ORDER_KEY_EXTRACTORS = {
+    "duitku": duitku_order_key,
+    "tripay": tripay_order_key,
+    "xendit": xendit_order_key,
+}
+
+IP_GUARDS = {
+    "duitku": DUITKU_IP_GUARD,
+    "tripay": TRIPAY_IP_GUARD,
+    "xendit": XENDIT_IP_GUARD,
+}
+
+# Response sukses yang diharapkan masing-masing gateway
+ACK_BODIES = {
+    "duitku": {"status": "ok"},
+    "tripay": {"success": True},
+    "xendit": {"status": "ok"},
+}
+
+ROUTES = {
+    ("POST", "/callback/duitku"): "duitku",
+    ("POST", "/callback"): "tripay",
+    ("POST", "/webhook/xendit"): "xendit",
+}
+
+HEALTH_PATHS = {"/callback/duitku", "/health"}
+
+# 📥 Kalau CALLBACK_INBOX_DIR di-set: simpan dulu ke inbox, ack, proses di consumer
+inbox = None
+inbox_consumer = None
+
+# 🎥 Rekam callback masuk (raw body + headers) untuk di-replay dengan callback_replay.py
+capture = CaptureWriter(CAPTURE_FILE) if CAPTURE_FILE else None
+
+
+# 🧵 Kalau CALLBACK_WORKERS > 0: handler jalan di worker pool ber-shard per order
+worker_pool = None
+
+
+class HandlerFailed(RuntimeError):
+    """Handler return 5xx untuk record inbox: record harus diproses ulang, bukan dianggap selesai"""
+
+
+async def handle_status(scope, send, gateway):
+    """GET /status/{tripay|duitku}?reference=... untuk halaman return / poller: lookup bersamaan berbagi satu request"""
+    reference = dict(parse_qsl(scope.get("query_string", b"").decode())).get("reference", "")
+    if not reference:
+        await send_json(send, {"error": "reference wajib diisi"}, 400)
+        return
+    try:
+        response = await ASYNC_STATUS_LOOKUPS[gateway](reference)
+    except Exception as e:
+        log.warning("status_lookup_failed", lookup_gateway=gateway, reference=reference, error=str(e))
+        await send_json(send, {"error": "Gateway tidak bisa dihubungi"}, 502)
+        return
+    await send_json(send, {"gateway": gateway, "reference": reference, "response": response}, 200)
+
+
+def run_handler(gateway, raw_body, headers, strict=False):
+    body, status_code = GATEWAY_HANDLERS[gateway](raw_body, headers)
+    if strict and status_code >= 500:
+        raise HandlerFailed(f"{gateway} handler {status_code}: {body}")
+    return body, status_code
+
+
+def order_key(gateway, raw_body):
+    try:
+        key = ORDER_KEY_EXTRACTORS[gateway](raw_body)
+    except (ValueError, AttributeError):
+        key = None
+    # Body yang tidak bisa di-parse akan ditolak handler, shard mana pun boleh
+    return f"{gateway}:{key}" if key is not None else raw_body
+
+
+def start_worker_pool():
+    global worker_pool
+    if WORKERS and worker_pool is None:
+        worker_pool = ShardedWorkerPool(run_handler)
+    return worker_pool
+
+
+def stop_worker_pool():
+    global worker_pool
+    if worker_pool is not None:
+        worker_pool.close()
+        worker_pool = None
+
+
+def process_inbox_record(record):
+    """Raise (atau return Future yang raise) kalau record gagal, supaya checkpoint tidak melewatinya"""
+    if worker_pool is None:
+        run_handler(record.gateway, record.body, record.headers, True)
+        return None
+    # Blocking put: shard penuh = consumer berhenti membaca inbox (backpressure)
+    return worker_pool.submit(order_key(record.gateway, record.body), record.gateway, record.body, record.headers, True)
+
+
+def wait_inbox_records():
+    """Dipanggil consumer sebelum checkpoint: record yang masih di worker belum boleh dianggap selesai"""
+    # Status order juga harus sudah di disk sebelum record inbox-nya dilepas
+    if worker_pool is None:
+        flush_order_store()
+    elif worker_pool.mode == "process":
+        # Tiap proses shard punya OrderStore sendiri
+        worker_pool.call_each_shard(flush_order_store)
+    else:
+        worker_pool.join()
+        flush_order_store()
+
+
+def make_inbox_consumer():
+    return InboxConsumer(INBOX_DIR, process_inbox_record, barrier=wait_inbox_records)
+
+
+async def lifespan(scope, receive, send):
+    global inbox, inbox_consumer
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            start_worker_pool()
+            if INBOX_DIR:
+                inbox = CallbackInbox(INBOX_DIR)
+            if inbox is not None and EMBEDDED_CONSUMER:
+                inbox_consumer = make_inbox_consumer()
+                inbox_consumer.start()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if inbox_consumer is not None:
+                inbox_consumer.stop()
+            if inbox is not None:
+                inbox.close()
+            stop_worker_pool()
+            shutdown_render_pool()
+            if capture is not None:
+                capture.close()
+            await aclose_clients()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI entrypoint: route request ke handler gateway yang sesuai"""
+    if scope["type"] == "lifespan":
+        await lifespan(scope, receive, send)
+        return
+
+    method, path = scope["method"], scope["path"]
+    gateway = ROUTES.get((method, path))
+    if gateway is None:
+        if method == "GET" and path == "/qr":
+            # 🖼️ Render QR_STRING/QRIS ke PNG/SVG (cache + process pool, lihat qr_render.py)
+            await qr_app(scope, receive, send)
+        elif method == "GET" and path.startswith("/status/") and path[len("/status/"):] in ASYNC_STATUS_LOOKUPS:
+            await handle_status(scope, send, path[len("/status/"):])
+        elif method == "GET" and path in HEALTH_PATHS:
+            workers = worker_pool.snapshot() if worker_pool is not None else None
+            # Shard yang mati di-spawn ulang oleh pool; sampai itu selesai server dilaporkan degraded
+            degraded = workers is not None and workers["alive"] < workers["workers"]
+            await send_json(
+                send,
+                {
+                    "status": "degraded" if degraded else "ok",
+                    "message": "Callback server is running",
+                    "dedup": get_dedup().snapshot(),
+                    "orders": get_order_store().snapshot(),
+                    "workers": workers,
+                    "qr_cache": get_qr_cache().snapshot(),
+                    "status_lookup": get_single_flight().snapshot(),
+                    "json_codec": CODEC.name,
+                },
+                200,
+            )
+        else:
+            await send_json(send, {"error": "Not found"}, 404)
+        return
+
+    raw_body = await read_body(receive)
+    headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]}
+    if capture is not None:
+        capture.write(gateway, headers, raw_body)
+
+    # 🔒 IP allowlist per gateway (X-Forwarded-For ditelusuri lewat TRUSTED_PROXY_IP_ALLOWLIST)
+    remote_addr = scope["client"][0] if scope.get("client") else None
+    allowed, client_ip = IP_GUARDS[gateway].check(remote_addr, headers.get("x-forwarded-for"))
+    if not allowed:
+        log.warning("ip_not_whitelisted", callback_gateway=gateway, client_ip=client_ip)
+        await send_json(send, {"error": "Unauthorized IP"}, 403)
+        return
+
+    if inbox is not None:
+        # ✅ Ack setelah record durable; proses lambat di consumer tidak menahan response
+        await inbox.append_async(gateway, headers, raw_body)
+        await send_json(send, ACK_BODIES[gateway], 200)
+        return
+
+    if worker_pool is not None:
+        try:
+            body, status_code = await worker_pool.submit_async(order_key(gateway, raw_body), gateway, raw_body, headers)
+        except queue.Full:
+            # ⛔ Shard penuh -> 503, gateway akan retry callback-nya nanti
+            log.warning("worker_queue_full", callback_gateway=gateway)
+            await send_json(send, {"error": "Server busy"}, 503)
+            return
+        await send_json(send, body, status_code)
+        return
+
+    body, status_code = run_handler(gateway, raw_body, headers)
+    await send_json(send, body, status_code)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    host = os.getenv("FLASK_HOST", "0.0.0.0")
+    port = int(os.getenv("FLASK_PORT", 5000))
+    workers = int(os.getenv("CALLBACK_SERVER_WORKERS", 1))
+    if INBOX_DIR and workers > 1:
+        # Tiap proses uvicorn akan punya writer + consumer sendiri di dir yang sama -> segment saling timpa
+        print("❌ CALLBACK_INBOX_DIR hanya mendukung CALLBACK_SERVER_WORKERS=1 (pakai CALLBACK_WORKERS untuk paralel)")
+        exit(1)
+
+    print("=" * 70)
+    print("🚀 PAYMENT CALLBACK SERVER (ASGI)")
+    print("=" * 70)
+    print(f"Server running on http://localhost:{port}")
+    print(f"\n📡 Duitku (POST): http://localhost:{port}/callback/duitku")
+    print(f"📡 Tripay (POST): http://localhost:{port}/callback")
+    print(f"📡 Xendit (POST): http://localhost:{port}/webhook/xendit")
+    print(f"🩺 Health (GET) : http://localhost:{port}/health")
+    print(f"🖼️  QR     (GET) : http://localhost:{port}/qr?data=...&format=png&size=300")
+    print(f"🔎 Status (GET) : http://localhost:{port}/status/tripay?reference=... (juga /status/duitku)")
+    print(f"\n⚙️  Workers: {workers}")
+    print(f"🧾 JSON    : {CODEC.name}")
+    if WORKERS:
+        print(f"🧵 Shard   : {WORKERS} worker per proses (ordering per order)")
+    if INBOX_DIR:
+        print(f"📥 Inbox   : {INBOX_DIR} (consumer {'embedded' if EMBEDDED_CONSUMER else 'terpisah'})")
+    print("=" * 70 + "\n")
+
+    # proxy_headers=False: X-Forwarded-For diproses sendiri oleh ip_allowlist (trusted proxy chain)
+    uvicorn.run(
+        "callback_server:app",
+        host=host,
+        port=port,
+        workers=workers,
+        log_level="warning",
+        proxy_headers=False,
+    )
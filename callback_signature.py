@@ -0,0 +1,46 @@
+# callback_signature.py - Verifikasi signature callback (raw bytes, HMAC pre-keyed, constant-time)
+
+import hashlib
+import hmac
+
+
+def signature_matches(expected_signature, received_signature):
+    """Bandingkan signature secara constant-time"""
+    if not received_signature:
+        return False
+    try:
+        return hmac.compare_digest(expected_signature, received_signature)
+    except TypeError:
+        # Header berisi karakter non-ASCII -> pasti bukan hex digest
+        return False
+
+
+class HmacSha256Verifier:
+    """HMAC-SHA256 dengan state yang sudah di-key sekali; tiap request cukup copy() state-nya"""
+
+    __slots__ = ("_keyed",)
+
+    def __init__(self, key, encoding="utf-8"):
+        if isinstance(key, str):
+            key = key.encode(encoding)
+        self._keyed = hmac.new(key, digestmod=hashlib.sha256)
+
+    def with_prefix(self, prefix):
+        """Verifier baru yang state-nya sudah berisi prefix tetap (mis. merchant_code)"""
+        verifier = HmacSha256Verifier.__new__(HmacSha256Verifier)
+        verifier._keyed = self._keyed.copy()
+        verifier._keyed.update(prefix)
+        return verifier
+
+    def sign(self, raw_body):
+        mac = self._keyed.copy()
+        mac.update(raw_body)
+        return mac.hexdigest()
+
+    def verify(self, raw_body, received_signature):
+        return signature_matches(self.sign(raw_body), received_signature)
+
+
+def duitku_callback_signature(merchant_code, amount, merchant_order_id, api_key):
+    """MD5(merchantCode + amount + merchantOrderId + apiKey)"""
+    return hashlib.md5((merchant_code + amount + merchant_order_id + api_key).encode()).hexdigest()
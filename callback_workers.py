@@ -0,0 +1,248 @@
+# callback_workers.py - Worker pool ber-shard: callback untuk order yang sama selalu diproses berurutan
+
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from dotenv import load_dotenv
+from event_log import get_event_logger
+
+load_dotenv()
+
+log = get_event_logger("workers")
+
+WORKERS = int(os.getenv("CALLBACK_WORKERS", 0))
+QUEUE_SIZE = int(os.getenv("CALLBACK_WORKER_QUEUE_SIZE", 1000))
+# Interval cek proses shard yang mati (mode process) -> task shard itu digagalkan, prosesnya di-spawn ulang
+HEALTH_CHECK_SECONDS = 1.0
+# thread: satu proses (handler I/O bound); process: satu proses per shard supaya semua core terpakai
+MODE = os.getenv("CALLBACK_WORKER_MODE", "thread").lower()
+
+_STOP = None
+
+
+def shard_for(key, shards):
+    """Shard tetap per key (crc32, stabil antar proses/restart, beda dengan hash())"""
+    if isinstance(key, str):
+        key = key.encode()
+    return zlib.crc32(key) % shards
+
+
+def _run_thread_shard(handle, tasks, resolve):
+    while True:
+        task = tasks.get()
+        if task is _STOP:
+            return
+        task_id, func, args = task
+        try:
+            resolve(task_id, (func or handle)(*args), None)
+        except Exception as e:
+            resolve(task_id, None, e)
+
+
+def _run_process_shard(handle, tasks, results):
+    while True:
+        task = tasks.get()
+        if task is _STOP:
+            return
+        task_id, func, args = task
+        try:
+            results.put((task_id, (func or handle)(*args), None))
+        except Exception as e:
+            # Exception bisa saja tidak bisa di-pickle, kirim balik sebagai RuntimeError
+            results.put((task_id, None, RuntimeError(f"{type(e).__name__}: {e}")))
+
+
+class ShardedWorkerPool:
+    """N shard, masing-masing satu queue bounded + satu worker serial.
+
+    Task dengan key yang sama (mis. merchantOrderId) selalu masuk shard yang sama, jadi diproses
+    sesuai urutan submit tanpa lock per order; order berbeda jalan paralel di shard lain.
+    """
+
+    def __init__(self, handle, workers=WORKERS, queue_size=QUEUE_SIZE, mode=MODE):
+        if workers < 1:
+            raise ValueError("workers minimal 1")
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Mode worker tidak dikenal: {mode}")
+        self.handle = handle
+        self.workers = workers
+        self.mode = mode
+        self.queue_size = queue_size
+        # task_id -> (shard, Future)
+        self._futures = {}
+        self._next_task_id = 0
+        self._pending = 0
+        self.restarts = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+        if mode == "thread":
+            self._queues = [queue.Queue(queue_size) for _ in range(workers)]
+            self._workers = [
+                threading.Thread(
+                    target=_run_thread_shard,
+                    args=(handle, tasks, self._resolve),
+                    name=f"callback-shard-{shard}",
+                    daemon=True,
+                )
+                for shard, tasks in enumerate(self._queues)
+            ]
+        else:
+            # spawn: jangan fork proses yang sudah punya thread (event loop, log listener, sqlite)
+            self._context = multiprocessing.get_context("spawn")
+            self._queues = [self._context.Queue(queue_size) for _ in range(workers)]
+            self._results = self._context.Queue()
+            self._workers = [self._shard_process(shard) for shard in range(workers)]
+
+        for worker in self._workers:
+            worker.start()
+        if mode == "process":
+            # Setelah semua proses start: collector juga yang mendeteksi & spawn ulang shard yang mati
+            self._collector = threading.Thread(target=self._collect_results, name="callback-shard-results", daemon=True)
+            self._collector.start()
+
+    def _shard_process(self, shard):
+        return self._context.Process(
+            target=_run_process_shard,
+            args=(self.handle, self._queues[shard], self._results),
+            name=f"callback-shard-{shard}",
+            daemon=True,
+        )
+
+    def _collect_results(self):
+        next_check = time.monotonic() + HEALTH_CHECK_SECONDS
+        while True:
+            try:
+                result = self._results.get(timeout=HEALTH_CHECK_SECONDS)
+            except queue.Empty:
+                pass
+            else:
+                if result is _STOP:
+                    return
+                self._resolve(*result)
+            # Dicek juga saat results ramai, bukan hanya saat queue kosong
+            if time.monotonic() >= next_check:
+                next_check = time.monotonic() + HEALTH_CHECK_SECONDS
+                self._respawn_dead_shards()
+
+    def _respawn_dead_shards(self):
+        for shard, worker in enumerate(self._workers):
+            if worker.is_alive():
+                continue
+            with self._cond:
+                if self._closed:
+                    return
+                # Queue lama bisa saja rusak (proses mati saat memegang lock-nya) -> shard dapat queue baru.
+                # Pemilihan queue di _enqueue juga di bawah _cond, jadi semua task yang masuk queue lama ikut digagalkan
+                old_tasks = self._queues[shard]
+                self._queues[shard] = self._context.Queue(self.queue_size)
+                failed = [task_id for task_id, (task_shard, _) in self._futures.items() if task_shard == shard]
+                futures = [self._futures.pop(task_id)[1] for task_id in failed]
+                self._pending -= len(futures)
+                if not self._pending:
+                    self._cond.notify_all()
+                self._workers[shard] = self._shard_process(shard)
+                self._workers[shard].start()
+                self.restarts += 1
+            old_tasks.cancel_join_thread()
+            old_tasks.close()
+            log.error("worker_process_died", shard=shard, exitcode=worker.exitcode, pending=len(futures))
+            # Tidak tahu task mana yang sedang jalan saat proses mati -> semua task shard itu gagal, pemanggil yang retry
+            for future in futures:
+                future.set_exception(RuntimeError(f"Proses worker shard {shard} berhenti"))
+
+    def _resolve(self, task_id, result, error):
+        with self._cond:
+            entry = self._futures.pop(task_id, None)
+            if entry is None:
+                return
+            self._pending -= 1
+            if not self._pending:
+                self._cond.notify_all()
+        future = entry[1]
+        if error is not None:
+            log.error("worker_task_error", error=str(error))
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def submit(self, key, *args, block=True, timeout=None):
+        """Antrekan handle(*args) di shard milik key; raise queue.Full kalau shard penuh (backpressure)"""
+        return self._enqueue(shard_for(key, self.workers), None, args, block, timeout)
+
+    def call_each_shard(self, func, *args):
+        """Jalankan func(*args) sekali di tiap shard setelah task yang sudah antre (mis. flush state per proses)"""
+        futures = [self._enqueue(shard, func, args, True, None) for shard in range(self.workers)]
+        return [future.result() for future in futures]
+
+    def _enqueue(self, shard, func, args, block, timeout):
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Worker pool sudah ditutup")
+            task_id = self._next_task_id
+            self._next_task_id += 1
+            self._futures[task_id] = (shard, future)
+            self._pending += 1
+            tasks = self._queues[shard]
+        try:
+            if self.mode == "process" and block and timeout is None:
+                self._put_until_respawn(shard, tasks, (task_id, func, args))
+            else:
+                tasks.put((task_id, func, args), block, timeout)
+        except queue.Full:
+            with self._cond:
+                if self._futures.pop(task_id, None) is not None:
+                    self._pending -= 1
+                    if not self._pending:
+                        self._cond.notify_all()
+            raise
+        return future
+
+    def _put_until_respawn(self, shard, tasks, task):
+        # Queue shard yang prosesnya mati tidak akan pernah kosong lagi -> jangan block selamanya
+        while True:
+            try:
+                tasks.put(task, True, HEALTH_CHECK_SECONDS)
+                return
+            except queue.Full:
+                if self._queues[shard] is not tasks:
+                    # Shard sudah di-spawn ulang dan future task ini sudah digagalkan
+                    return
+            except ValueError:
+                # Queue lama sudah ditutup oleh _respawn_dead_shards
+                if self._queues[shard] is not tasks:
+                    return
+                raise
+
+    async def submit_async(self, key, *args):
+        """Versi asyncio: tidak pernah block event loop, langsung queue.Full kalau shard penuh"""
+        return await asyncio.wrap_future(self.submit(key, *args, block=False))
+
+    def join(self, timeout=None):
+        """Tunggu sampai semua task yang sudah di-submit selesai"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending, timeout)
+
+    def snapshot(self):
+        with self._cond:
+            pending = self._pending
+            alive = sum(worker.is_alive() for worker in self._workers)
+        return {"workers": self.workers, "alive": alive, "restarts": self.restarts, "mode": self.mode, "pending": pending}
+
+    def close(self):
+        """Selesaikan task yang sudah antre lalu hentikan worker"""
+        with self._cond:
+            self._closed = True
+        for tasks in self._queues:
+            tasks.put(_STOP)
+        for worker in list(self._workers):
+            worker.join()
+        if self.mode == "process":
+            self._results.put(_STOP)
+            self._collector.join()
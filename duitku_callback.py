@@ -1,11 +1,17 @@
 from flask import Flask, request, jsonify
-import hashlib
+import logging
 import os
 from dotenv import load_dotenv
+from callback_dedup import get_dedup
+from callback_signature import duitku_callback_signature, signature_matches
+from event_log import get_event_logger
+from ip_allowlist import IpGuard
+from order_store import FAILED, PAID, update_order_status
 
 load_dotenv()
 
 app = Flask(__name__)
+log = get_event_logger("duitku")
 
 MERCHANT_CODE = os.getenv("DUITKU_MERCHANT_CODE", "")
 API_KEY = os.getenv("DUITKU_API_KEY", "")
@@ -16,111 +22,94 @@ DUITKU_IPS_PRODUCTION = [
     "182.23.85.8", "182.23.85.9", "182.23.85.10", "182.23.85.13", "182.23.85.14",
     "103.177.101.184", "103.177.101.185", "103.177.101.186", "103.177.101.189", "103.177.101.190"
 ]
-DUITKU_IPS = DUITKU_IPS_SANDBOX + DUITKU_IPS_PRODUCTION
+DUITKU_ENV = os.getenv("DUITKU_ENV", "sandbox").lower()
+DUITKU_IPS = DUITKU_IPS_PRODUCTION if DUITKU_ENV == "production" else DUITKU_IPS_SANDBOX
+
+# 🔒 Aktif default di production; override via DUITKU_IP_WHITELIST / DUITKU_IP_ALLOWLIST(_FILE)
+IP_GUARD = IpGuard("DUITKU", DUITKU_IPS, enabled_default=DUITKU_ENV == "production")
 
 
 def verify_callback_signature(merchant_code, amount, merchant_order_id, api_key, received_signature):
     """Verify callback signature MD5(merchantCode + amount + merchantOrderId + apiKey)"""
-    signature_string = merchant_code + amount + merchant_order_id + api_key
-    expected_signature = hashlib.md5(signature_string.encode()).hexdigest()
-    
-    print("=" * 70)
-    print("🔐 SIGNATURE VERIFICATION")
-    print("=" * 70)
-    print(f"String to Hash: {merchant_code} + {amount} + {merchant_order_id} + {api_key[:10]}...")
-    print(f"Expected: {expected_signature}")
-    print(f"Received: {received_signature}")
-    print(f"Match: {expected_signature == received_signature}")
-    print("=" * 70)
-    
-    return expected_signature == received_signature
-
-
-def verify_ip_whitelist(client_ip):
-    """Verify if IP is from Duitku"""
-    # In production, check X-Forwarded-For if behind proxy
-    forwarded_for = request.headers.get('X-Forwarded-For')
-    if forwarded_for:
-        client_ip = forwarded_for.split(',')[0].strip()
-    
-    is_whitelisted = client_ip in DUITKU_IPS
-    print(f"🌐 IP Check: {client_ip} - {'✅ Whitelisted' if is_whitelisted else '❌ Not in whitelist'}")
+    expected_signature = duitku_callback_signature(merchant_code, amount, merchant_order_id, api_key)
+    is_valid = signature_matches(expected_signature, received_signature)
+    log.debug(
+        "signature_verification",
+        order_id=merchant_order_id,
+        expected=expected_signature,
+        received=received_signature,
+        match=is_valid,
+    )
+    return is_valid
+
+
+def verify_ip_whitelist(client_ip, forwarded_for=None):
+    """Verify if IP is from Duitku (X-Forwarded-For hanya dipercaya dari trusted proxy)"""
+    is_whitelisted, client_ip = IP_GUARD.check(client_ip, forwarded_for)
+    if not is_whitelisted:
+        log.warning("ip_not_whitelisted", client_ip=client_ip)
     return is_whitelisted
 
 
-@app.route("/callback/duitku", methods=["POST"])
-def handle_duitku_callback():
+def process_duitku_callback(data):
+    """Proses callback Duitku dari form data, return (body, status_code)"""
     try:
-        # 🌐 Get client IP
-        client_ip = request.remote_addr
-        
-        # 🔒 Optional: IP Whitelist Check (skip di development)
-        # if not verify_ip_whitelist(client_ip):
-        #     return jsonify({"error": "Unauthorized IP"}), 403
-        
-        # 📦 Parse form data (x-www-form-urlencoded)
-        data = request.form
-        
         merchant_code = data.get("merchantCode", "")
         amount = data.get("amount", "")
         merchant_order_id = data.get("merchantOrderId", "")
-        product_details = data.get("productDetails", "")
-        payment_code = data.get("paymentCode", "")
         result_code = data.get("resultCode", "")
         reference = data.get("reference", "")
         signature = data.get("signature", "")
-        publisher_order_id = data.get("publisherOrderId", "")
-        sp_user_hash = data.get("spUserHash", "")
-        settlement_date = data.get("settlementDate", "")
-        issuer_code = data.get("issuerCode", "")
-        additional_param = data.get("additionalParam", "")
-        merchant_user_id = data.get("merchantUserId", "")
         
-        # 📝 Log incoming callback
-        print("\n" + "=" * 70)
-        print("📡 DUITKU CALLBACK RECEIVED")
-        print("=" * 70)
-        print(f"Merchant Code     : {merchant_code}")
-        print(f"Order ID          : {merchant_order_id}")
-        print(f"Amount            : Rp {amount}")
-        print(f"Product           : {product_details}")
-        print(f"Payment Method    : {payment_code}")
-        print(f"Result Code       : {result_code} {'(SUCCESS)' if result_code == '00' else '(FAILED)'}")
-        print(f"Reference         : {reference}")
-        print(f"Publisher Order ID: {publisher_order_id}")
-        print(f"Settlement Date   : {settlement_date}")
-        print(f"Issuer Code       : {issuer_code}")
-        if sp_user_hash:
-            print(f"SP User Hash      : {sp_user_hash}")
-        print("=" * 70)
+        # 📝 Log incoming callback (payload lengkap hanya di level DEBUG)
+        log.info(
+            "callback_received",
+            order_id=merchant_order_id,
+            amount=amount,
+            payment_code=data.get("paymentCode", ""),
+            result_code=result_code,
+            reference=reference,
+            payload=data,
+        )
         
         # 🔐 Verify signature
         if not verify_callback_signature(merchant_code, amount, merchant_order_id, API_KEY, signature):
-            print("❌ Signature verification failed!")
-            return jsonify({"status": "error", "message": "Invalid signature"}), 401
+            log.warning("invalid_signature", order_id=merchant_order_id, reference=reference)
+            return {"status": "error", "message": "Invalid signature"}, 401
         
-        print("\n✅ Signature verified successfully!")
+        # 🔁 Duitku retry sampai dapat 200 -> callback yang sama cukup diproses sekali
+        dedup_key = f"duitku:{merchant_order_id}:{reference}:{result_code}"
+        if get_dedup().check_and_mark(dedup_key):
+            log.info("duplicate_callback", order_id=merchant_order_id, reference=reference)
+            return {"status": "ok"}, 200
         
         # 💰 Process payment based on result code
         if result_code == "00":
-            # 🎯 TODO: Update order status to PAID in database
-            # update_order_status(merchant_order_id, "PAID", reference)
-            print(f"\n💰 PAYMENT SUCCESS - Order {merchant_order_id}")
+            update_order_status(merchant_order_id, PAID, "duitku", reference)
+            log.info("payment_success", order_id=merchant_order_id, reference=reference)
             
         else:
-            # 🎯 TODO: Handle failed payment
-            # update_order_status(merchant_order_id, "FAILED", reference)
-            print(f"\n❌ PAYMENT FAILED - Order {merchant_order_id}")
+            update_order_status(merchant_order_id, FAILED, "duitku", reference)
+            log.info("payment_failed", order_id=merchant_order_id, reference=reference, result_code=result_code)
         
         # ✅ Must return HTTP 200 OK
-        return jsonify({"status": "ok"}), 200
+        return {"status": "ok"}, 200
         
     except Exception as e:
-        print(f"❌ Error processing callback: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.event("callback_error", logging.ERROR, exc_info=True, error=str(e))
         # Still return 200 to prevent Duitku from retrying
-        return jsonify({"status": "error", "message": str(e)}), 200
+        return {"status": "error", "message": str(e)}, 200
+
+
+@app.route("/callback/duitku", methods=["POST"])
+def handle_duitku_callback():
+    # 🔒 IP Whitelist Check (aktif di production, lihat IP_GUARD)
+    if not verify_ip_whitelist(request.remote_addr, request.headers.get("X-Forwarded-For")):
+        return jsonify({"error": "Unauthorized IP"}), 403
+    
+    # 📦 Parse form data (x-www-form-urlencoded)
+    body, status_code = process_duitku_callback(request.form.to_dict())
+    return jsonify(body), status_code
 
 
 @app.route("/return/duitku", methods=["GET"])
@@ -130,16 +119,8 @@ def handle_duitku_return():
     reference = request.args.get("reference", "")
     result_code = request.args.get("resultCode", "")
     
-    print("\n" + "=" * 70)
-    print("🔄 USER RETURNED FROM PAYMENT PAGE")
-    print("=" * 70)
-    print(f"Order ID    : {merchant_order_id}")
-    print(f"Reference   : {reference}")
-    print(f"Result Code : {result_code} {'(SUCCESS)' if result_code == '00' else '(PENDING/CANCEL)' if result_code == '01' else '(CANCELED)'}")
-    print("=" * 70)
-    print("⚠️  INFORMASI SAJA - Jangan update database di sini!")
-    print("📡 Tunggu callback untuk update status yang valid")
-    print("=" * 70)
+    # ⚠️ Informasi saja - jangan update database di sini, tunggu callback
+    log.info("user_returned", order_id=merchant_order_id, reference=reference, result_code=result_code)
     
     # Return simple HTML atau redirect ke halaman sukses/gagal
     if result_code == "00":
@@ -186,7 +167,8 @@ if __name__ == "__main__":
     print(f"Server running on http://localhost:{port}")
     print(f"\n📡 Callback URL (POST): http://localhost:{port}/callback/duitku")
     print(f"🔄 Return URL   (GET) : http://localhost:{port}/return/duitku")
-    print(f"\n📋 Duitku Sandbox IPs: {', '.join(DUITKU_IPS_SANDBOX)}")
+    print(f"\n📋 Duitku IPs ({DUITKU_ENV}): {', '.join(DUITKU_IPS)}")
+    print(f"🔒 IP Whitelist: {'aktif' if IP_GUARD.enabled else 'nonaktif'}")
     print(f"\n⚠️  PERBEDAAN CALLBACK vs RETURN:")
     print("   Callback: POST, update database ✅")
     print("   Return  : GET, informasi UX saja ⚠️")
@@ -1,16 +1,16 @@
-import http.client
 import hashlib
-import json
 from datetime import datetime
-from urllib.parse import urlparse
 from dotenv import load_dotenv
 import os
+from gateway_client import get_client
+from json_codec import JSON_CONTENT_TYPE, dumps, dumps_pretty
+from gateway_models import DuitkuInquiry
 
 load_dotenv()
 
 MERCHANT_CODE = os.getenv("DUITKU_MERCHANT_CODE", "")
 API_KEY = os.getenv("DUITKU_API_KEY", "")
-INQUIRY_URL = "https://sandbox.duitku.com/webapi/api/merchant/v2/inquiry"
+INQUIRY_PATH = "/v2/inquiry"
 
 merchant_order_id = f"ORDER-{datetime.now().strftime('%Y%m%d%H%M%S')}"
 payment_amount = 40000
@@ -33,22 +33,14 @@ payload = {
 }
 
 print(f"Signature: {signature}")
-print(f"Payload: {json.dumps(payload, indent=2)}\n")
+print(f"Payload: {dumps_pretty(payload)}\n")
 
-parsed_url = urlparse(INQUIRY_URL)
-host = str(parsed_url.netloc)
-path = str(parsed_url.path)
+response = get_client("duitku").post(INQUIRY_PATH, content=dumps(payload), headers=JSON_CONTENT_TYPE)
+inquiry = DuitkuInquiry.from_response(response)
 
-conn = http.client.HTTPSConnection(host)
-headers = {"Content-Type": "application/json"}
-
-conn.request("POST", path, body=json.dumps(payload), headers=headers)
-
-response = conn.getresponse()
-data = response.read().decode("utf-8")
-
-print(f"Status: {response.status}")
+print(f"Status: {response.status_code}")
 print(f"Order ID: {merchant_order_id}")
-print(f"Response: {data}")
-
-conn.close()
+print(f"Response: {response.text}")
+if response.status_code == 200 and inquiry.succeeded:
+    print(f"Reference  : {inquiry.reference}")
+    print(f"Payment URL: {inquiry.payment_url}")
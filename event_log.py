@@ -0,0 +1,121 @@
+# event_log.py - Structured event logging (1 baris JSON per event) lewat background queue
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from dotenv import load_dotenv
+from json_codec import dumps_str
+
+load_dotenv()
+
+LOG_LEVEL = os.getenv("EVENT_LOG_LEVEL", "INFO").upper()
+QUEUE_SIZE = int(os.getenv("EVENT_LOG_QUEUE_SIZE", 10_000))
+DEFAULT_SAMPLE_RATE = float(os.getenv("EVENT_LOG_SAMPLE", 1))
+
+ROOT_LOGGER_NAME = "payment"
+
+
+class JsonLineFormatter(logging.Formatter):
+    """Format record jadi satu baris JSON compact (dijalankan di thread listener)"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "gateway": record.name.rpartition(".")[2],
+            "event": record.msg,
+        }
+        entry.update(getattr(record, "event_fields", {}))
+        payload = getattr(record, "payload", None)
+        if payload is not None:
+            entry["payload"] = payload
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        try:
+            return dumps_str(entry, default=str)
+        except TypeError:
+            # orjson/msgspec menolak key non-str & int > 64-bit; json stdlib tidak
+            return json.dumps(entry, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler yang tidak format di thread request dan drop record kalau queue penuh"""
+
+    dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DeferredQueueHandler.dropped += 1
+
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+def _setup():
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+        log_queue = queue.Queue(QUEUE_SIZE)
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(JsonLineFormatter())
+
+        root = logging.getLogger(ROOT_LOGGER_NAME)
+        root.setLevel(LOG_LEVEL)
+        root.propagate = False
+        root.addHandler(DeferredQueueHandler(log_queue))
+
+        _listener = logging.handlers.QueueListener(log_queue, stream_handler)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+class EventLogger:
+    """Logger per gateway: event(name, **fields) dengan level, sampling dan payload lazy"""
+
+    __slots__ = ("logger", "sample_rate")
+
+    def __init__(self, gateway):
+        _setup()
+        self.logger = logging.getLogger(f"{ROOT_LOGGER_NAME}.{gateway}")
+        self.sample_rate = float(os.getenv(f"EVENT_LOG_SAMPLE_{gateway.upper()}", DEFAULT_SAMPLE_RATE))
+
+    def event(self, name, level=logging.INFO, payload=None, exc_info=False, **fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        # 🎲 Sampling hanya untuk event di bawah WARNING; warning/error selalu tercatat
+        if level < logging.WARNING and self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+        extra = {"event_fields": fields}
+        # Payload lengkap hanya ikut (dan di-serialize) kalau level DEBUG aktif
+        if payload is not None and self.logger.isEnabledFor(logging.DEBUG):
+            extra["payload"] = payload
+        self.logger.log(level, name, extra=extra, exc_info=exc_info)
+
+    def debug(self, name, **fields):
+        self.event(name, logging.DEBUG, **fields)
+
+    def info(self, name, **fields):
+        self.event(name, logging.INFO, **fields)
+
+    def warning(self, name, **fields):
+        self.event(name, logging.WARNING, **fields)
+
+    def error(self, name, **fields):
+        self.event(name, logging.ERROR, **fields)
+
+
+def get_event_logger(gateway):
+    return EventLogger(gateway)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# fee_engine.py - Hitung fee Tripay lokal (banyak channel x banyak amount sekaligus) dari data payment-channel
+
+import argparse
+import sys
+from decimal import ROUND_HALF_UP, Decimal
+from json_codec import dumps_str
+from reference_cache import fetch_tripay_fee, tripay_payment_channels
+
+# Persen disimpan sebagai basis poin (0.70% -> 70) supaya hitungan tetap integer rupiah
+BASIS_POINTS = 10_000
+
+
+def to_basis_points(percent):
+    # Lewat str: float 0.7 (= 0.69999...) tetap jadi tepat 70
+    return int((Decimal(str(percent or 0)) * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def ceil_div(numerator, denominator):
+    return -(-numerator // denominator)
+
+
+class FeeTable:
+    """Definisi fee per channel disimpan kolom per kolom (satu list per atribut, index = channel)"""
+
+    def __init__(self, channels):
+        self.codes = []
+        self.merchant_flat = []
+        self.merchant_bp = []
+        self.customer_flat = []
+        self.customer_bp = []
+        self.minimum_fee = []
+        self.maximum_fee = []
+        self.minimum_amount = []
+        self.maximum_amount = []
+        for channel in channels:
+            fee_merchant = channel.get("fee_merchant") or {}
+            fee_customer = channel.get("fee_customer") or {}
+            self.codes.append(channel["code"])
+            self.merchant_flat.append(int(fee_merchant.get("flat") or 0))
+            self.merchant_bp.append(to_basis_points(fee_merchant.get("percent")))
+            self.customer_flat.append(int(fee_customer.get("flat") or 0))
+            self.customer_bp.append(to_basis_points(fee_customer.get("percent")))
+            self.minimum_fee.append(int(channel["minimum_fee"]) if channel.get("minimum_fee") else None)
+            self.maximum_fee.append(int(channel["maximum_fee"]) if channel.get("maximum_fee") else None)
+            self.minimum_amount.append(int(channel.get("minimum_amount") or 0))
+            self.maximum_amount.append(int(channel["maximum_amount"]) if channel.get("maximum_amount") else None)
+        self.index = {code: i for i, code in enumerate(self.codes)}
+
+    @classmethod
+    def from_cache(cls):
+        """Dari response /merchant/payment-channel yang sudah di-cache (reference_cache)"""
+        return cls(tripay_payment_channels()["data"])
+
+    def quote(self, amounts, codes=None):
+        """Fee untuk setiap channel x setiap amount dalam satu panggilan.
+
+        Return {code: {"amount", "fee_merchant", "fee_customer", "total_fee", "available"}} berisi list
+        sejajar dengan `amounts`. Persen dibulatkan ke atas per rupiah; minimum/maximum_fee membatasi
+        total fee, selisihnya ditanggung merchant (fee customer tidak pernah melebihi total fee).
+        """
+        amounts = [int(amount) for amount in amounts]
+        result = {}
+        for code in codes or self.codes:
+            i = self.index[code]
+            m_flat, m_bp = self.merchant_flat[i], self.merchant_bp[i]
+            c_flat, c_bp = self.customer_flat[i], self.customer_bp[i]
+            fee_customer = [c_flat + ceil_div(amount * c_bp, BASIS_POINTS) for amount in amounts]
+            total_fee = [
+                fee + m_flat + ceil_div(amount * m_bp, BASIS_POINTS) for fee, amount in zip(fee_customer, amounts)
+            ]
+            minimum_fee, maximum_fee = self.minimum_fee[i], self.maximum_fee[i]
+            if minimum_fee is not None:
+                total_fee = [max(fee, minimum_fee) for fee in total_fee]
+            if maximum_fee is not None:
+                total_fee = [min(fee, maximum_fee) for fee in total_fee]
+                fee_customer = [min(customer, total) for customer, total in zip(fee_customer, total_fee)]
+            minimum_amount, maximum_amount = self.minimum_amount[i], self.maximum_amount[i]
+            result[code] = {
+                "amount": amounts,
+                "fee_merchant": [total - customer for total, customer in zip(total_fee, fee_customer)],
+                "fee_customer": fee_customer,
+                "total_fee": total_fee,
+                "available": [
+                    amount >= minimum_amount and (maximum_amount is None or amount <= maximum_amount)
+                    for amount in amounts
+                ],
+            }
+        return result
+
+    def quote_one(self, code, amount):
+        quote = self.quote([amount], [code])[code]
+        return {name: values[0] for name, values in quote.items()}
+
+
+def verify(table, amounts, codes=None):
+    """Bandingkan hasil lokal dengan fee-calculator Tripay (langsung ke API, bukan cache); return daftar selisih"""
+    mismatches = []
+    for code, quote in table.quote(amounts, codes).items():
+        for j, amount in enumerate(quote["amount"]):
+            remote = fetch_tripay_fee(code, amount)["data"][0]["total_fee"]
+            expected = {"fee_merchant": int(remote["merchant"]), "fee_customer": int(remote["customer"])}
+            local = {"fee_merchant": quote["fee_merchant"][j], "fee_customer": quote["fee_customer"][j]}
+            if local != expected:
+                mismatches.append({"code": code, "amount": amount, "local": local, "remote": expected})
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kalkulator fee Tripay lokal (tanpa API call per amount)")
+    parser.add_argument("amounts", nargs="+", type=int)
+    parser.add_argument("--code", action="append", help="Channel tertentu (default semua channel)")
+    parser.add_argument("--json", action="store_true", help="Output JSON kolom per channel")
+    parser.add_argument("--verify", action="store_true", help="Cocokkan dengan fee-calculator Tripay")
+    args = parser.parse_args()
+
+    table = FeeTable.from_cache()
+    if args.verify:
+        mismatches = verify(table, args.amounts, args.code)
+        checked = len(args.code or table.codes) * len(args.amounts)
+        if mismatches:
+            for mismatch in mismatches:
+                print(dumps_str(mismatch))
+            print(f"❌ {len(mismatches)} dari {checked} kombinasi beda dengan fee-calculator Tripay")
+            sys.exit(1)
+        print(f"✅ {checked} kombinasi cocok dengan fee-calculator Tripay")
+        return
+
+    quotes = table.quote(args.amounts, args.code)
+    if args.json:
+        print(dumps_str(quotes))
+        return
+    print(f"{'channel':<14}{'amount':>12}{'merchant':>10}{'customer':>10}{'total':>10}")
+    for code, quote in quotes.items():
+        for j, amount in enumerate(quote["amount"]):
+            note = "" if quote["available"][j] else "  (di luar min/max amount)"
+            print(
+                f"{code:<14}{amount:>12,}{quote['fee_merchant'][j]:>10,}"
+                f"{quote['fee_customer'][j]:>10,}{quote['total_fee'][j]:>10,}{note}"
+            )
+
+
+if __name__ == "__main__":
+    main()
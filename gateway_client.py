@@ -0,0 +1,151 @@
+# gateway_client.py - HTTP client bersama per gateway (keep-alive pool, HTTP/2 opsional, sync & async)
+
+import atexit
+import os
+import ssl
+import threading
+import httpx
+from dotenv import load_dotenv
+from gateway_ratelimit import AsyncRateLimitedTransport, RateLimitedTransport, get_rate_limiter
+from gateway_resilience import AsyncResilientTransport, ResilientTransport, RetryPolicy
+
+load_dotenv()
+
+MAX_CONNECTIONS = int(os.getenv("GATEWAY_HTTP_MAX_CONNECTIONS", 20))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GATEWAY_HTTP_MAX_KEEPALIVE", 10))
+KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("GATEWAY_HTTP_KEEPALIVE_EXPIRY_SECONDS", 30))
+TIMEOUT_SECONDS = float(os.getenv("GATEWAY_HTTP_TIMEOUT_SECONDS", 30))
+HTTP2 = os.getenv("GATEWAY_HTTP2", "False").lower() == "true"
+
+try:
+    import h2  # noqa: F401  (httpx[http2])
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+def xendit_secret_key():
+    if os.getenv("XENDIT_ENV", "development").lower() == "production":
+        return os.getenv("XENDIT_SECRET_KEY_PROD")
+    return os.getenv("XENDIT_SECRET_KEY_DEV")
+
+
+def gateway_config(gateway):
+    """base_url + header/auth default per gateway"""
+    if gateway == "tripay":
+        api_key = os.getenv("TRIPAY_API_KEY")
+        return {
+            "base_url": os.getenv("TRIPAY_BASE_URL", "https://tripay.co.id/api-sandbox"),
+            "headers": {"Authorization": "Bearer " + api_key} if api_key else {},
+        }
+    if gateway == "duitku":
+        return {"base_url": os.getenv("DUITKU_BASE_URL", "https://sandbox.duitku.com/webapi/api/merchant")}
+    if gateway == "xendit":
+        return {
+            "base_url": os.getenv("XENDIT_BASE_URL", "https://api.xendit.co"),
+            "headers": {"accept": "application/json", "api-version": os.getenv("XENDIT_API_VERSION", "2024-11-11")},
+            "auth": httpx.BasicAuth(username=xendit_secret_key() or "", password=""),
+        }
+    raise ValueError(f"Gateway tidak dikenal: {gateway}")
+
+
+_ssl_context = None
+
+
+def ssl_context():
+    """Satu SSLContext untuk semua client: CA bundle cukup di-load sekali per proses"""
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = httpx.create_ssl_context()
+    return _ssl_context
+
+
+# Default retry per gateway; bisa di-override lewat {GATEWAY}_REQUEST_MAX_RETRIES dll.
+RETRY_DEFAULTS = {
+    "xendit": {"base_delay": 1.5},
+}
+
+
+def transport_options():
+    return {
+        "verify": ssl_context(),
+        "http2": HTTP2 and HTTP2_AVAILABLE,
+        "limits": httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS,
+        ),
+    }
+
+
+def client_options(gateway, asynchronous=False):
+    """Argumen httpx.Client/AsyncClient: transport pool -> rate limiter -> retry + circuit breaker"""
+    policy = RetryPolicy.from_env(gateway, **RETRY_DEFAULTS.get(gateway, {}))
+    limiter = get_rate_limiter(gateway)
+    # Rate limiter di bawah retry: tiap percobaan ulang juga antre token
+    if asynchronous:
+        limited = AsyncRateLimitedTransport(httpx.AsyncHTTPTransport(**transport_options()), limiter)
+        transport = AsyncResilientTransport(limited, gateway, policy)
+    else:
+        limited = RateLimitedTransport(httpx.HTTPTransport(**transport_options()), limiter)
+        transport = ResilientTransport(limited, gateway, policy)
+    options = gateway_config(gateway)
+    options.update(
+        transport=transport,
+        timeout=float(os.getenv(f"{gateway.upper()}_REQUEST_TIMEOUT_SECONDS", TIMEOUT_SECONDS)),
+    )
+    return options
+
+
+_clients = {}
+_async_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(gateway):
+    """httpx.Client bersama (thread-safe) per gateway; koneksi TCP+TLS dipakai ulang antar request"""
+    client = _clients.get(gateway)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(gateway)
+            if client is None:
+                client = _clients[gateway] = httpx.Client(**client_options(gateway))
+    return client
+
+
+def get_async_client(gateway):
+    """httpx.AsyncClient bersama per gateway untuk event loop yang sedang jalan"""
+    # asyncio baru di-import di jalur async: command sync (payctl, script) hemat ~40 ms startup
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(gateway)
+    if entry is None or entry[0] is not loop:
+        # Pool async terikat ke satu event loop (mis. tiap asyncio.run() buat loop baru)
+        entry = _async_clients[gateway] = (loop, httpx.AsyncClient(**client_options(gateway, asynchronous=True)))
+    return entry[1]
+
+
+def close_clients():
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
+
+
+async def aclose_clients():
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    for gateway, (client_loop, client) in list(_async_clients.items()):
+        if client_loop is loop:
+            del _async_clients[gateway]
+            await client.aclose()
+
+
+atexit.register(close_clients)
+
+if HTTP2 and not HTTP2_AVAILABLE:
+    print("⚠️  GATEWAY_HTTP2=True tapi paket h2 belum terpasang (pip install 'httpx[http2]'), pakai HTTP/1.1")
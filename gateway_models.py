@@ -0,0 +1,195 @@
+# gateway_models.py - Model response gateway (__slots__, JSON & field di-decode saat pertama diakses)
+
+from json_codec import loads, response_json
+
+# Action Xendit: descriptor URL -> redirect, QR_STRING -> qr, type API_POST_REQUEST -> api_post
+URL_DESCRIPTORS = ("WEB_URL", "DEEPLINK_URL")
+URL_PREFIXES = ("https://", "http://")
+# Fallback kalau tidak ada action redirect: URL pertama di path yang mirip redirect/checkout
+REDIRECT_KEYWORDS = ("actions", "redirect", "checkout", "deeplink", "payment_url")
+RETURN_URL_KEYS = ("success_return_url", "failure_return_url")
+
+
+class Field:
+    """Descriptor: baca key dari JSON response (opsional dikonversi) hanya saat atribut diakses"""
+
+    __slots__ = ("key", "convert")
+
+    def __init__(self, key, convert=None):
+        self.key = key
+        self.convert = convert
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        value = instance.data.get(self.key)
+        if value is None or self.convert is None:
+            return value
+        return self.convert(value)
+
+
+class GatewayResponse:
+    """Bungkus body response; json.loads baru jalan saat field pertama dibaca"""
+
+    __slots__ = ("_raw", "_data")
+
+    def __init__(self, data=None, raw=None):
+        self._data = data
+        self._raw = raw
+
+    @classmethod
+    def from_response(cls, response):
+        return cls(raw=response.content)
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = loads(self._raw) if self._raw else {}
+        return self._data
+
+
+def iter_urls(payload):
+    """(path, url) untuk semua string http(s) di payload, tanpa rekursi & list perantara"""
+    stack = [("", payload)]
+    while stack:
+        path, value = stack.pop()
+        if isinstance(value, dict):
+            # reversed + stack -> urutan keluar sama dengan urutan key di JSON
+            for key in reversed(list(value)):
+                stack.append((f"{path}.{key}" if path else key, value[key]))
+        elif isinstance(value, list):
+            for index in range(len(value) - 1, -1, -1):
+                stack.append((f"{path}[{index}]", value[index]))
+        elif isinstance(value, str) and value.startswith(URL_PREFIXES):
+            yield path, value
+
+
+class XenditActions:
+    """Semua action payment request diklasifikasi dalam satu loop"""
+
+    __slots__ = ("redirects", "qr_strings", "api_posts", "others", "redirect_url")
+
+    def __init__(self, actions):
+        self.redirects = []
+        self.qr_strings = []
+        self.api_posts = []
+        self.others = []
+        self.redirect_url = None
+        for action in actions:
+            action_type = action.get("type", "-")
+            descriptor = action.get("descriptor", "-")
+            value = action.get("value")
+            entry = (action_type, descriptor, value)
+            if descriptor in URL_DESCRIPTORS:
+                self.redirects.append(entry)
+                if (
+                    self.redirect_url is None
+                    and action_type == "REDIRECT_CUSTOMER"
+                    and isinstance(value, str)
+                    and value.startswith(URL_PREFIXES)
+                ):
+                    self.redirect_url = value
+            elif descriptor == "QR_STRING":
+                self.qr_strings.append(entry)
+            elif action_type == "API_POST_REQUEST":
+                self.api_posts.append(entry)
+            else:
+                self.others.append(entry)
+
+
+class XenditPaymentRequest(GatewayResponse):
+    """Response POST /v3/payment_requests"""
+
+    __slots__ = ("_actions",)
+
+    payment_request_id = Field("payment_request_id")
+    reference_id = Field("reference_id")
+    status = Field("status")
+    request_amount = Field("request_amount")
+    channel_code = Field("channel_code")
+
+    def __init__(self, data=None, raw=None):
+        super().__init__(data, raw)
+        self._actions = None
+
+    @property
+    def raw_actions(self):
+        return self.data.get("actions") or []
+
+    @property
+    def actions(self):
+        if self._actions is None:
+            self._actions = XenditActions(self.raw_actions)
+        return self._actions
+
+    @property
+    def qr_string(self):
+        for _, _, value in self.actions.qr_strings:
+            if isinstance(value, str) and value:
+                return value
+        return None
+
+    @property
+    def payment_url(self):
+        """Action redirect, lalu field payment_url, lalu URL pertama di path mirip redirect"""
+        url = self.actions.redirect_url or self.data.get("payment_url")
+        if url:
+            return url
+        for path, url in iter_urls(self.data):
+            normalized_path = path.lower()
+            if any(key in normalized_path for key in RETURN_URL_KEYS):
+                continue
+            if any(keyword in normalized_path for keyword in REDIRECT_KEYWORDS):
+                return url
+        return None
+
+    def urls(self):
+        return list(iter_urls(self.data))
+
+
+class TripayTransaction(GatewayResponse):
+    """Field `data` response /transaction/create atau /transaction/detail Tripay"""
+
+    __slots__ = ()
+
+    reference = Field("reference")
+    merchant_ref = Field("merchant_ref")
+    payment_method = Field("payment_method")
+    payment_name = Field("payment_name")
+    status = Field("status")
+    amount = Field("amount", int)
+    fee_merchant = Field("fee_merchant", int)
+    fee_customer = Field("fee_customer", int)
+    total_fee = Field("total_fee", int)
+    amount_received = Field("amount_received", int)
+    pay_code = Field("pay_code")
+    checkout_url = Field("checkout_url")
+    qr_string = Field("qr_string")
+    qr_url = Field("qr_url")
+    expired_time = Field("expired_time", int)
+    paid_at = Field("paid_at", int)
+    order_items = Field("order_items")
+
+    @classmethod
+    def from_response(cls, response):
+        """Response lengkap {"success", "message", "data"} -> model dari `data`"""
+        return cls((response_json(response) or {}).get("data") or {})
+
+
+class DuitkuInquiry(GatewayResponse):
+    """Response POST /v2/inquiry Duitku"""
+
+    __slots__ = ()
+
+    merchant_code = Field("merchantCode")
+    reference = Field("reference")
+    payment_url = Field("paymentUrl")
+    va_number = Field("vaNumber")
+    qr_string = Field("qrString")
+    amount = Field("amount", int)
+    status_code = Field("statusCode")
+    status_message = Field("statusMessage")
+
+    @property
+    def succeeded(self):
+        return self.status_code == "00"
@@ -0,0 +1,343 @@
+# gateway_ratelimit.py - Token bucket per gateway/endpoint + antrean prioritas & fair queuing untuk call ke gateway
+
+import heapq
+import itertools
+import os
+import threading
+import time
+import httpx
+from dotenv import load_dotenv
+from event_log import get_event_logger
+from gateway_resilience import ID_SEGMENT, DeadlineExceeded, clamp_timeout_to_deadline, retry_after_seconds
+
+load_dotenv()
+
+log = get_event_logger("gateway")
+
+# Request per detik per gateway; override lewat {GATEWAY}_RATE_LIMIT_PER_SECOND (0 = tanpa limit)
+RATE_LIMIT_DEFAULTS = {
+    "tripay": 10,
+    "duitku": 10,
+    "xendit": 20,
+}
+
+# Angka kecil dilayani duluan; pilih lewat extensions={"priority": "batch"}
+PRIORITIES = {"live": 0, "default": 1, "batch": 2}
+
+# Setelah 429 rate turun setengah (minimal MIN_RATE_FRACTION x limit), naik lagi sedikit per response sukses
+MIN_RATE_FRACTION = 0.1
+RECOVERY_STEP = 0.02
+
+
+class _Waiter:
+    __slots__ = ("event", "future", "loop", "granted", "cancelled")
+
+    def __init__(self, future=None, loop=None):
+        self.event = None if future is not None else threading.Event()
+        self.future = future
+        self.loop = loop
+        self.granted = False
+        self.cancelled = False
+
+    def grant(self):
+        self.granted = True
+        if self.event is not None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class TokenBucket:
+    """Token bucket dengan antrean: prioritas dulu, lalu start-time fair queuing antar flow (job)"""
+
+    def __init__(self, name, rate, burst=None):
+        self.name = name
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.stats = {"granted": 0, "queued": 0, "throttled": 0}
+        self._queue = []
+        self._flow_tags = {}
+        self._virtual_time = 0.0
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if now < self.paused_until:
+            self.updated = now
+            return
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _take_now(self, now):
+        """Fast path: antrean kosong dan token ada"""
+        self._refill(now)
+        if not self._queue and self.tokens >= 1:
+            self.tokens -= 1
+            self.stats["granted"] += 1
+            return True
+        return False
+
+    def _enqueue(self, waiter, priority, flow):
+        # Tiap flow dapat giliran bergantian walau salah satu job mengantrekan ribuan request sekaligus
+        tag = max(self._virtual_time, self._flow_tags.get(flow, 0.0)) + 1
+        self._flow_tags[flow] = tag
+        heapq.heappush(self._queue, (PRIORITIES.get(priority, PRIORITIES["default"]), tag, next(self._seq), waiter))
+        self.stats["queued"] += 1
+
+    def _dispatch(self, now):
+        """Bagi token ke kepala antrean; return detik sampai token berikutnya (None kalau antrean kosong)"""
+        self._refill(now)
+        while self._queue and self.tokens >= 1:
+            _, tag, _, waiter = heapq.heappop(self._queue)
+            if waiter.cancelled:
+                continue
+            self.tokens -= 1
+            self._virtual_time = tag
+            self.stats["granted"] += 1
+            waiter.grant()
+        if not self._queue:
+            self._flow_tags.clear()
+            return None
+        return max(self.paused_until - now, (1 - self.tokens) / self.rate, 0.001)
+
+    def _give_up(self, waiter):
+        """Berhenti antre (deadline habis); return True kalau ternyata token sudah diberikan"""
+        with self._lock:
+            if waiter.granted:
+                return True
+            waiter.cancelled = True
+            return False
+
+    def acquire(self, priority="default", flow=None, deadline=None):
+        """Tunggu token; return False kalau deadline (time.monotonic()) habis lebih dulu"""
+        with self._lock:
+            now = time.monotonic()
+            if self._take_now(now):
+                return True
+            waiter = _Waiter()
+            self._enqueue(waiter, priority, flow or priority)
+            wait = self._dispatch(now)
+        # Tidak ada thread dispatcher: yang menunggu bangun saat token berikutnya jatuh tempo lalu membagikannya
+        while not waiter.granted:
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return self._give_up(waiter)
+                wait = remaining if wait is None else min(wait, remaining)
+            waiter.event.wait(wait)
+            with self._lock:
+                wait = self._dispatch(time.monotonic())
+        return True
+
+    async def acquire_async(self, priority="default", flow=None, deadline=None):
+        # Import lokal: client sync tidak perlu memuat asyncio
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            now = time.monotonic()
+            if self._take_now(now):
+                return True
+            waiter = _Waiter(loop.create_future(), loop)
+            self._enqueue(waiter, priority, flow or priority)
+            wait = self._dispatch(now)
+        try:
+            while not waiter.granted:
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return self._give_up(waiter)
+                    wait = remaining if wait is None else min(wait, remaining)
+                try:
+                    await asyncio.wait_for(asyncio.shield(waiter.future), wait)
+                except asyncio.TimeoutError:
+                    pass
+                with self._lock:
+                    wait = self._dispatch(time.monotonic())
+        except BaseException:
+            with self._lock:
+                waiter.cancelled = True
+                if waiter.granted:
+                    # Token sudah diberikan tapi request batal -> kembalikan
+                    self.tokens += 1
+            raise
+        return True
+
+    def release(self):
+        """Kembalikan token yang sudah diambil tapi request-nya batal sebelum dikirim"""
+        with self._lock:
+            self.tokens += 1
+            self._dispatch(time.monotonic())
+
+    def on_throttled(self, retry_after=None):
+        """Gateway menjawab 429: pause sampai Retry-After dan turunkan rate (AIMD)"""
+        with self._lock:
+            now = time.monotonic()
+            self.rate = max(self.max_rate * MIN_RATE_FRACTION, self.rate / 2)
+            self.tokens = 0.0
+            self.paused_until = max(self.paused_until, now + (retry_after if retry_after is not None else 1 / self.rate))
+            self.updated = now
+            self.stats["throttled"] += 1
+            rate = self.rate
+        log.warning("rate_limit_throttled", bucket=self.name, rate=round(rate, 2), retry_after=retry_after)
+
+    def on_success(self):
+        if self.rate < self.max_rate:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * RECOVERY_STEP)
+
+    def snapshot(self):
+        return {"rate": round(self.rate, 2), "max_rate": self.max_rate, "queue": len(self._queue), **self.stats}
+
+
+def parse_endpoint_limits(value):
+    """'GET /merchant/transactions=2,POST /transaction/create=5' -> {(method, path): rate}"""
+    limits = {}
+    for part in (value or "").split(","):
+        if "=" in part:
+            endpoint, rate = part.rsplit("=", 1)
+            method, path = endpoint.split()
+            limits[(method.upper(), path)] = float(rate)
+    return limits
+
+
+class RateLimiter:
+    """Bucket gateway (semua endpoint) + bucket opsional per endpoint"""
+
+    def __init__(self, gateway, rate, endpoint_limits=None):
+        self.gateway = gateway
+        self.bucket = TokenBucket(gateway, rate) if rate > 0 else None
+        self.endpoint_buckets = {
+            (method, path): TokenBucket(f"{gateway} {method} {path}", endpoint_rate)
+            for (method, path), endpoint_rate in (endpoint_limits or {}).items()
+            if endpoint_rate > 0
+        }
+
+    @classmethod
+    def from_env(cls, gateway):
+        prefix = gateway.upper()
+        rate = float(os.getenv(f"{prefix}_RATE_LIMIT_PER_SECOND", RATE_LIMIT_DEFAULTS.get(gateway, 0)))
+        return cls(gateway, rate, parse_endpoint_limits(os.getenv(f"{prefix}_RATE_LIMITS")))
+
+    def buckets_for(self, request):
+        buckets = []
+        if self.endpoint_buckets:
+            path = ID_SEGMENT.sub("/{id}", request.url.path)
+            # Path di env relatif ke base_url, mis. /transaction/create (tanpa /api-sandbox)
+            for (method, endpoint_path), bucket in self.endpoint_buckets.items():
+                if request.method == method and path.endswith(endpoint_path):
+                    buckets.append(bucket)
+                    break
+        if self.bucket is not None:
+            buckets.append(self.bucket)
+        return buckets
+
+    def record(self, buckets, response):
+        if response.status_code == 429:
+            retry_after = retry_after_seconds(response)
+            for bucket in buckets:
+                bucket.on_throttled(retry_after)
+        elif response.status_code < 500:
+            for bucket in buckets:
+                bucket.on_success()
+
+    def snapshot(self):
+        snapshot = {"gateway": self.bucket.snapshot() if self.bucket else None}
+        snapshot.update({bucket.name: bucket.snapshot() for bucket in self.endpoint_buckets.values()})
+        return snapshot
+
+
+# Limiter per gateway dipakai bersama client sync & async di proses yang sama
+LIMITERS = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(gateway):
+    limiter = LIMITERS.get(gateway)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = LIMITERS.get(gateway)
+            if limiter is None:
+                limiter = LIMITERS[gateway] = RateLimiter.from_env(gateway)
+    return limiter
+
+
+def set_rate_limit(gateway, rate):
+    """Override limit gateway untuk proses ini (mis. --rate di bulk job sesuai kuota akun), 0 = tanpa limit"""
+    limiter = get_rate_limiter(gateway)
+    limiter.bucket = TokenBucket(gateway, rate) if rate > 0 else None
+
+
+def request_class(request):
+    priority = request.extensions.get("priority", "default")
+    return priority, request.extensions.get("flow") or priority
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """Tunggu giliran di token bucket sebelum request (termasuk tiap retry) dikirim"""
+
+    def __init__(self, transport, limiter):
+        self.transport = transport
+        self.limiter = limiter
+
+    def handle_request(self, request):
+        buckets = self.limiter.buckets_for(request)
+        priority, flow = request_class(request)
+        deadline = request.extensions.get("deadline")
+        acquired = []
+        try:
+            for bucket in buckets:
+                if not bucket.acquire(priority, flow, deadline):
+                    raise DeadlineExceeded("Deadline request habis saat antre rate limit", request=request)
+                acquired.append(bucket)
+            # Waktu antre dihitung: timeout percobaan dipotong ke sisa deadline
+            clamp_timeout_to_deadline(request)
+        except BaseException:
+            # Token dari bucket sebelumnya tidak terpakai -> kembalikan, jangan hilang dari kuota
+            for bucket in acquired:
+                bucket.release()
+            raise
+        response = self.transport.handle_request(request)
+        self.limiter.record(buckets, response)
+        return response
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport, limiter):
+        self.transport = transport
+        self.limiter = limiter
+
+    async def handle_async_request(self, request):
+        buckets = self.limiter.buckets_for(request)
+        priority, flow = request_class(request)
+        deadline = request.extensions.get("deadline")
+        acquired = []
+        try:
+            for bucket in buckets:
+                if not await bucket.acquire_async(priority, flow, deadline):
+                    raise DeadlineExceeded("Deadline request habis saat antre rate limit", request=request)
+                acquired.append(bucket)
+            clamp_timeout_to_deadline(request)
+        except BaseException:
+            # Termasuk CancelledError saat antre di bucket berikutnya
+            for bucket in acquired:
+                bucket.release()
+            raise
+        response = await self.transport.handle_async_request(request)
+        self.limiter.record(buckets, response)
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
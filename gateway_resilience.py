@@ -0,0 +1,381 @@
+# gateway_resilience.py - Retry (exponential backoff + jitter), retry budget & circuit breaker untuk call ke gateway
+
+import email.utils
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+import httpx
+from dotenv import load_dotenv
+from event_log import get_event_logger
+
+load_dotenv()
+
+log = get_event_logger("gateway")
+
+# Retry hanya boleh menambah maksimal RATIO x request asli (+ MIN per detik) dalam satu window
+RETRY_BUDGET_RATIO = float(os.getenv("GATEWAY_RETRY_BUDGET_RATIO", 0.2))
+RETRY_BUDGET_MIN_PER_SECOND = float(os.getenv("GATEWAY_RETRY_BUDGET_MIN_PER_SECOND", 1))
+RETRY_BUDGET_WINDOW_SECONDS = 10
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+# Segment path yang berisi angka dianggap ID -> satu breaker per endpoint, bukan per transaksi
+ID_SEGMENT = re.compile(r"/[^/]*\d[^/]*")
+
+
+class CircuitOpenError(httpx.RequestError):
+    """Breaker endpoint sedang open: gagal cepat tanpa request ke gateway"""
+
+
+class DeadlineExceeded(httpx.TimeoutException):
+    """Deadline keseluruhan (semua percobaan + backoff) sudah habis sebelum percobaan berikutnya"""
+
+
+class RetryPolicy:
+    __slots__ = ("max_retries", "base_delay", "max_delay", "failure_threshold", "reset_seconds")
+
+    def __init__(self, max_retries=2, base_delay=0.5, max_delay=10.0, failure_threshold=5, reset_seconds=30.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+
+    @classmethod
+    def from_env(cls, gateway, **defaults):
+        """{GATEWAY}_REQUEST_MAX_RETRIES, {GATEWAY}_RETRY_DELAY_SECONDS, dst. (pola XENDIT_REQUEST_*)"""
+        prefix = gateway.upper()
+        policy = cls(**defaults)
+        return cls(
+            max_retries=int(os.getenv(f"{prefix}_REQUEST_MAX_RETRIES", policy.max_retries)),
+            base_delay=float(os.getenv(f"{prefix}_RETRY_DELAY_SECONDS", policy.base_delay)),
+            max_delay=float(os.getenv(f"{prefix}_RETRY_MAX_DELAY_SECONDS", policy.max_delay)),
+            failure_threshold=int(os.getenv(f"{prefix}_CIRCUIT_FAILURE_THRESHOLD", policy.failure_threshold)),
+            reset_seconds=float(os.getenv(f"{prefix}_CIRCUIT_RESET_SECONDS", policy.reset_seconds)),
+        )
+
+    def backoff(self, attempt):
+        """Full jitter: acak di [0, min(max_delay, base * 2^(attempt-1))]"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+
+class RetryBudget:
+    """Budget retry global per proses supaya retry tidak melipatgandakan beban saat gateway down"""
+
+    def __init__(self, ratio=RETRY_BUDGET_RATIO, min_per_second=RETRY_BUDGET_MIN_PER_SECOND, window=RETRY_BUDGET_WINDOW_SECONDS):
+        self.ratio = ratio
+        self.min_retries = min_per_second * window
+        self.window = window
+        self._requests = deque()
+        self._retries = deque()
+        self._lock = threading.Lock()
+
+    def _prune(self, now):
+        cutoff = now - self.window
+        for events in (self._requests, self._retries):
+            while events and events[0] < cutoff:
+                events.popleft()
+
+    def record_request(self):
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            self._requests.append(now)
+
+    def try_spend(self):
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            if len(self._retries) >= self.min_retries + self.ratio * len(self._requests):
+                return False
+            self._retries.append(now)
+            return True
+
+
+class CircuitBreaker:
+    """closed -> open setelah N kegagalan beruntun -> half-open (1 probe) setelah reset_seconds"""
+
+    def __init__(self, name, failure_threshold, reset_seconds):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                # Satu request percobaan; yang lain tetap gagal cepat sampai hasilnya ketahuan
+                self.state = "half_open"
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                log.info("circuit_closed", endpoint=self.name)
+            self.state = "closed"
+            self.failures = 0
+
+    def record_aborted(self):
+        """Percobaan berhenti tanpa response (deadline, cancel, rate limiter): probe half-open dihitung gagal"""
+        with self._lock:
+            if self.state == "half_open":
+                log.warning("circuit_probe_aborted", endpoint=self.name)
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    log.warning("circuit_open", endpoint=self.name, failures=self.failures)
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+GLOBAL_RETRY_BUDGET = RetryBudget()
+
+# Breaker per endpoint dipakai bersama client sync & async di proses yang sama
+BREAKERS = {}
+_breakers_lock = threading.Lock()
+
+
+def retry_after_seconds(response):
+    """Header Retry-After (detik atau HTTP-date) -> detik, None kalau tidak ada/invalid"""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retry_safe(request, error):
+    """Request yang bisa mengubah data hanya di-retry kalau pasti belum sampai ke gateway"""
+    if request.method in IDEMPOTENT_METHODS or request.extensions.get("idempotent"):
+        return True
+    if any(name.lower() == "idempotency-key" for name in request.headers):
+        return True
+    return isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+
+
+def apply_deadline(request, attempts_left):
+    """extensions={"deadline": time.monotonic() + detik}: sisa waktu dibagi rata ke percobaan yang tersisa"""
+    deadline = request.extensions.get("deadline")
+    if deadline is None:
+        return
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded("Deadline request habis", request=request)
+    # Timeout per percobaan asli disimpan sekali, percobaan berikutnya dihitung ulang dari situ
+    configured = request.extensions.get("attempt_timeout")
+    if configured is None:
+        configured = request.extensions.get("timeout") or {}
+    share = remaining / max(1, attempts_left)
+    timeout = {
+        name: share if configured.get(name) is None else min(configured[name], share)
+        for name in ("connect", "read", "write", "pool")
+    }
+    request.extensions = {**request.extensions, "attempt_timeout": configured, "timeout": timeout}
+
+
+def clamp_timeout_to_deadline(request):
+    """Potong timeout percobaan ke sisa deadline (mis. setelah antre di rate limiter)"""
+    deadline = request.extensions.get("deadline")
+    if deadline is None:
+        return
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded("Deadline request habis", request=request)
+    timeout = request.extensions.get("timeout") or {}
+    request.extensions = {
+        **request.extensions,
+        "timeout": {
+            name: remaining if timeout.get(name) is None else min(timeout[name], remaining)
+            for name in ("connect", "read", "write", "pool")
+        },
+    }
+
+
+class _ResilienceMixin:
+    def __init__(self, transport, gateway, policy=None, budget=GLOBAL_RETRY_BUDGET):
+        self.transport = transport
+        self.gateway = gateway
+        self.log = get_event_logger(gateway)
+        self.policy = policy or RetryPolicy.from_env(gateway)
+        self.budget = budget
+
+    def breaker_for(self, request):
+        name = f"{self.gateway} {request.method} {ID_SEGMENT.sub('/{id}', request.url.path)}"
+        breaker = BREAKERS.get(name)
+        if breaker is None:
+            with _breakers_lock:
+                breaker = BREAKERS.setdefault(
+                    name, CircuitBreaker(name, self.policy.failure_threshold, self.policy.reset_seconds)
+                )
+        return breaker
+
+    def next_delay(self, request, attempt, breaker, response=None, error=None):
+        """Detik tunggu sebelum retry berikutnya, atau None kalau tidak di-retry"""
+        if attempt > self.policy.max_retries or breaker.state == "open":
+            # Breaker baru saja open -> kembalikan hasil asli, jangan retry ke gateway yang down
+            return None
+        if response is not None:
+            if response.status_code not in RETRY_STATUS_CODES:
+                return None
+            # 429 berarti belum diproses; 5xx pada POST belum tentu aman diulang
+            if response.status_code != 429 and not is_retry_safe(request, None):
+                return None
+            delay = retry_after_seconds(response)
+            if delay is not None and delay > self.policy.max_delay:
+                return None
+        else:
+            if not is_retry_safe(request, error):
+                return None
+            delay = None
+        if delay is None:
+            delay = self.policy.backoff(attempt)
+        deadline = request.extensions.get("deadline")
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+        if not self.budget.try_spend():
+            self.log.warning("retry_budget_exhausted", path=request.url.path)
+            return None
+        return delay
+
+    def log_retry(self, request, attempt, delay, response=None, error=None):
+        self.log.warning(
+            "gateway_retry",
+            method=request.method,
+            path=request.url.path,
+            attempt=attempt,
+            delay=round(delay, 3),
+            status=response.status_code if response is not None else None,
+            error=type(error).__name__ if error is not None else None,
+        )
+
+
+def _counts_as_failure(response):
+    return response.status_code >= 500
+
+
+class ResilientTransport(_ResilienceMixin, httpx.BaseTransport):
+    """Bungkus transport httpx sync dengan retry + budget + circuit breaker"""
+
+    def send_attempt(self, request, attempt, breaker):
+        """Satu percobaan; setiap jalan keluar mencatat hasil ke breaker supaya probe half-open tidak menggantung"""
+        try:
+            apply_deadline(request, self.policy.max_retries - attempt + 2)
+            response = self.transport.handle_request(request)
+        except DeadlineExceeded:
+            breaker.record_aborted()
+            raise
+        except httpx.TransportError:
+            breaker.record_failure()
+            raise
+        except BaseException:
+            breaker.record_aborted()
+            raise
+        if _counts_as_failure(response):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    def handle_request(self, request):
+        breaker = self.breaker_for(request)
+        self.budget.record_request()
+        attempt = 0
+        while True:
+            attempt += 1
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuit open: {breaker.name}", request=request)
+            try:
+                response = self.send_attempt(request, attempt, breaker)
+            except httpx.TransportError as e:
+                delay = self.next_delay(request, attempt, breaker, error=e)
+                if delay is None:
+                    raise
+                self.log_retry(request, attempt, delay, error=e)
+                time.sleep(delay)
+                continue
+
+            delay = self.next_delay(request, attempt, breaker, response=response)
+            if delay is None:
+                return response
+            response.close()
+            self.log_retry(request, attempt, delay, response=response)
+            time.sleep(delay)
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncResilientTransport(_ResilienceMixin, httpx.AsyncBaseTransport):
+    """Versi asyncio: backoff pakai asyncio.sleep, event loop tidak ikut tertahan"""
+
+    async def send_attempt(self, request, attempt, breaker):
+        # CancelledError (mis. request hedge yang kalah) masuk BaseException -> record_aborted
+        try:
+            apply_deadline(request, self.policy.max_retries - attempt + 2)
+            response = await self.transport.handle_async_request(request)
+        except DeadlineExceeded:
+            breaker.record_aborted()
+            raise
+        except httpx.TransportError:
+            breaker.record_failure()
+            raise
+        except BaseException:
+            breaker.record_aborted()
+            raise
+        if _counts_as_failure(response):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    async def handle_async_request(self, request):
+        # Import lokal: client sync tidak perlu memuat asyncio
+        import asyncio
+
+        breaker = self.breaker_for(request)
+        self.budget.record_request()
+        attempt = 0
+        while True:
+            attempt += 1
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuit open: {breaker.name}", request=request)
+            try:
+                response = await self.send_attempt(request, attempt, breaker)
+            except httpx.TransportError as e:
+                delay = self.next_delay(request, attempt, breaker, error=e)
+                if delay is None:
+                    raise
+                self.log_retry(request, attempt, delay, error=e)
+                await asyncio.sleep(delay)
+                continue
+
+            delay = self.next_delay(request, attempt, breaker, response=response)
+            if delay is None:
+                return response
+            await response.aclose()
+            self.log_retry(request, attempt, delay, response=response)
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self.transport.aclose()
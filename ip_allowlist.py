@@ -0,0 +1,147 @@
+# ip_allowlist.py - IP allowlist (IP/CIDR) untuk endpoint callback + parsing X-Forwarded-For via trusted proxy
+
+import ipaddress
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RELOAD_CHECK_SECONDS = float(os.getenv("IP_ALLOWLIST_RELOAD_SECONDS", 5))
+CACHE_SIZE = 4096
+
+
+def parse_entries(text):
+    """Satu IP/CIDR per baris atau dipisah koma, '#' untuk komentar"""
+    entries = []
+    for line in text.splitlines():
+        line = line.split("#", 1)[0]
+        entries.extend(entry.strip() for entry in line.split(",") if entry.strip())
+    return entries
+
+
+class IpAllowlist:
+    """IP/CIDR di-compile jadi set prefix per panjang prefix -> lookup O(jumlah panjang prefix)"""
+
+    def __init__(self, entries=()):
+        self.exact = set()
+        tables = {4: {}, 6: {}}
+        for entry in entries:
+            network = ipaddress.ip_network(entry, strict=False)
+            if network.num_addresses == 1:
+                self.exact.add(str(network.network_address))
+            shift = network.max_prefixlen - network.prefixlen
+            tables[network.version].setdefault(shift, set()).add(int(network.network_address) >> shift)
+        self.v4 = sorted(tables[4].items())
+        self.v6 = sorted(tables[6].items())
+        # Sumber callback cuma segelintir IP -> hasil lookup string di-cache
+        self._cache = {}
+
+    def __contains__(self, ip):
+        if not ip:
+            return False
+        if ip in self.exact:
+            return True
+        cached = self._cache.get(ip)
+        if cached is None:
+            if len(self._cache) >= CACHE_SIZE:
+                self._cache.clear()
+            cached = self._cache[ip] = self._lookup(ip)
+        return cached
+
+    def _lookup(self, ip):
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        value = int(address)
+        table = self.v4 if address.version == 4 else self.v6
+        return any((value >> shift) in prefixes for shift, prefixes in table)
+
+
+class ReloadableAllowlist:
+    """Allowlist dari default + env, atau dari file yang di-reload otomatis saat berubah (tanpa restart)"""
+
+    def __init__(self, entries=(), path=None, check_interval=RELOAD_CHECK_SECONDS):
+        self.entries = list(entries)
+        self.path = path
+        self.check_interval = check_interval
+        self._mtime = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.current = IpAllowlist(self.entries)
+        self.reload()
+
+    def reload(self):
+        """Compile ulang dari file; allowlist lama tetap dipakai kalau file invalid"""
+        if not self.path:
+            return False
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime == self._mtime:
+                return False
+            with open(self.path) as f:
+                compiled = IpAllowlist(parse_entries(f.read()))
+        except (OSError, ValueError):
+            return False
+        self._mtime = mtime
+        self.current = compiled
+        return True
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.check_interval
+            self.reload()
+
+    def __contains__(self, ip):
+        if self.path:
+            self._maybe_reload()
+        return ip in self.current
+
+
+def allowlist_from_env(prefix, default_entries=()):
+    """{PREFIX}_IP_ALLOWLIST (koma) menambah default; {PREFIX}_IP_ALLOWLIST_FILE menggantikan keduanya"""
+    extra = parse_entries(os.getenv(f"{prefix}_IP_ALLOWLIST", ""))
+    return ReloadableAllowlist(list(default_entries) + extra, path=os.getenv(f"{prefix}_IP_ALLOWLIST_FILE") or None)
+
+
+TRUSTED_PROXIES = allowlist_from_env("TRUSTED_PROXY")
+
+
+def resolve_client_ip(remote_addr, forwarded_for, trusted_proxies=TRUSTED_PROXIES):
+    """IP client asli: telusuri X-Forwarded-For dari kanan selama hop-nya trusted proxy"""
+    if not forwarded_for or remote_addr not in trusted_proxies:
+        # Request tidak lewat proxy kita -> header X-Forwarded-For tidak bisa dipercaya
+        return remote_addr
+    client_ip = remote_addr
+    for hop in reversed(forwarded_for.split(",")):
+        hop = hop.strip()
+        if not hop:
+            continue
+        client_ip = hop
+        if hop not in trusted_proxies:
+            break
+    return client_ip
+
+
+class IpGuard:
+    """Allowlist per gateway + flag aktif, dipakai Flask handler maupun callback_server"""
+
+    def __init__(self, prefix, default_entries=(), enabled_default=False):
+        self.allowlist = allowlist_from_env(prefix, default_entries)
+        self.enabled = os.getenv(f"{prefix}_IP_WHITELIST", str(enabled_default)).lower() == "true"
+
+    def check(self, remote_addr, forwarded_for=None):
+        """Return (allowed, client_ip)"""
+        client_ip = resolve_client_ip(remote_addr, forwarded_for)
+        if not self.enabled:
+            return True, client_ip
+        return client_ip in self.allowlist, client_ip
@@ -0,0 +1,130 @@
+# json_codec.py - Codec JSON pluggable: orjson / msgspec kalau ter-install, fallback json stdlib
+
+import json
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# auto = orjson -> msgspec -> json; bisa dipaksa mis. JSON_BACKEND=json untuk debug
+JSON_BACKEND = os.getenv("JSON_BACKEND", "auto").lower()
+BACKEND_ORDER = ("orjson", "msgspec", "json")
+
+# Header request httpx untuk body hasil dumps() (pengganti json=payload)
+JSON_CONTENT_TYPE = {"Content-Type": "application/json"}
+
+
+class StdlibCodec:
+    """json bawaan; loads menerima bytes langsung (encoding UTF-8/16/32 dideteksi sendiri)"""
+
+    name = "json"
+    # UnicodeDecodeError & JSONDecodeError sama-sama turunan ValueError
+    decode_errors = (ValueError,)
+
+    def loads(self, data):
+        return json.loads(data)
+
+    def dumps(self, obj, default=None):
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=default).encode()
+
+    def dumps_pretty(self, obj):
+        return json.dumps(obj, indent=2, ensure_ascii=False)
+
+
+class OrjsonCodec:
+    name = "orjson"
+    decode_errors = (ValueError,)
+
+    def __init__(self):
+        import orjson
+
+        self._orjson = orjson
+        self._loads = orjson.loads
+        self._dumps = orjson.dumps
+
+    def loads(self, data):
+        return self._loads(data)
+
+    def dumps(self, obj, default=None):
+        return self._dumps(obj, default=default)
+
+    def dumps_pretty(self, obj):
+        return self._dumps(obj, option=self._orjson.OPT_INDENT_2).decode()
+
+
+class MsgspecCodec:
+    name = "msgspec"
+
+    def __init__(self):
+        import msgspec
+
+        self._msgspec = msgspec
+        self._decoder = msgspec.json.Decoder()
+        self._encoder = msgspec.json.Encoder()
+        # msgspec.DecodeError bukan ValueError
+        self.decode_errors = (ValueError, msgspec.DecodeError)
+
+    def loads(self, data):
+        return self._decoder.decode(data)
+
+    def dumps(self, obj, default=None):
+        if default is None:
+            return self._encoder.encode(obj)
+        return self._msgspec.json.encode(obj, enc_hook=default)
+
+    def dumps_pretty(self, obj):
+        return self._msgspec.json.format(self._encoder.encode(obj), indent=2).decode()
+
+
+CODECS = {
+    "orjson": OrjsonCodec,
+    "msgspec": MsgspecCodec,
+    "json": StdlibCodec,
+}
+
+
+def load_codec(name):
+    """Instance codec `name`; ImportError kalau library-nya tidak ter-install"""
+    if name not in CODECS:
+        raise ValueError(f"JSON_BACKEND harus salah satu dari: auto, {', '.join(CODECS)}")
+    return CODECS[name]()
+
+
+def available_codecs():
+    codecs = []
+    for name in BACKEND_ORDER:
+        try:
+            codecs.append(load_codec(name))
+        except ImportError:
+            pass
+    return codecs
+
+
+def select_codec(backend=JSON_BACKEND):
+    if backend != "auto":
+        return load_codec(backend)
+    # Berhenti di backend pertama yang ter-install: msgspec tidak ikut di-import kalau orjson ada
+    for name in BACKEND_ORDER:
+        try:
+            return load_codec(name)
+        except ImportError:
+            pass
+
+
+CODEC = select_codec()
+
+# API modul: dipakai langsung, mis. `from json_codec import loads, dumps`
+loads = CODEC.loads
+dumps = CODEC.dumps
+dumps_pretty = CODEC.dumps_pretty
+DECODE_ERRORS = CODEC.decode_errors
+
+
+def dumps_str(obj, default=None):
+    """JSON compact sebagai str (baris NDJSON, print)"""
+    return dumps(obj, default).decode()
+
+
+def response_json(response):
+    """Body response httpx di-parse langsung dari bytes (tanpa response.text perantara)"""
+    return loads(response.content)
@@ -0,0 +1,174 @@
+# order_store.py - Status order in-memory + state machine, persist ke SQLite secara write-behind
+
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+from event_log import get_event_logger
+
+load_dotenv()
+
+log = get_event_logger("orders")
+
+ORDER_STORE_PATH = os.getenv("ORDER_STORE_PATH", "order_status.db")
+FLUSH_INTERVAL_MS = float(os.getenv("ORDER_STORE_FLUSH_MS", 50))
+
+PENDING = "PENDING"
+PAID = "PAID"
+FAILED = "FAILED"
+EXPIRED = "EXPIRED"
+REFUNDED = "REFUNDED"
+
+# Transisi yang boleh; status lain tidak bisa mundur (PAID tidak tertimpa PENDING/FAILED yang telat)
+TRANSITIONS = {
+    None: {PENDING, PAID, FAILED, EXPIRED},
+    PENDING: {PAID, FAILED, EXPIRED},
+    PAID: {REFUNDED},
+    FAILED: set(),
+    EXPIRED: set(),
+    REFUNDED: set(),
+}
+
+
+class OrderStatus:
+    __slots__ = ("order_id", "status", "gateway", "reference", "updated_at")
+
+    def __init__(self, order_id, status, gateway, reference, updated_at):
+        self.order_id = order_id
+        self.status = status
+        self.gateway = gateway
+        self.reference = reference
+        self.updated_at = updated_at
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class OrderStore:
+    """Read dari dict in-memory, write di-batch ke SQLite oleh thread write-behind"""
+
+    def __init__(self, path=ORDER_STORE_PATH, flush_interval_ms=FLUSH_INTERVAL_MS):
+        self.flush_interval = flush_interval_ms / 1000
+        self.orders = {}
+        self.stats = {"applied": 0, "unchanged": 0, "rejected": 0, "flushed": 0, "flushes": 0}
+        self._dirty = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS order_status ("
+            "order_id TEXT PRIMARY KEY, status TEXT NOT NULL, gateway TEXT, reference TEXT, updated_at REAL)"
+        )
+        for row in self._db.execute("SELECT order_id, status, gateway, reference, updated_at FROM order_status"):
+            self.orders[row[0]] = OrderStatus(*row)
+
+        self._thread = threading.Thread(target=self._flush_loop, name="order-store-flush", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def get(self, order_id):
+        return self.orders.get(order_id)
+
+    def update(self, order_id, status, gateway=None, reference=None):
+        """Terapkan transisi status; return (applied, status_sekarang)"""
+        if status not in TRANSITIONS:
+            raise ValueError(f"Status order tidak dikenal: {status}")
+        with self._lock:
+            current = self.orders.get(order_id)
+            current_status = current.status if current is not None else None
+            if current_status == status:
+                self.stats["unchanged"] += 1
+                return False, current_status
+            if status not in TRANSITIONS[current_status]:
+                self.stats["rejected"] += 1
+                log.warning("order_transition_rejected", order_id=order_id, current=current_status, received=status)
+                return False, current_status
+            order = OrderStatus(
+                order_id,
+                status,
+                gateway or (current.gateway if current is not None else None),
+                reference or (current.reference if current is not None else None),
+                time.time(),
+            )
+            self.orders[order_id] = order
+            self._dirty[order_id] = order
+            self.stats["applied"] += 1
+        return True, status
+
+    def flush(self):
+        """Tulis semua perubahan yang belum tersimpan dalam satu transaksi"""
+        with self._flush_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, {}
+            if not dirty:
+                return 0
+            try:
+                self._db.execute("BEGIN")
+                self._db.executemany(
+                    "INSERT INTO order_status (order_id, status, gateway, reference, updated_at) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(order_id) DO UPDATE SET status = excluded.status, gateway = excluded.gateway, "
+                    "reference = excluded.reference, updated_at = excluded.updated_at",
+                    [(o.order_id, o.status, o.gateway, o.reference, o.updated_at) for o in dirty.values()],
+                )
+                self._db.execute("COMMIT")
+            except sqlite3.Error:
+                if self._db.in_transaction:
+                    self._db.execute("ROLLBACK")
+                with self._lock:
+                    # Kembalikan ke antrean; update yang lebih baru tetap menang
+                    for order_id, order in dirty.items():
+                        self._dirty.setdefault(order_id, order)
+                raise
+            self.stats["flushed"] += len(dirty)
+            self.stats["flushes"] += 1
+            return len(dirty)
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                log.error("order_flush_error", error=str(e))
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, orders=len(self.orders), dirty=len(self._dirty))
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+        self.flush()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_order_store():
+    """Instance OrderStore bersama untuk semua handler (dibuat saat pertama dipakai)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = OrderStore()
+    return _store
+
+
+def update_order_status(order_id, status, gateway=None, reference=None):
+    return get_order_store().update(order_id, status, gateway, reference)
+
+
+def flush_order_store():
+    """Flush store kalau sudah pernah dipakai di proses ini"""
+    return _store.flush() if _store is not None else 0
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+# payctl.py - Satu CLI untuk operasi Tripay / Duitku / Xendit; modul gateway & HTTP stack baru di-import per subcommand
+
+import argparse
+import builtins
+import os
+import sys
+import time
+
+STARTED = time.perf_counter()
+
+
+class ImportProfile:
+    """Catat import modul baru (durasi kumulatif, termasuk sub-import) selama command berjalan"""
+
+    def __init__(self):
+        self.entries = []
+        self.depth = 0
+        self._original = builtins.__import__
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return self._original(name, globals, locals, fromlist, level)
+        depth = self.depth
+        self.depth += 1
+        started = time.perf_counter()
+        try:
+            return self._original(name, globals, locals, fromlist, level)
+        finally:
+            self.depth = depth
+            self.entries.append((depth, name, time.perf_counter() - started))
+
+    def __enter__(self):
+        self.modules_before = len(sys.modules)
+        builtins.__import__ = self._import
+        return self
+
+    def __exit__(self, *exc):
+        builtins.__import__ = self._original
+        self.new_modules = len(sys.modules) - self.modules_before
+
+    def report(self, startup, elapsed, limit=12):
+        imports = sum(seconds for depth, _, seconds in self.entries if depth == 0)
+        print(
+            f"⏱️  startup payctl {startup * 1000:.1f} ms | import {imports * 1000:.1f} ms ({self.new_modules} modul baru)"
+            f" | command {(elapsed - imports) * 1000:.1f} ms | total {(startup + elapsed) * 1000:.1f} ms",
+            file=sys.stderr,
+        )
+        # Dua level teratas, urut paling lama; sisanya lihat `python -X importtime payctl.py ...`
+        top = sorted((e for e in self.entries if e[0] <= 1), key=lambda e: e[2], reverse=True)[:limit]
+        for depth, name, seconds in top:
+            print(f"   {seconds * 1000:8.1f} ms  {'  ' * depth}{name}", file=sys.stderr)
+
+
+def emit(obj):
+    from json_codec import dumps_str
+
+    print(dumps_str(obj))
+
+
+def read_items(args, comments=True):
+    """Item dari argumen + file -f (satu per baris, '#' komentar kalau comments, '-' = stdin)"""
+    items = list(args.items)
+    if args.file:
+        source = sys.stdin if args.file == "-" else open(args.file)
+        try:
+            for line in source:
+                item = (line.split("#", 1)[0] if comments else line).strip()
+                if item:
+                    items.append(item)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+    if not items:
+        raise SystemExit("❌ Tidak ada input: beri argumen atau -f FILE")
+    return items
+
+
+# ---- Tripay -------------------------------------------------------------------------------------
+
+
+def cmd_tripay_channels(args):
+    from reference_cache import tripay_payment_channels
+
+    emit(tripay_payment_channels(args.code))
+
+
+def cmd_tripay_fee(args):
+    from reference_cache import tripay_fee
+
+    for amount in args.amounts:
+        emit(tripay_fee(args.code, amount))
+
+
+def cmd_tripay_quote(args):
+    from fee_engine import FeeTable
+
+    emit(FeeTable.from_cache().quote(args.amounts, args.code))
+
+
+def cmd_tripay_instruction(args):
+    from reference_cache import tripay_payment_instruction
+
+    params = {"pay_code": args.pay_code} if args.pay_code else {}
+    emit(tripay_payment_instruction(args.code, **params))
+
+
+def bulk_or_lookup(gateway, lookup_name, args):
+    """-f FILE -> bulk concurrent (bulk_status_check); argumen saja -> lookup single-flight per item"""
+    if args.file and not args.items:
+        from bulk_status_check import run_cli
+
+        run_cli(gateway, [args.file, "-o", args.output] + (["-c", str(args.concurrency)] if args.concurrency else []))
+        return
+    import status_lookup
+
+    lookup = getattr(status_lookup, lookup_name)
+    # Bentuk baris sama dengan mode bulk (tanpa http_status: lookup hanya mengembalikan body)
+    for item in read_items(args):
+        emit({"gateway": gateway, "reference": item, "response": lookup(item)})
+
+
+def cmd_tripay_status(args):
+    bulk_or_lookup("tripay", "tripay_check_status", args)
+
+
+def cmd_tripay_detail(args):
+    import status_lookup
+
+    for reference in read_items(args):
+        emit({"gateway": "tripay", "reference": reference, "response": status_lookup.tripay_transaction_detail(reference)})
+
+
+def cmd_tripay_transactions(args):
+    from tripay_transactions import run_cli
+
+    run_cli(args.argv)
+
+
+def cmd_tripay_create(args):
+    from tripay_batch import run_cli
+
+    run_cli(args.argv)
+
+
+def cmd_tripay_sign(args):
+    from dotenv import load_dotenv
+    from tripay_signature import TripaySigner
+
+    load_dotenv()
+    signer = TripaySigner.from_env()
+    emit({"merchant_ref": args.merchant_ref, "amount": args.amount, "signature": signer.sign(args.merchant_ref, args.amount)})
+
+
+# ---- Duitku -------------------------------------------------------------------------------------
+
+
+def cmd_duitku_methods(args):
+    from reference_cache import duitku_payment_methods
+
+    emit(duitku_payment_methods(args.amount))
+
+
+def cmd_duitku_status(args):
+    bulk_or_lookup("duitku", "duitku_transaction_status", args)
+
+
+# ---- Xendit -------------------------------------------------------------------------------------
+
+
+def cmd_xendit_balance(args):
+    from gateway_client import get_client
+    from json_codec import response_json
+
+    response = get_client("xendit").get("/balance", params={"account_type": args.account_type})
+    emit({"http_status": response.status_code, "response": response_json(response)})
+
+
+def cmd_xendit_create(args):
+    import uuid
+    from gateway_models import XenditPaymentRequest
+    from xendit_payments import create_payment_request, payment_payload
+
+    reference_id = args.reference_id or f"order_{time.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    response = create_payment_request(payment_payload(reference_id, args.amount, args.channel.upper()))
+    payment = XenditPaymentRequest.from_response(response)
+    if response.status_code != 201:
+        emit({"http_status": response.status_code, "reference_id": reference_id, "response": payment.data})
+        return
+    emit(
+        {
+            "http_status": response.status_code,
+            "reference_id": reference_id,
+            "payment_request_id": payment.payment_request_id,
+            "status": payment.status,
+            "payment_url": payment.payment_url,
+            "qr_string": payment.qr_string,
+        }
+    )
+
+
+def cmd_xendit_simulate(args):
+    from gateway_client import get_client
+    from json_codec import JSON_CONTENT_TYPE, dumps, response_json
+
+    response = get_client("xendit").post(
+        f"/v3/payment_requests/{args.payment_request_id}/simulate",
+        content=dumps({"amount": args.amount}),
+        headers=JSON_CONTENT_TYPE,
+    )
+    emit({"http_status": response.status_code, "response": response_json(response)})
+
+
+# ---- QRIS / QR ----------------------------------------------------------------------------------
+
+
+def cmd_qris_validate(args):
+    from qris import QrisPayload
+
+    invalid = 0
+    # '#' bisa muncul di nama merchant -> bukan komentar
+    for index, raw in enumerate(read_items(args, comments=False)):
+        errors = QrisPayload(raw).validate(args.amount)
+        invalid += bool(errors)
+        emit({"index": index, "valid": not errors, "errors": errors})
+    if invalid:
+        sys.exit(1)
+
+
+def cmd_qris_decode(args):
+    from qris import QrisPayload
+
+    for raw in read_items(args, comments=False):
+        emit(QrisPayload(raw).to_dict())
+
+
+def cmd_qr_render(args):
+    from qr_render import get_qr
+
+    fmt = "svg" if args.output.endswith(".svg") else "png"
+    _, body = get_qr(args.data, fmt, args.size)
+    with open(args.output, "wb") as f:
+        f.write(body)
+    print(f"✅ QR disimpan ke {args.output} ({len(body):,} bytes)", file=sys.stderr)
+
+
+# ---- Parser -------------------------------------------------------------------------------------
+
+
+def add_items(parser, name, help_text):
+    parser.add_argument("items", nargs="*", metavar=name, help=help_text)
+    parser.add_argument("-f", "--file", help="Batch: satu item per baris, '-' untuk stdin")
+
+
+def add_bulk(parser, name, help_text):
+    add_items(parser, name, help_text)
+    parser.add_argument("-o", "--output", default="-", help="File NDJSON untuk mode -f (default stdout)")
+    parser.add_argument("-c", "--concurrency", type=int, help="Request paralel untuk mode -f")
+
+
+def add_passthrough(subparsers, name, handler, help_text):
+    # Semua argumen (termasuk -h) diteruskan apa adanya ke run_cli modul, lihat main()
+    parser = subparsers.add_parser(name, help=help_text, add_help=False)
+    parser.set_defaults(handler=handler, passthrough=True)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="payctl", description="CLI payment gateway Tripay / Duitku / Xendit")
+    parser.add_argument("--profile-imports", action="store_true", help="Tampilkan profil waktu import ke stderr")
+    gateways = parser.add_subparsers(dest="gateway", required=True)
+
+    tripay = gateways.add_parser("tripay", help="Tripay").add_subparsers(dest="command", required=True)
+    p = tripay.add_parser("channels", help="Daftar payment channel (cache)")
+    p.add_argument("--code", help="Filter satu channel, mis. QRIS2")
+    p.set_defaults(handler=cmd_tripay_channels)
+    p = tripay.add_parser("fee", help="Fee dari fee-calculator Tripay (cache) per amount")
+    p.add_argument("code")
+    p.add_argument("amounts", nargs="+", type=int)
+    p.set_defaults(handler=cmd_tripay_fee)
+    p = tripay.add_parser("quote", help="Fee dihitung lokal (fee_engine) untuk banyak amount")
+    p.add_argument("amounts", nargs="+", type=int)
+    p.add_argument("--code", action="append", help="Channel (bisa diulang), default semua")
+    p.set_defaults(handler=cmd_tripay_quote)
+    p = tripay.add_parser("instruction", help="Instruksi pembayaran (cache)")
+    p.add_argument("code")
+    p.add_argument("--pay-code")
+    p.set_defaults(handler=cmd_tripay_instruction)
+    p = tripay.add_parser("status", help="Cek status transaksi")
+    add_bulk(p, "reference", "Reference Tripay")
+    p.set_defaults(handler=cmd_tripay_status)
+    p = tripay.add_parser("detail", help="Detail transaksi")
+    add_items(p, "reference", "Reference Tripay")
+    p.set_defaults(handler=cmd_tripay_detail)
+    add_passthrough(tripay, "transactions", cmd_tripay_transactions, "Export semua transaksi (tripay_transactions)")
+    add_passthrough(tripay, "create", cmd_tripay_create, "Buat transaksi dari NDJSON order (tripay_batch)")
+    p = tripay.add_parser("sign", help="Signature transaksi (offline)")
+    p.add_argument("merchant_ref")
+    p.add_argument("amount", type=int)
+    p.set_defaults(handler=cmd_tripay_sign)
+
+    duitku = gateways.add_parser("duitku", help="Duitku").add_subparsers(dest="command", required=True)
+    p = duitku.add_parser("methods", help="Payment method untuk amount (cache)")
+    p.add_argument("amount", type=int)
+    p.set_defaults(handler=cmd_duitku_methods)
+    p = duitku.add_parser("status", help="Cek status transaksi")
+    add_bulk(p, "merchant_order_id", "merchantOrderId")
+    p.set_defaults(handler=cmd_duitku_status)
+
+    xendit = gateways.add_parser("xendit", help="Xendit").add_subparsers(dest="command", required=True)
+    p = xendit.add_parser("balance", help="Saldo akun")
+    p.add_argument("--account-type", default="CASH")
+    p.set_defaults(handler=cmd_xendit_balance)
+    p = xendit.add_parser("create", help="Buat payment request (deadline + hedge dari xendit_payments)")
+    p.add_argument("--amount", type=int, default=500)
+    p.add_argument("--channel", default="QRIS")
+    p.add_argument("--reference-id")
+    p.set_defaults(handler=cmd_xendit_create)
+    p = xendit.add_parser("simulate", help="Simulasi pembayaran (sandbox)")
+    p.add_argument("payment_request_id")
+    p.add_argument("--amount", type=int, default=10000)
+    p.set_defaults(handler=cmd_xendit_simulate)
+
+    qris = gateways.add_parser("qris", help="Payload QRIS (offline)").add_subparsers(dest="command", required=True)
+    p = qris.add_parser("validate", help="Validasi CRC & field wajib")
+    add_items(p, "payload", "String QRIS")
+    p.add_argument("--amount", help="Nominal yang diharapkan")
+    p.set_defaults(handler=cmd_qris_validate)
+    p = qris.add_parser("decode", help="Decode field QRIS")
+    add_items(p, "payload", "String QRIS")
+    p.set_defaults(handler=cmd_qris_decode)
+
+    qr = gateways.add_parser("qr", help="Render QR (offline)").add_subparsers(dest="command", required=True)
+    p = qr.add_parser("render", help="QR string ke PNG / SVG")
+    p.add_argument("data")
+    p.add_argument("-o", "--output", required=True)
+    p.add_argument("--size", type=int, default=300)
+    p.set_defaults(handler=cmd_qr_render)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if extra and not getattr(args, "passthrough", False):
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    args.argv = extra
+    startup = time.perf_counter() - STARTED
+    profile = ImportProfile() if args.profile_imports else None
+    started = time.perf_counter()
+    try:
+        if profile is None:
+            args.handler(args)
+        else:
+            with profile:
+                args.handler(args)
+    except BrokenPipeError:
+        # `payctl ... | head`: pembaca sudah tutup, sisa output dibuang tanpa traceback
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    except Exception as e:
+        print(f"❌ {type(e).__name__}: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if profile is not None:
+            profile.report(startup, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# qr_render.py - Render QR string (QR_STRING Xendit, QRIS Tripay) ke PNG 1-bit / SVG + cache LRU/disk + process pool
+
+import argparse
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qsl
+import qrcode
+from qrcode.exceptions import DataOverflowError
+from dotenv import load_dotenv
+from json_codec import dumps
+from PIL import Image
+
+load_dotenv()
+
+CACHE_MAX_BYTES = int(os.getenv("QR_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+# Kosong = hanya cache memori; diisi = hasil render juga disimpan per hash di folder ini
+CACHE_DIR = os.getenv("QR_CACHE_DIR", "")
+RENDER_WORKERS = int(os.getenv("QR_RENDER_WORKERS", 2))
+
+FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+MIN_SIZE = 64
+MAX_SIZE = 2048
+DEFAULT_SIZE = 300
+BORDER = 4
+# QR versi 40 level M muat 2.331 byte (mode byte); dihitung dari UTF-8, bukan jumlah karakter
+MAX_DATA_BYTES = 2048
+
+
+def qr_matrix(data):
+    """Matrix modul QR (list of list bool), sudah termasuk quiet zone"""
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, box_size=1, border=BORDER)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+
+def render_png(matrix, size):
+    """PNG 1-bit: satu modul = kotak integer piksel (tajam untuk scanner), ukuran <= size"""
+    modules = len(matrix)
+    scale = max(1, size // modules)
+    pixels = bytes(0 if dark else 255 for row in matrix for dark in row)
+    image = Image.frombytes("L", (modules, modules), pixels)
+    image = image.resize((modules * scale, modules * scale), Image.NEAREST).convert("1", dither=Image.Dither.NONE)
+    output = io.BytesIO()
+    image.save(output, format="PNG", optimize=True)
+    return output.getvalue()
+
+
+def render_svg(matrix, size):
+    """SVG satu path: tiap run modul gelap dalam satu baris jadi satu persegi panjang"""
+    modules = len(matrix)
+    parts = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < modules:
+            if row[x]:
+                start = x
+                while x < modules and row[x]:
+                    x += 1
+                parts.append(f"M{start} {y}h{x - start}v1h-{x - start}z")
+            else:
+                x += 1
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+        f'viewBox="0 0 {modules} {modules}" shape-rendering="crispEdges">'
+        f'<rect width="100%" height="100%" fill="#fff"/><path d="{"".join(parts)}" fill="#000"/></svg>'
+    ).encode()
+
+
+def render_qr(data, fmt="png", size=DEFAULT_SIZE):
+    """Render murni (tanpa cache); dipanggil langsung atau di proses worker"""
+    try:
+        matrix = qr_matrix(data)
+    except (DataOverflowError, ValueError):
+        # qrcode kadang melempar ValueError("Invalid version ...") alih-alih DataOverflowError
+        raise ValueError("QR string terlalu panjang untuk satu QR code") from None
+    if len(matrix) > size:
+        # Minimal 1 piksel per modul; lebih kecil dari itu QR tidak bisa di-scan
+        raise ValueError(f"Size minimal {len(matrix)} untuk QR string ini")
+    if fmt == "svg":
+        return render_svg(matrix, size)
+    return render_png(matrix, size)
+
+
+def cache_key(data, fmt, size):
+    return f"{hashlib.sha256(data.encode()).hexdigest()}-{size}.{fmt}"
+
+
+def validate(data, fmt, size):
+    if not data:
+        raise ValueError("QR string kosong")
+    if len(data.encode()) > MAX_DATA_BYTES:
+        raise ValueError(f"QR string lebih dari {MAX_DATA_BYTES} byte")
+    if fmt not in FORMATS:
+        raise ValueError(f"Format harus salah satu dari: {', '.join(FORMATS)}")
+    if not MIN_SIZE <= size <= MAX_SIZE:
+        raise ValueError(f"Size harus {MIN_SIZE}-{MAX_SIZE}")
+
+
+class QrCache:
+    """LRU bytes hasil render (dibatasi total bytes) + tier disk opsional, key = hash konten"""
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES, cache_dir=CACHE_DIR):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "renders": 0}
+        self._lock = threading.Lock()
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, key):
+        with self._lock:
+            body = self.entries.get(key)
+            if body is not None:
+                self.entries.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return body
+        if self.cache_dir:
+            try:
+                with open(self._disk_path(key), "rb") as f:
+                    body = f.read()
+            except OSError:
+                return None
+            self.stats["disk_hits"] += 1
+            self._remember(key, body)
+            return body
+        return None
+
+    def _remember(self, key, body):
+        with self._lock:
+            if key not in self.entries:
+                self.entries[key] = body
+                self.total_bytes += len(body)
+            while self.total_bytes > self.max_bytes and self.entries:
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+    def put(self, key, body):
+        self.stats["renders"] += 1
+        self._remember(key, body)
+        if self.cache_dir:
+            path = self._disk_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+
+    def snapshot(self):
+        return {"entries": len(self.entries), "bytes": self.total_bytes, **self.stats}
+
+
+_cache = None
+_pool = None
+_lock = threading.Lock()
+# key -> Task render yang sedang jalan; request bersamaan untuk QR yang sama menunggu Task yang sama
+_renders = {}
+
+
+def get_qr_cache():
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = QrCache()
+    return _cache
+
+
+def get_render_pool():
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                # spawn: jangan fork proses yang sudah punya thread (event loop, log listener)
+                _pool = ProcessPoolExecutor(RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_render_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def get_qr(data, fmt="png", size=DEFAULT_SIZE):
+    """Bytes QR dari cache, render di proses ini kalau belum ada (untuk script/CLI)"""
+    validate(data, fmt, size)
+    key = cache_key(data, fmt, size)
+    cache = get_qr_cache()
+    body = cache.get(key)
+    if body is None:
+        body = render_qr(data, fmt, size)
+        cache.put(key, body)
+    return key, body
+
+
+async def _render_and_cache(key, data, fmt, size):
+    try:
+        body = await asyncio.get_running_loop().run_in_executor(get_render_pool(), render_qr, data, fmt, size)
+        get_qr_cache().put(key, body)
+        return body
+    finally:
+        _renders.pop(key, None)
+
+
+async def get_qr_async(data, fmt="png", size=DEFAULT_SIZE):
+    """Sama dengan get_qr, tapi render di process pool supaya event loop tidak tertahan"""
+    validate(data, fmt, size)
+    key = cache_key(data, fmt, size)
+    body = get_qr_cache().get(key)
+    if body is None:
+        task = _renders.get(key)
+        if task is None:
+            task = _renders[key] = asyncio.ensure_future(_render_and_cache(key, data, fmt, size))
+        # shield: client yang disconnect tidak membatalkan render yang ditunggu request lain
+        body = await asyncio.shield(task)
+    return key, body
+
+
+async def app(scope, receive, send):
+    """GET /qr?data=...&format=png|svg&size=300 (juga di-mount di callback_server)"""
+    if scope["type"] != "http":
+        return
+    params = dict(parse_qsl(scope.get("query_string", b"").decode()))
+    data, fmt = params.get("data", ""), params.get("format", "png")
+    try:
+        size = int(params.get("size", DEFAULT_SIZE))
+        validate(data, fmt, size)
+        key = cache_key(data, fmt, size)
+        etag = f'"{key}"'.encode()
+        # Konten ditentukan sepenuhnya oleh query -> aman di-cache browser/CDN lama
+        headers = [(b"etag", etag), (b"cache-control", b"public, max-age=86400")]
+        if dict(scope["headers"]).get(b"if-none-match") == etag:
+            # ETag = hash query, jadi 304 bisa dijawab tanpa render / baca cache
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        key, body = await get_qr_async(data, fmt, size)
+    except ValueError as e:
+        payload = dumps({"error": str(e)})
+        await send({"type": "http.response.start", "status": 400, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": payload})
+        return
+
+    headers += [(b"content-type", FORMATS[key.rsplit(".", 1)[1]].encode()), (b"content-length", str(len(body)).encode())]
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render QR string ke PNG (1-bit) / SVG")
+    parser.add_argument("data", help="QR string, mis. value action QR_STRING Xendit")
+    parser.add_argument("-o", "--output", required=True, help="File .png / .svg")
+    parser.add_argument("--size", type=int, default=DEFAULT_SIZE)
+    args = parser.parse_args()
+
+    fmt = "svg" if args.output.endswith(".svg") else "png"
+    try:
+        _, body = get_qr(args.data, fmt, args.size)
+    except ValueError as e:
+        print(f"❌ {e}")
+        exit(1)
+    with open(args.output, "wb") as f:
+        f.write(body)
+    print(f"✅ QR disimpan ke {args.output} ({len(body):,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
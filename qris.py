@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# qris.py - Decode & validasi payload QRIS (EMVCo TLV) + CRC16-CCITT berbasis tabel
+
+import argparse
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+from json_codec import dumps_pretty, dumps_str
+
+# CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF) sesuai EMVCo tag 63; tabel 256 entri dihitung sekali
+CRC16_TABLE = []
+for _byte in range(256):
+    _crc = _byte << 8
+    for _ in range(8):
+        _crc = ((_crc << 1) ^ 0x1021) if _crc & 0x8000 else (_crc << 1)
+    CRC16_TABLE.append(_crc & 0xFFFF)
+CRC16_TABLE = tuple(CRC16_TABLE)
+
+
+def crc16_ccitt(data, crc=0xFFFF):
+    table = CRC16_TABLE
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ table[(crc >> 8) ^ byte]
+    return crc
+
+
+class QrisError(ValueError):
+    """Payload bukan TLV EMVCo yang valid"""
+
+
+def parse_amount(value):
+    """Nominal (str/int/Decimal) -> Decimal; QrisError kalau bukan angka"""
+    try:
+        amount = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise QrisError(f"Nominal bukan angka: {value!r}") from None
+    if not amount.is_finite():
+        raise QrisError(f"Nominal bukan angka: {value!r}")
+    return amount
+
+
+def parse_tlv(payload):
+    """'000201...' -> {tag: value} (urutan dipertahankan); tag & panjang masing-masing 2 digit"""
+    fields = {}
+    position = 0
+    end = len(payload)
+    while position < end:
+        if position + 4 > end:
+            raise QrisError(f"TLV terpotong di posisi {position}")
+        tag = payload[position:position + 2]
+        length = payload[position + 2:position + 4]
+        if not length.isdigit():
+            raise QrisError(f"Panjang tag {tag} bukan angka: {length!r}")
+        value_end = position + 4 + int(length)
+        if value_end > end:
+            raise QrisError(f"Value tag {tag} melewati akhir payload")
+        fields[tag] = payload[position + 4:value_end]
+        position = value_end
+    return fields
+
+
+# Tag 26-51: template merchant account (sub-tag 00 GUID, 01 PAN, 02 merchant ID, 03 kriteria)
+MERCHANT_ACCOUNT_TAGS = tuple(f"{tag:02d}" for tag in range(26, 52))
+ADDITIONAL_DATA_NAMES = {
+    "01": "bill_number",
+    "02": "mobile_number",
+    "03": "store_label",
+    "04": "loyalty_number",
+    "05": "reference_label",
+    "06": "customer_label",
+    "07": "terminal_label",
+    "08": "purpose",
+}
+
+
+class QrisPayload:
+    """Payload QRIS; field di-decode saat pertama diakses, jadi validasi CRC saja tidak perlu parse TLV"""
+
+    __slots__ = ("raw", "_fields", "_merchant_accounts", "_additional_data")
+
+    def __init__(self, raw):
+        self.raw = raw.strip()
+        self._fields = None
+        self._merchant_accounts = None
+        self._additional_data = None
+
+    @property
+    def fields(self):
+        if self._fields is None:
+            self._fields = parse_tlv(self.raw)
+        return self._fields
+
+    @property
+    def crc(self):
+        """Nilai tag 63 (4 hex) kalau payload diakhiri '6304XXXX'"""
+        return self.raw[-4:].upper() if self.raw[-8:-4] == "6304" else None
+
+    @property
+    def crc_valid(self):
+        if self.crc is None:
+            return False
+        try:
+            data = self.raw[:-4].encode("ascii")
+        except UnicodeEncodeError:
+            return False
+        return f"{crc16_ccitt(data):04X}" == self.crc
+
+    @property
+    def is_dynamic(self):
+        """Tag 01: '11' statis (nominal diisi pembayar), '12' dinamis (nominal di QR)"""
+        return self.fields.get("01") == "12"
+
+    @property
+    def amount(self):
+        value = self.fields.get("54")
+        if value is None:
+            return None
+        try:
+            return Decimal(value)
+        except InvalidOperation:
+            raise QrisError(f"Tag 54 bukan nominal: {value!r}") from None
+
+    @property
+    def merchant_name(self):
+        return self.fields.get("59")
+
+    @property
+    def merchant_city(self):
+        return self.fields.get("60")
+
+    @property
+    def postal_code(self):
+        return self.fields.get("61")
+
+    @property
+    def merchant_category_code(self):
+        return self.fields.get("52")
+
+    @property
+    def currency(self):
+        return self.fields.get("53")
+
+    @property
+    def country(self):
+        return self.fields.get("58")
+
+    @property
+    def merchant_accounts(self):
+        """{tag: {"guid", "pan", "merchant_id", "criteria"}} dari template 26-51"""
+        if self._merchant_accounts is None:
+            accounts = {}
+            for tag in MERCHANT_ACCOUNT_TAGS:
+                if tag in self.fields:
+                    sub = parse_tlv(self.fields[tag])
+                    accounts[tag] = {
+                        "guid": sub.get("00"),
+                        "pan": sub.get("01"),
+                        "merchant_id": sub.get("02"),
+                        "criteria": sub.get("03"),
+                    }
+            self._merchant_accounts = accounts
+        return self._merchant_accounts
+
+    @property
+    def additional_data(self):
+        """Tag 62 (bill number, reference label, terminal, ...)"""
+        if self._additional_data is None:
+            sub = parse_tlv(self.fields["62"]) if "62" in self.fields else {}
+            self._additional_data = {ADDITIONAL_DATA_NAMES.get(tag, tag): value for tag, value in sub.items()}
+        return self._additional_data
+
+    def validate(self, expected_amount=None):
+        """Daftar masalah (kosong = valid); CRC dicek dulu karena paling murah dan paling sering rusak"""
+        if self.crc is None:
+            return ["CRC (tag 63) tidak ada di akhir payload"]
+        if not self.crc_valid:
+            return [f"CRC tidak cocok (tag 63 = {self.crc})"]
+        try:
+            fields = self.fields
+            errors = []
+            if fields.get("00") != "01":
+                errors.append("Payload format indicator (tag 00) harus 01")
+            if not self.merchant_accounts:
+                errors.append("Tidak ada merchant account (tag 26-51)")
+            if self.currency != "360":
+                errors.append(f"Mata uang (tag 53) bukan IDR/360: {self.currency}")
+            if self.country != "ID":
+                errors.append(f"Negara (tag 58) bukan ID: {self.country}")
+            if not self.merchant_name:
+                errors.append("Nama merchant (tag 59) kosong")
+            amount = self.amount
+            if self.is_dynamic and amount is None:
+                errors.append("QR dinamis tanpa nominal (tag 54)")
+            if expected_amount is not None and amount != parse_amount(expected_amount):
+                errors.append(f"Nominal QR {amount} != nominal transaksi {expected_amount}")
+        except QrisError as e:
+            return [str(e)]
+        return errors
+
+    def to_dict(self):
+        return {
+            "merchant_name": self.merchant_name,
+            "merchant_city": self.merchant_city,
+            "postal_code": self.postal_code,
+            "merchant_category_code": self.merchant_category_code,
+            "dynamic": self.is_dynamic,
+            "amount": str(self.amount) if self.amount is not None else None,
+            "currency": self.currency,
+            "country": self.country,
+            "merchant_accounts": self.merchant_accounts,
+            "additional_data": self.additional_data,
+            "crc": self.crc,
+            "crc_valid": self.crc_valid,
+        }
+
+
+def validate_qris(raw, expected_amount=None):
+    return QrisPayload(raw).validate(expected_amount)
+
+
+def validate_many(items):
+    """Yield (index, errors) untuk tiap item: string QRIS atau (string, expected_amount)"""
+    for index, item in enumerate(items):
+        raw, expected_amount = item if isinstance(item, tuple) else (item, None)
+        yield index, QrisPayload(raw).validate(expected_amount)
+
+
+def amount_arg(value):
+    try:
+        return parse_amount(value)
+    except QrisError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode / validasi payload QRIS")
+    parser.add_argument("payload", nargs="?", help="String QRIS")
+    parser.add_argument("-f", "--file", help="Validasi massal: satu QRIS per baris (opsional '<qris>\\t<amount>'), '-' stdin")
+    parser.add_argument("--amount", type=amount_arg, help="Nominal yang diharapkan")
+    args = parser.parse_args()
+
+    if not args.file:
+        if not args.payload:
+            parser.error("payload atau --file wajib diisi")
+        qris = QrisPayload(args.payload)
+        errors = qris.validate(args.amount)
+        if not errors:
+            # to_dict parse semua tag; payload yang tidak valid bisa raise QrisError di tengah jalan
+            print(dumps_pretty(qris.to_dict()))
+        print("✅ QRIS valid" if not errors else "❌ " + "; ".join(errors))
+        sys.exit(1 if errors else 0)
+
+    source = sys.stdin if args.file == "-" else open(args.file)
+    items = []
+    for line in source:
+        # Nama merchant di QRIS boleh berisi spasi -> nominal dipisah tab
+        raw, _, expected_amount = line.rstrip("\r\n").partition("\t")
+        if raw.strip():
+            items.append((raw, expected_amount.strip()) if expected_amount.strip() else raw)
+    started = time.perf_counter()
+    invalid = 0
+    for index, errors in validate_many(items):
+        if errors:
+            invalid += 1
+            print(dumps_str({"line": index + 1, "errors": errors}))
+    elapsed = time.perf_counter() - started
+    print(f"{'✅' if not invalid else '❌'} {len(items):,} QRIS dicek, {invalid:,} bermasalah, {elapsed * 1000:.1f} ms", file=sys.stderr)
+    sys.exit(1 if invalid else 0)
+
+
+if __name__ == "__main__":
+    main()
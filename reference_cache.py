@@ -0,0 +1,325 @@
+# reference_cache.py - Cache TTL + stale-while-revalidate (+ snapshot disk) untuk data referensi gateway
+
+import atexit
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from dotenv import load_dotenv
+from event_log import get_event_logger
+from json_codec import DECODE_ERRORS, JSON_CONTENT_TYPE, dumps, loads, response_json
+
+load_dotenv()
+
+log = get_event_logger("cache")
+
+SNAPSHOT_PATH = os.getenv("REFERENCE_CACHE_PATH", "reference_cache.json")
+# Setelah TTL habis data lama masih dipakai selama STALE_SECONDS sambil di-refresh di background
+STALE_SECONDS = float(os.getenv("REFERENCE_CACHE_STALE_SECONDS", 24 * 60 * 60))
+
+TTL_SECONDS = {
+    "tripay_channels": float(os.getenv("REFERENCE_CACHE_TTL_TRIPAY_CHANNELS", 60 * 60)),
+    "tripay_instruction": float(os.getenv("REFERENCE_CACHE_TTL_TRIPAY_INSTRUCTION", 24 * 60 * 60)),
+    "tripay_fee": float(os.getenv("REFERENCE_CACHE_TTL_TRIPAY_FEE", 60 * 60)),
+    "duitku_methods": float(os.getenv("REFERENCE_CACHE_TTL_DUITKU_METHODS", 10 * 60)),
+}
+
+# Jenis yang key-nya ikut amount / kode pembayaran tumbuh tanpa batas -> LRU per jenis
+MAX_ENTRIES = {
+    "tripay_fee": int(os.getenv("REFERENCE_CACHE_MAX_TRIPAY_FEE", 5000)),
+    "tripay_instruction": int(os.getenv("REFERENCE_CACHE_MAX_TRIPAY_INSTRUCTION", 5000)),
+    "duitku_methods": int(os.getenv("REFERENCE_CACHE_MAX_DUITKU_METHODS", 1000)),
+}
+
+# Snapshot ditulis paling cepat tiap SNAPSHOT_DELAY detik (dan saat proses exit), bukan per fetch
+SNAPSHOT_DELAY_SECONDS = float(os.getenv("REFERENCE_CACHE_SNAPSHOT_DELAY_SECONDS", 5))
+# Saat exit, refresh background yang masih jalan ditunggu paling lama selama ini sebelum snapshot ditulis
+EXIT_REFRESH_WAIT_SECONDS = float(os.getenv("REFERENCE_CACHE_EXIT_WAIT_SECONDS", 5))
+
+
+class GatewayDataError(Exception):
+    """Gateway menjawab tapi isinya error -> jangan di-cache"""
+
+
+class CacheEntry:
+    __slots__ = ("value", "fetched_at")
+
+    def __init__(self, value, fetched_at):
+        self.value = value
+        self.fetched_at = fetched_at
+
+
+class ReferenceCache:
+    """get(key, fetch): fresh -> langsung; stale -> langsung + refresh background; miss -> fetch
+
+    Key berbentuk "{jenis}:{scope}:..."; jenis di MAX_ENTRIES dibatasi LRU.
+    """
+
+    def __init__(self, snapshot_path=SNAPSHOT_PATH, stale_seconds=STALE_SECONDS, max_entries=MAX_ENTRIES, snapshot_delay=SNAPSHOT_DELAY_SECONDS):
+        self.snapshot_path = snapshot_path
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self.snapshot_delay = snapshot_delay
+        self.entries = {}
+        self.stats = {"fresh": 0, "stale": 0, "miss": 0, "refresh_errors": 0, "evicted": 0}
+        self._lru = {kind: OrderedDict() for kind in max_entries}
+        # key -> thread refresh background yang sedang jalan
+        self._refreshing = {}
+        # key -> [lock, jumlah pemakai]; dihapus saat tidak ada fetch untuk key itu
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_timer = None
+        self._dirty = False
+        self.load_snapshot()
+        atexit.register(self.close)
+
+    def load_snapshot(self):
+        if not self.snapshot_path:
+            return
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                snapshot = loads(f.read())
+        except (OSError, *DECODE_ERRORS):
+            return
+        # Entry yang sudah lewat TTL + stale (mis. key format lama) tidak akan terpakai lagi
+        cutoff = time.time() - max(TTL_SECONDS.values()) - self.stale_seconds
+        entries = sorted(snapshot.items(), key=lambda item: item[1]["fetched_at"])
+        for key, entry in entries:
+            if entry["fetched_at"] >= cutoff:
+                self._store(key, CacheEntry(entry["value"], entry["fetched_at"]))
+
+    def _store(self, key, entry):
+        self.entries[key] = entry
+        lru = self._lru.get(key.split(":", 1)[0])
+        if lru is None:
+            return
+        with self._lock:
+            lru[key] = None
+            lru.move_to_end(key)
+            while len(lru) > self.max_entries[key.split(":", 1)[0]]:
+                evicted, _ = lru.popitem(last=False)
+                self.entries.pop(evicted, None)
+                self.stats["evicted"] += 1
+
+    def _touch(self, key):
+        lru = self._lru.get(key.split(":", 1)[0])
+        if lru is not None:
+            with self._lock:
+                if key in lru:
+                    lru.move_to_end(key)
+
+    def save_snapshot(self):
+        if not self.snapshot_path:
+            return
+        with self._snapshot_lock:
+            with self._lock:
+                self._snapshot_timer = None
+                self._dirty = False
+            snapshot = {key: {"value": e.value, "fetched_at": e.fetched_at} for key, e in list(self.entries.items())}
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(dumps(snapshot))
+            os.replace(tmp_path, self.snapshot_path)
+
+    def schedule_snapshot(self):
+        """Debounce: banyak fetch berturut-turut (mis. fee per amount) jadi satu tulis snapshot"""
+        if not self.snapshot_path:
+            return
+        with self._lock:
+            self._dirty = True
+            if self._snapshot_timer is not None:
+                return
+            self._snapshot_timer = threading.Timer(self.snapshot_delay, self.save_snapshot)
+            self._snapshot_timer.daemon = True
+            self._snapshot_timer.start()
+
+    def flush_snapshot(self):
+        """Tulis perubahan yang belum tersimpan sekarang juga (dipanggil otomatis saat exit)"""
+        with self._lock:
+            timer, dirty = self._snapshot_timer, self._dirty
+        if timer is not None:
+            timer.cancel()
+        if dirty:
+            self.save_snapshot()
+
+    def close(self, timeout=EXIT_REFRESH_WAIT_SECONDS):
+        """Tunggu refresh background lalu tulis snapshot (dipanggil otomatis saat exit).
+
+        Script sekali jalan biasanya selesai sebelum refresh stale-while-revalidate-nya; tanpa ini
+        hasil refresh hilang dan run berikutnya membaca data stale yang sama lagi.
+        """
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            threads = list(self._refreshing.values())
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self.flush_snapshot()
+
+    def get(self, key, fetch, ttl):
+        entry = self.entries.get(key)
+        if entry is not None:
+            age = time.time() - entry.fetched_at
+            if age < ttl:
+                self.stats["fresh"] += 1
+                self._touch(key)
+                return entry.value
+            if age < ttl + self.stale_seconds:
+                self.stats["stale"] += 1
+                self._touch(key)
+                self._refresh_in_background(key, fetch)
+                return entry.value
+        self.stats["miss"] += 1
+        return self._fetch(key, fetch, ttl)
+
+    def _fetch(self, key, fetch, ttl=None):
+        # Satu fetch per key; request lain yang miss bersamaan menunggu hasil yang sama.
+        # Lock per key hanya hidup selama ada yang fetch, jadi jumlahnya tidak ikut tumbuh per reference
+        with self._lock:
+            slot = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            slot[1] += 1
+        try:
+            with slot[0]:
+                entry = self.entries.get(key)
+                if ttl is not None and entry is not None and time.time() - entry.fetched_at < ttl:
+                    return entry.value
+                value = fetch()
+                self._store(key, CacheEntry(value, time.time()))
+        finally:
+            with self._lock:
+                slot[1] -= 1
+                if not slot[1]:
+                    del self._key_locks[key]
+        self.schedule_snapshot()
+        return value
+
+    def _refresh_in_background(self, key, fetch):
+        def refresh():
+            try:
+                self._fetch(key, fetch)
+            except Exception as e:
+                # Data stale tetap dipakai sampai refresh berikutnya berhasil
+                self.stats["refresh_errors"] += 1
+                log.warning("reference_refresh_failed", key=key, error=str(e))
+            finally:
+                with self._lock:
+                    self._refreshing.pop(key, None)
+
+        with self._lock:
+            if key in self._refreshing:
+                return
+            thread = self._refreshing[key] = threading.Thread(target=refresh, name=f"reference-refresh-{key}", daemon=True)
+            # Start di dalam lock: close() tidak pernah join thread yang belum start
+            thread.start()
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self.entries.clear()
+                for lru in self._lru.values():
+                    lru.clear()
+            else:
+                self.entries.pop(key, None)
+                lru = self._lru.get(key.split(":", 1)[0])
+                if lru is not None:
+                    lru.pop(key, None)
+        self.schedule_snapshot()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_reference_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ReferenceCache()
+    return _cache
+
+
+def gateway_scope(gateway):
+    """Base URL + merchant code: data sandbox/production atau merchant lain tidak boleh tertukar di snapshot"""
+    # Default sama dengan gateway_client.gateway_config (tidak di-import supaya httpx tidak ikut dimuat)
+    if gateway == "tripay":
+        base_url = os.getenv("TRIPAY_BASE_URL", "https://tripay.co.id/api-sandbox")
+    else:
+        base_url = os.getenv("DUITKU_SANDBOX_URL") or os.getenv("DUITKU_BASE_URL", "https://sandbox.duitku.com/webapi/api/merchant")
+    return f"{base_url.rstrip('/')}|{os.getenv(gateway.upper() + '_MERCHANT_CODE', '')}"
+
+
+def tripay_get(path, params, extensions=None):
+    # HTTP stack (httpx, ~100 ms import) hanya dimuat saat cache miss, bukan untuk pembacaan dari snapshot
+    from gateway_client import get_client
+
+    response = get_client("tripay").get(path, params=params, extensions=extensions)
+    response.raise_for_status()
+    data = response_json(response)
+    if not data.get("success"):
+        raise GatewayDataError(data.get("message") or "Tripay response tidak sukses")
+    return data
+
+
+def tripay_payment_channels(code=None):
+    """Response /merchant/payment-channel (opsional filter code)"""
+    params = {"code": code} if code else {}
+    return get_reference_cache().get(
+        f"tripay_channels:{gateway_scope('tripay')}:{code or '*'}",
+        lambda: tripay_get("/merchant/payment-channel", params),
+        TTL_SECONDS["tripay_channels"],
+    )
+
+
+def tripay_payment_instruction(code, **params):
+    """Response /payment/instruction (pay_code, amount, allow_html opsional)"""
+    params = {"code": code, **params}
+    key = f"tripay_instruction:{gateway_scope('tripay')}:" + "&".join(f"{name}={params[name]}" for name in sorted(params))
+    return get_reference_cache().get(
+        key,
+        lambda: tripay_get("/payment/instruction", params),
+        TTL_SECONDS["tripay_instruction"],
+    )
+
+
+def fetch_tripay_fee(code, amount):
+    """/merchant/fee-calculator langsung ke Tripay, tanpa cache"""
+    return tripay_get("/merchant/fee-calculator", {"code": code, "amount": amount})
+
+
+def tripay_fee(code, amount):
+    """Response /merchant/fee-calculator untuk satu channel + amount"""
+    return get_reference_cache().get(
+        f"tripay_fee:{gateway_scope('tripay')}:{code}:{amount}",
+        lambda: fetch_tripay_fee(code, amount),
+        TTL_SECONDS["tripay_fee"],
+    )
+
+
+def fetch_duitku_payment_methods(amount):
+    from gateway_client import get_client
+
+    merchant_code = os.getenv("DUITKU_MERCHANT_CODE", "")
+    request_datetime = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    signature = hashlib.sha256(
+        (merchant_code + str(amount) + request_datetime + os.getenv("DUITKU_API_KEY", "")).encode()
+    ).hexdigest()
+    payload = {"merchantcode": merchant_code, "amount": str(amount), "datetime": request_datetime, "signature": signature}
+    url = os.getenv("DUITKU_SANDBOX_URL") or "/paymentmethod/getpaymentmethod"
+    response = get_client("duitku").post(url, content=dumps(payload), headers=JSON_CONTENT_TYPE, extensions={"idempotent": True})
+    response.raise_for_status()
+    data = response_json(response)
+    if data.get("responseCode") not in (None, "00"):
+        raise GatewayDataError(data.get("responseMessage") or "Duitku response tidak sukses")
+    return data
+
+
+def duitku_payment_methods(amount):
+    """Daftar metode pembayaran Duitku untuk amount tertentu"""
+    return get_reference_cache().get(
+        f"duitku_methods:{gateway_scope('duitku')}:{amount}",
+        lambda: fetch_duitku_payment_methods(amount),
+        TTL_SECONDS["duitku_methods"],
+    )
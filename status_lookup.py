@@ -0,0 +1,215 @@
+# status_lookup.py - Cek status/detail transaksi dengan single-flight + cache hasil singkat per reference (sync & asyncio)
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from gateway_client import get_async_client, get_client
+from json_codec import JSON_CONTENT_TYPE, dumps, response_json
+
+load_dotenv()
+
+# Cukup untuk menyerap burst (tab browser, poller, tool support) tanpa menahan status baru terlalu lama
+CACHE_SECONDS = float(os.getenv("STATUS_LOOKUP_CACHE_SECONDS", 2))
+CACHE_SIZE = int(os.getenv("STATUS_LOOKUP_CACHE_SIZE", 10_000))
+
+# Lookup status dipicu user yang sedang menunggu -> dilayani sebelum job batch (gateway_ratelimit)
+LIVE_EXTENSIONS = {"priority": "live"}
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Lookup bersamaan untuk key yang sama berbagi satu request upstream; hasil sukses di-cache ttl detik"""
+
+    def __init__(self, ttl=CACHE_SECONDS, max_entries=CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.results = OrderedDict()
+        self.stats = {"upstream": 0, "coalesced": 0, "cached": 0}
+        self._calls = {}
+        # Versi asyncio: (loop, key) -> Task upstream (callback_server GET /status/...)
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, key, now):
+        entry = self.results.get(key)
+        if entry is not None and now - entry[0] < self.ttl:
+            self.stats["cached"] += 1
+            return entry
+        return None
+
+    def _store(self, key, value):
+        with self._lock:
+            self.results[key] = (time.monotonic(), value)
+            self.results.move_to_end(key)
+            while len(self.results) > self.max_entries:
+                self.results.popitem(last=False)
+
+    def do(self, key, fetch):
+        with self._lock:
+            entry = self._cached(key, time.monotonic())
+            if entry is not None:
+                return entry[1]
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats["upstream"] += 1
+            else:
+                self.stats["coalesced"] += 1
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fetch()
+            self._store(key, call.result)
+            return call.result
+        except BaseException as e:
+            # Error dibagi ke yang sedang menunggu, tapi tidak di-cache
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    async def do_async(self, key, fetch):
+        """Sama dengan do(), fetch = fungsi async; cache hasil dipakai bersama dengan do()"""
+        import asyncio
+
+        with self._lock:
+            entry = self._cached(key, time.monotonic())
+            if entry is not None:
+                return entry[1]
+        # Task hanya bisa ditunggu dari loop yang membuatnya
+        flight = (asyncio.get_running_loop(), key)
+        task = self._tasks.get(flight)
+        if task is None:
+            self.stats["upstream"] += 1
+            task = self._tasks[flight] = asyncio.ensure_future(self._fetch_async(flight, fetch))
+        else:
+            self.stats["coalesced"] += 1
+        # shield: satu client yang disconnect tidak membatalkan request yang ditunggu client lain
+        return await asyncio.shield(task)
+
+    async def _fetch_async(self, flight, fetch):
+        try:
+            result = await fetch()
+            self._store(flight[1], result)
+            return result
+        finally:
+            self._tasks.pop(flight, None)
+
+    def snapshot(self):
+        return {"entries": len(self.results), "in_flight": len(self._calls) + len(self._tasks), **self.stats}
+
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight():
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight()
+    return _single_flight
+
+
+def response_data(response):
+    """JSON response (termasuk 4xx berisi pesan gateway); 5xx -> exception supaya tidak di-cache"""
+    if response.status_code >= 500:
+        response.raise_for_status()
+    return response_json(response)
+
+
+def duitku_status_payload(merchant_order_id):
+    merchant_code = os.getenv("DUITKU_MERCHANT_CODE", "")
+    signature = hashlib.md5((merchant_code + merchant_order_id + os.getenv("DUITKU_API_KEY", "")).encode()).hexdigest()
+    return {"merchantcode": merchant_code, "merchantOrderId": merchant_order_id, "signature": signature}
+
+
+def tripay_check_status(reference):
+    """Response /transaction/check-status"""
+    return get_single_flight().do(
+        f"tripay_status:{reference}",
+        lambda: response_data(
+            get_client("tripay").get("/transaction/check-status", params={"reference": reference}, extensions=LIVE_EXTENSIONS)
+        ),
+    )
+
+
+def tripay_transaction_detail(reference):
+    """Response /transaction/detail"""
+    return get_single_flight().do(
+        f"tripay_detail:{reference}",
+        lambda: response_data(
+            get_client("tripay").get("/transaction/detail", params={"reference": reference}, extensions=LIVE_EXTENSIONS)
+        ),
+    )
+
+
+def duitku_transaction_status(merchant_order_id):
+    """Response /transactionStatus Duitku"""
+    return get_single_flight().do(
+        f"duitku_status:{merchant_order_id}",
+        lambda: response_data(
+            get_client("duitku").post(
+                "/transactionStatus",
+                content=dumps(duitku_status_payload(merchant_order_id)),
+                headers=JSON_CONTENT_TYPE,
+                extensions={**LIVE_EXTENSIONS, "idempotent": True},
+            )
+        ),
+    )
+
+
+
+async def tripay_check_status_async(reference):
+    """Versi asyncio tripay_check_status (server ASGI: banyak tab/poller untuk reference yang sama)"""
+
+    async def fetch():
+        return response_data(
+            await get_async_client("tripay").get(
+                "/transaction/check-status", params={"reference": reference}, extensions=LIVE_EXTENSIONS
+            )
+        )
+
+    return await get_single_flight().do_async(f"tripay_status:{reference}", fetch)
+
+
+async def duitku_transaction_status_async(merchant_order_id):
+    """Versi asyncio duitku_transaction_status"""
+
+    async def fetch():
+        return response_data(
+            await get_async_client("duitku").post(
+                "/transactionStatus",
+                content=dumps(duitku_status_payload(merchant_order_id)),
+                headers=JSON_CONTENT_TYPE,
+                extensions={**LIVE_EXTENSIONS, "idempotent": True},
+            )
+        )
+
+    return await get_single_flight().do_async(f"duitku_status:{merchant_order_id}", fetch)
+
+
+# GET /status/{gateway}?reference=... di callback_server.py (Duitku: reference = merchantOrderId)
+ASYNC_STATUS_LOOKUPS = {
+    "tripay": tripay_check_status_async,
+    "duitku": duitku_transaction_status_async,
+}
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# tripay_batch.py - Buat banyak transaksi Tripay sekaligus (signature pre-keyed, form body langsung, concurrent)
+
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from functools import lru_cache
+from urllib.parse import quote_plus
+from dotenv import load_dotenv
+from gateway_client import MAX_CONNECTIONS, aclose_clients, get_async_client
+from gateway_ratelimit import set_rate_limit
+from gateway_models import TripayTransaction
+from json_codec import DECODE_ERRORS, dumps_str, loads, response_json
+from qris import validate_qris
+from tripay_signature import TripaySigner
+
+load_dotenv()
+
+DEFAULT_EXPIRY_SECONDS = 24 * 60 * 60
+FORM_HEADERS = {"Content-Type": "application/x-www-form-urlencoded"}
+BATCH_EXTENSIONS = {"priority": "batch", "flow": "batch_create"}
+
+
+@lru_cache(maxsize=1024)
+def order_item_key(index, field):
+    """'order_items[0][sku]' sudah di-quote; kombinasi index x field sama dipakai di semua order"""
+    return quote_plus(f"order_items[{index}][{field}]")
+
+
+def encode_order_form(order, signature):
+    """Order (dict, order_items list of dict) -> body x-www-form-urlencoded siap kirim"""
+    parts = [f"signature={signature}"]
+    for key, value in order.items():
+        if key == "order_items":
+            for index, item in enumerate(value):
+                for field, item_value in item.items():
+                    parts.append(f"{order_item_key(index, field)}={quote_plus(str(item_value))}")
+        elif value is not None:
+            parts.append(f"{quote_plus(key)}={quote_plus(str(value))}")
+    return "&".join(parts).encode()
+
+
+def prepare_order(order, signer, defaults=None):
+    """Lengkapi default (method, merchant_ref, expired_time) lalu return (merchant_ref, body)"""
+    order = {**(defaults or {}), **order}
+    order.setdefault("merchant_ref", str(uuid.uuid4()))
+    order.setdefault("expired_time", int(time.time() + DEFAULT_EXPIRY_SECONDS))
+    return order["merchant_ref"], encode_order_form(order, signer.sign(order["merchant_ref"], order["amount"]))
+
+
+class OrderLine:
+    """Satu baris input NDJSON: order hasil decode, atau error kalau barisnya rusak"""
+
+    __slots__ = ("line", "order", "error")
+
+    def __init__(self, line, order=None, error=None):
+        self.line = line
+        self.order = order
+        self.error = error
+
+
+async def create_one(client, signer, order, defaults=None):
+    """Satu hasil per order; error (input rusak, validasi, jaringan, response gagal) dicatat, batch jalan terus"""
+    result = {"merchant_ref": None}
+    if isinstance(order, OrderLine):
+        result["line"] = order.line
+        if order.error:
+            result["error"] = order.error
+            return result
+        order = order.order
+    try:
+        if not isinstance(order, dict):
+            raise TypeError(f"Order harus object JSON, bukan {type(order).__name__}")
+        result["merchant_ref"] = order.get("merchant_ref")
+        result["merchant_ref"], body = prepare_order(order, signer, defaults)
+        response = await client.post("/transaction/create", content=body, headers=FORM_HEADERS, extensions=BATCH_EXTENSIONS)
+        data = response_json(response)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        return result
+    if not data.get("success"):
+        result["error"] = data.get("message") or f"HTTP {response.status_code}"
+        return result
+    transaction = TripayTransaction(data.get("data") or {})
+    result["reference"] = transaction.reference
+    result["checkout_url"] = transaction.checkout_url
+    if transaction.qr_string:
+        # QRIS rusak / nominal beda ketahuan di sini, bukan saat customer gagal scan
+        qr_errors = validate_qris(transaction.qr_string, transaction.amount)
+        if qr_errors:
+            result["qr_errors"] = qr_errors
+    return result
+
+
+async def create_transactions(orders, concurrency=MAX_CONNECTIONS, signer=None, defaults=None):
+    """Async generator hasil (urutan selesai, bukan urutan input); maksimal `concurrency` request in-flight.
+
+    `orders` boleh generator: order berikutnya baru dibaca saat ada slot kosong.
+    """
+    signer = signer or TripaySigner.from_env()
+    client = get_async_client("tripay")
+    pending = set()
+    try:
+        for order in orders:
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+            pending.add(asyncio.ensure_future(create_one(client, signer, order, defaults)))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        # Caller berhenti di tengah jalan -> request yang masih jalan dibatalkan
+        for task in pending:
+            task.cancel()
+
+
+def read_orders(source):
+    """Satu order JSON per baris (NDJSON) -> OrderLine; baris kosong dilewati, baris rusak jadi hasil error"""
+    for line_number, line in enumerate(source, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            order = loads(line)
+        except DECODE_ERRORS as e:
+            yield OrderLine(line_number, error=f"Invalid JSON: {e}")
+            continue
+        yield OrderLine(line_number, order)
+
+
+async def run_batch(orders, output, concurrency=MAX_CONNECTIONS, defaults=None):
+    stats = {"total": 0, "created": 0, "failed": 0}
+    started = time.perf_counter()
+    try:
+        async for result in create_transactions(orders, concurrency, defaults=defaults):
+            output.write(dumps_str(result) + "\n")
+            stats["total"] += 1
+            stats["failed" if "error" in result else "created"] += 1
+    finally:
+        output.flush()
+        await aclose_clients()
+    stats["elapsed_seconds"] = round(time.perf_counter() - started, 2)
+    return stats
+
+
+def run_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Buat transaksi Tripay massal dari NDJSON order")
+    parser.add_argument("input", help="File NDJSON (satu order per baris), '-' untuk stdin")
+    parser.add_argument("-o", "--output", default="-", help="File NDJSON hasil (default stdout)")
+    parser.add_argument("-c", "--concurrency", type=int, default=MAX_CONNECTIONS)
+    parser.add_argument("--method", help="Channel default untuk order tanpa 'method', mis. BRIVA")
+    parser.add_argument(
+        "--rate",
+        type=float,
+        help="Request/detik ke Tripay untuk job ini (default TRIPAY_RATE_LIMIT_PER_SECOND, 0 = tanpa limit)",
+    )
+    args = parser.parse_args(argv)
+    if args.rate is not None:
+        set_rate_limit("tripay", args.rate)
+
+    defaults = {"method": args.method} if args.method else None
+    source = sys.stdin if args.input == "-" else open(args.input)
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        stats = asyncio.run(run_batch(read_orders(source), output, args.concurrency, defaults))
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+    rate = stats["total"] / stats["elapsed_seconds"] if stats["elapsed_seconds"] else 0
+    # Ringkasan ke stderr supaya stdout tetap NDJSON murni
+    print(
+        f"✅ {stats['total']:,} order ({stats['created']:,} dibuat, {stats['failed']:,} gagal) "
+        f"dalam {stats['elapsed_seconds']}s, {rate:,.0f}/s",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    run_cli()
@@ -1,6 +1,7 @@
+from json_codec import dumps_str
 import os
 from dotenv import load_dotenv
-import httpx
+from reference_cache import tripay_fee
 
 load_dotenv()  # Load environment variables from .env file
 
@@ -11,15 +12,7 @@ if not apiKey:
     exit(1)
 
 try:
-    payload = {"code": "QRIS2", "amount": 100000}
-    headers = {"Authorization": "Bearer " + apiKey}
-
-    result = httpx.get(
-        url="https://tripay.co.id/api-sandbox/merchant/fee-calculator",
-        params=payload,
-        headers=headers,
-    )
-    response = result.text
-    print(response)
+    response = tripay_fee("QRIS2", 100000)
+    print(dumps_str(response))
 except Exception as e:
     print("Request Error: " + str(e))
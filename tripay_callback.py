@@ -1,83 +1,120 @@
 from flask import Flask, request, jsonify
-import hmac
-import hashlib
+import logging
 import os
 from dotenv import load_dotenv
+from callback_dedup import get_dedup
+from callback_signature import HmacSha256Verifier, signature_matches
+from event_log import get_event_logger
+from ip_allowlist import IpGuard
+from json_codec import loads
+from order_store import EXPIRED, FAILED, PAID, PENDING, REFUNDED, update_order_status
 
 load_dotenv()
 
 app = Flask(__name__)
+log = get_event_logger("tripay")
 
 PRIVATE_KEY = os.getenv("TRIPAY_PRIVATE_KEY")
 
 if not PRIVATE_KEY:
     raise ValueError("TRIPAY_PRIVATE_KEY environment variable tidak ditemukan")
 
+# IP callback Tripay (lihat dokumentasi Tripay); whitelist opsional via TRIPAY_IP_WHITELIST
+TRIPAY_CALLBACK_IPS = ["95.111.200.230", "2a04:3543:1000:2310:ac92:4cff:fe87:63f9"]
+IP_GUARD = IpGuard("TRIPAY", TRIPAY_CALLBACK_IPS)
 
-@app.route("/callback", methods=["POST"])
-def handle_callback():
-    try:
-        # 🔑 AMBIL RAW REQUEST BODY (INI YANG PENTING!)
-        raw_body = request.get_data(as_text=True)
+# Status callback Tripay -> status order
+TRIPAY_ORDER_STATUS = {
+    "UNPAID": PENDING,
+    "PAID": PAID,
+    "FAILED": FAILED,
+    "EXPIRED": EXPIRED,
+    "REFUND": REFUNDED,
+}
 
-        # Ambil signature dari header
-        received_signature = request.headers.get("X-Callback-Signature")
+# 🔑 HMAC di-key sekali saat start, tiap callback cukup clone state-nya
+TRIPAY_VERIFIER = HmacSha256Verifier(PRIVATE_KEY, encoding="latin-1")
 
+
+def process_tripay_callback(raw_body, received_signature):
+    """Proses callback Tripay dari raw body (bytes) + header signature, return (body, status_code)"""
+    dedup_key = None
+    try:
         if not received_signature:
-            return jsonify(
-                {"success": False, "message": "Signature tidak ditemukan di header"}
-            ), 400
+            return {"success": False, "message": "Signature tidak ditemukan di header"}, 400
 
         # 🔐 Buat signature dari RAW BODY (bukan parsed JSON)
-        calculated_signature = hmac.new(
-            bytes(PRIVATE_KEY, "latin-1"), bytes(raw_body, "latin-1"), hashlib.sha256
-        ).hexdigest()
-
-        # 🐛 Debug output
-        print("\n" + "=" * 70)
-        print("🔍 DEBUG CALLBACK SIGNATURE")
-        print("=" * 70)
-        print(f"Raw Body: {raw_body}")
-        print(f"\nReceived Signature:  {received_signature}")
-        print(f"Calculated Signature: {calculated_signature}")
-        print(f"\n✅ Match: {received_signature == calculated_signature}")
-        print("=" * 70 + "\n")
+        calculated_signature = TRIPAY_VERIFIER.sign(raw_body)
+        is_valid = signature_matches(calculated_signature, received_signature)
+
+        log.debug(
+            "signature_verification",
+            received=received_signature,
+            calculated=calculated_signature,
+            match=is_valid,
+        )
 
         # Validasi signature
-        if received_signature != calculated_signature:
-            return jsonify({"success": False, "message": "Signature tidak valid"}), 403
-
-        # Parse JSON setelah validasi berhasil
-        callback_data = request.get_json(force=True)
-
-        # 📊 Proses data callback
-        print("\n" + "=" * 70)
-        print("✅ CALLBACK DITERIMA & VALID")
-        print("=" * 70)
-        print(f"Reference: {callback_data.get('reference')}")
-        print(f"Merchant Ref: {callback_data.get('merchant_ref')}")
-        print(f"Status: {callback_data.get('status')}")
-        print(f"Payment Method: {callback_data.get('payment_method')}")
-        print(f"Total Amount: Rp {callback_data.get('total_amount'):,}")
-        print(f"Amount Received: Rp {callback_data.get('amount_received'):,}")
-        print(f"Fee Merchant: Rp {callback_data.get('fee_merchant'):,}")
-        print(f"Paid At: {callback_data.get('paid_at')}")
-        print("=" * 70 + "\n")
-
-        # 🎯 TODO: Di sini update database, kirim email, dll
-        # Contoh:
-        # update_order_status(callback_data['merchant_ref'], 'PAID')
+        if not is_valid:
+            log.warning("invalid_signature", received=received_signature)
+            return {"success": False, "message": "Signature tidak valid"}, 403
+
+        # Parse JSON setelah validasi berhasil (langsung dari bytes)
+        callback_data = loads(raw_body)
+
+        # 🔁 Tripay bisa mengirim ulang callback yang sama
+        dedup_key = f"tripay:{callback_data.get('reference')}:{callback_data.get('status')}"
+        if get_dedup().check_and_mark(dedup_key):
+            log.info("duplicate_callback", reference=callback_data.get("reference"))
+            return {"success": True}, 200
+
+        # 📊 Proses data callback (payload lengkap hanya di level DEBUG)
+        log.info(
+            "callback_received",
+            reference=callback_data.get("reference"),
+            merchant_ref=callback_data.get("merchant_ref"),
+            status=callback_data.get("status"),
+            payment_method=callback_data.get("payment_method"),
+            total_amount=callback_data.get("total_amount"),
+            amount_received=callback_data.get("amount_received"),
+            fee_merchant=callback_data.get("fee_merchant"),
+            paid_at=callback_data.get("paid_at"),
+            payload=callback_data,
+        )
+
+        order_status = TRIPAY_ORDER_STATUS.get(callback_data.get("status"))
+        if order_status and callback_data.get("merchant_ref"):
+            update_order_status(callback_data["merchant_ref"], order_status, "tripay", callback_data.get("reference"))
+
+        # 🎯 TODO: Kirim email, dll
         # send_email_notification(callback_data['customer_email'])
 
         # ✅ Return success ke Tripay
-        return jsonify({"success": True}), 200
+        return {"success": True}, 200
 
     except Exception as e:
-        print(f"❌ Error processing callback: {str(e)}")
-        import traceback
+        log.event("callback_error", logging.ERROR, exc_info=True, error=str(e))
+        if dedup_key:
+            # Tripay akan retry karena 500, jangan sampai retry-nya dianggap duplikat
+            get_dedup().discard(dedup_key)
+        return {"success": False, "message": str(e)}, 500
+
+
+@app.route("/callback", methods=["POST"])
+def handle_callback():
+    allowed, client_ip = IP_GUARD.check(request.remote_addr, request.headers.get("X-Forwarded-For"))
+    if not allowed:
+        log.warning("ip_not_whitelisted", client_ip=client_ip)
+        return jsonify({"success": False, "message": "IP tidak diizinkan"}), 403
+
+    # 🔑 AMBIL RAW REQUEST BODY (INI YANG PENTING!) - bytes apa adanya, tanpa decode
+    raw_body = request.get_data()
+
+    # Ambil signature dari header
+    received_signature = request.headers.get("X-Callback-Signature")
 
-        traceback.print_exc()
-        return jsonify({"success": False, "message": str(e)}), 500
+    body, status_code = process_tripay_callback(raw_body, received_signature)
+    return jsonify(body), status_code
 
 
 @app.route("/health", methods=["GET"])
@@ -1,6 +1,8 @@
+from json_codec import dumps_str
 import os
+import sys
 from dotenv import load_dotenv
-import httpx
+from status_lookup import tripay_check_status
 
 load_dotenv()  # Load environment variables from .env file
 
@@ -10,6 +12,13 @@ if not apiKey:
     print("Error: TRIPAY_API_KEY environment variable tidak ditemukan")
     exit(1)
 
+# 📦 Bulk mode: python tripay_cek_status_transaksi.py references.txt [-o hasil.ndjson] ('-' = stdin)
+if len(sys.argv) > 1:
+    from bulk_status_check import run_cli
+
+    run_cli("tripay", sys.argv[1:])
+    exit(0)
+
 try:
     # Input reference dari terminal
     reference = input("Masukkan reference transaksi: ").strip()
@@ -18,15 +27,6 @@ try:
         print("Error: Reference tidak boleh kosong")
         exit(1)
 
-    payload = {"reference": reference}
-    headers = {"Authorization": "Bearer " + apiKey}
-
-    result = httpx.get(
-        url="https://tripay.co.id/api-sandbox/transaction/check-status",
-        params=payload,
-        headers=headers,
-    )
-    response = result.text
-    print(response)
+    print(dumps_str(tripay_check_status(reference)))
 except Exception as e:
     print("Request Error: " + str(e))
@@ -1,8 +1,9 @@
 from dotenv import load_dotenv
 
 load_dotenv()  # Load environment variables from .env file
+from json_codec import dumps_str
 import os
-import httpx
+from reference_cache import tripay_payment_channels
 
 apiKey = os.getenv("TRIPAY_API_KEY")
 
@@ -11,14 +12,8 @@ if not apiKey:
     exit(1)
 
 try:
-    headers = {"Authorization": "Bearer " + apiKey}
-
-    result = httpx.get(
-        url="https://tripay.co.id/api-sandbox/merchant/payment-channel",
-        params={},
-        headers=headers,
-    )
-    response = result.text
-    print(response)
+    # ⚡ Dari cache (TTL + snapshot disk), request ke Tripay hanya kalau data sudah kedaluwarsa
+    response = tripay_payment_channels()
+    print(dumps_str(response))
 except Exception as e:
     print("Request Error: " + str(e))
@@ -1,6 +1,7 @@
+from json_codec import dumps_str
 import os
 from dotenv import load_dotenv
-import httpx
+from status_lookup import tripay_transaction_detail
 
 load_dotenv()  # Load environment variables from .env file
 
@@ -18,15 +19,6 @@ try:
         print("Error: Reference tidak boleh kosong")
         exit(1)
 
-    payload = {"reference": reference}
-    headers = {"Authorization": "Bearer " + apiKey}
-
-    result = httpx.get(
-        url="https://tripay.co.id/api-sandbox/transaction/detail",
-        params=payload,
-        headers=headers,
-    )
-    response = result.text
-    print(response)
+    print(dumps_str(tripay_transaction_detail(reference)))
 except Exception as e:
     print("Request Error: " + str(e))
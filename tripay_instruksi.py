@@ -1,21 +1,14 @@
 from dotenv import load_dotenv
 
 load_dotenv()  # Load environment variables from .env file
+from json_codec import dumps_str
 import os
-import httpx
+from reference_cache import tripay_payment_instruction
 
 apiKey = os.getenv("TRIPAY_API_KEY")
 
 try:
-    payload = {"code": "QRIS2"}
-    headers = {"Authorization": "Bearer " + apiKey}
-
-    result = httpx.get(
-        url="https://tripay.co.id/api-sandbox/payment/instruction",
-        params=payload,
-        headers=headers,
-    )
-    response = result.text
-    print(response)
+    response = tripay_payment_instruction("QRIS2")
+    print(dumps_str(response))
 except Exception as e:
     print("Request Error: " + str(e))
@@ -1,6 +1,7 @@
 import os
+import sys
 from dotenv import load_dotenv
-import httpx
+from gateway_client import get_client
 
 load_dotenv()  # Load environment variables from .env file
 
@@ -10,15 +11,19 @@ if not apiKey:
     print("Error: TRIPAY_API_KEY environment variable tidak ditemukan")
     exit(1)
 
+# 📦 Export semua halaman: python tripay_list_transaksi.py -o bulan.csv.gz --since 2026-09-01 --until 2026-10-01
+if len(sys.argv) > 1:
+    from tripay_transactions import run_cli
+
+    run_cli(sys.argv[1:])
+    exit(0)
+
 try:
     payload = {"page": 1, "per_page": 25}
 
-    headers = {"Authorization": "Bearer " + apiKey}
-
-    result = httpx.get(
-        url="https://tripay.co.id/api-sandbox/merchant/transactions",
+    result = get_client("tripay").get(
+        "/merchant/transactions",
         params=payload,
-        headers=headers,
     )
     response = result.text
     print(response)
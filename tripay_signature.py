@@ -1,27 +1,41 @@
 import os
 import uuid
-import hmac
-import hashlib
-from dotenv import load_dotenv
-import httpx
+from callback_signature import HmacSha256Verifier
 
-load_dotenv()  # Load environment variables from .env file
 
-privateKey = os.getenv("TRIPAY_PRIVATE_KEY")
-merchant_code = os.getenv("TRIPAY_MERCHANT_CODE")
+class TripaySigner:
+    """HMAC-SHA256(private_key, merchant_code + merchant_ref + amount); key + merchant_code di-hash sekali"""
 
-if not privateKey or not merchant_code:
-    print("Error: TRIPAY_PRIVATE_KEY atau TRIPAY_MERCHANT_CODE tidak ditemukan")
-    exit(1)
+    __slots__ = ("_prefixed",)
 
-merchant_ref = str(uuid.uuid4())  # Generate UUID otomatis
-amount = 100000  # Ganti sesuai kebutuhan
+    def __init__(self, private_key, merchant_code):
+        self._prefixed = HmacSha256Verifier(private_key, encoding="latin-1").with_prefix(merchant_code.encode("latin-1"))
 
-# Buat signature
-signStr = "{}{}{}".format(merchant_code, merchant_ref, amount)
-signature = hmac.new(
-    bytes(privateKey, "latin-1"), bytes(signStr, "latin-1"), hashlib.sha256
-).hexdigest()
+    @classmethod
+    def from_env(cls):
+        private_key = os.getenv("TRIPAY_PRIVATE_KEY")
+        merchant_code = os.getenv("TRIPAY_MERCHANT_CODE")
+        if not private_key or not merchant_code:
+            raise ValueError("TRIPAY_PRIVATE_KEY atau TRIPAY_MERCHANT_CODE tidak ditemukan")
+        return cls(private_key, merchant_code)
 
-print(f"Merchant Ref: {merchant_ref}")
-print(f"Signature: {signature}")
+    def sign(self, merchant_ref, amount):
+        return self._prefixed.sign(f"{merchant_ref}{amount}".encode("latin-1"))
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()  # Load environment variables from .env file
+
+    try:
+        signer = TripaySigner.from_env()
+    except ValueError as e:
+        print(f"Error: {e}")
+        exit(1)
+
+    merchant_ref = str(uuid.uuid4())  # Generate UUID otomatis
+    amount = 100000  # Ganti sesuai kebutuhan
+
+    print(f"Merchant Ref: {merchant_ref}")
+    print(f"Signature: {signer.sign(merchant_ref, amount)}")
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# tripay_transactions.py - Iterasi semua halaman /merchant/transactions (prefetch concurrent) + export NDJSON / CSV(.gz)
+
+import argparse
+import csv
+import gzip
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from dotenv import load_dotenv
+from json_codec import dumps_str
+from reference_cache import tripay_get
+
+load_dotenv()
+
+# Tripay membatasi per_page maksimal 50
+PER_PAGE = int(os.getenv("TRIPAY_TRANSACTIONS_PER_PAGE", 50))
+PREFETCH_PAGES = int(os.getenv("TRIPAY_TRANSACTIONS_PREFETCH", 4))
+EXPORT_EXTENSIONS = {"priority": "batch", "flow": "transaction_export"}
+
+
+def fetch_page(page, params):
+    return tripay_get("/merchant/transactions", {**params, "page": page}, EXPORT_EXTENSIONS)
+
+
+def iter_pages(params, prefetch=PREFETCH_PAGES):
+    """Yield response per halaman; sampai `prefetch` halaman berikutnya di-fetch di background"""
+    first = fetch_page(1, params)
+    yield first
+    last_page = (first.get("pagination") or {}).get("last_page") or 1
+    if last_page <= 1:
+        return
+
+    executor = ThreadPoolExecutor(max(1, prefetch), thread_name_prefix="tripay-page")
+    pending = deque()
+    next_page = 2
+    try:
+        while next_page <= last_page and len(pending) < max(1, prefetch):
+            pending.append(executor.submit(fetch_page, next_page, params))
+            next_page += 1
+        while pending:
+            page = pending.popleft().result()
+            if next_page <= last_page:
+                pending.append(executor.submit(fetch_page, next_page, params))
+                next_page += 1
+            yield page
+    finally:
+        # Caller berhenti lebih awal (break / filter tanggal) -> halaman yang belum jalan dibatalkan
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_transactions(since=None, until=None, per_page=PER_PAGE, prefetch=PREFETCH_PAGES, **filters):
+    """Generator semua transaksi merchant, satu dict per transaksi.
+
+    since/until (unix timestamp, until eksklusif) difilter dari `created_at` karena endpoint tidak
+    punya filter tanggal; dengan sort desc iterasi berhenti begitu transaksi lebih lama dari since.
+    filters lain (status, method, merchant_ref, reference) diteruskan ke Tripay.
+    """
+    params = {"per_page": per_page, "sort": "desc", **{k: v for k, v in filters.items() if v}}
+    descending = params["sort"] == "desc"
+    previous_refs = set()
+    for page in iter_pages(params, prefetch):
+        # Transaksi baru menggeser offset -> baris yang sama bisa muncul di halaman berikutnya
+        page_refs = set()
+        for transaction in page.get("data") or []:
+            reference = transaction.get("reference")
+            page_refs.add(reference)
+            if reference in previous_refs:
+                continue
+            created_at = transaction.get("created_at") or 0
+            if since is not None and created_at < since:
+                if descending:
+                    return
+                continue
+            if until is not None and created_at >= until:
+                if not descending:
+                    return
+                continue
+            yield transaction
+        previous_refs = page_refs
+
+
+def open_output(path):
+    if path == "-":
+        return sys.stdout
+    if path.endswith(".gz"):
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+def write_ndjson(transactions, output):
+    count = 0
+    for transaction in transactions:
+        output.write(dumps_str(transaction) + "\n")
+        count += 1
+    return count
+
+
+def write_csv(transactions, output):
+    """Kolom diambil dari transaksi pertama; nilai nested (order_items, dll.) ditulis sebagai JSON"""
+    writer = None
+    count = 0
+    for transaction in transactions:
+        if writer is None:
+            writer = csv.DictWriter(output, fieldnames=list(transaction), extrasaction="ignore")
+            writer.writeheader()
+        writer.writerow(
+            {
+                key: dumps_str(value) if isinstance(value, (dict, list)) else value
+                for key, value in transaction.items()
+            }
+        )
+        count += 1
+    return count
+
+
+def parse_date(value):
+    """YYYY-MM-DD (waktu lokal) -> unix timestamp"""
+    return int(datetime.strptime(value, "%Y-%m-%d").timestamp())
+
+
+def run_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Export transaksi merchant Tripay (semua halaman)")
+    parser.add_argument("-o", "--output", default="-", help="File .ndjson / .csv (tambah .gz untuk kompres), '-' stdout")
+    parser.add_argument("--format", choices=["ndjson", "csv"], help="Default dari ekstensi output")
+    parser.add_argument("--since", help="YYYY-MM-DD (inklusif)")
+    parser.add_argument("--until", help="YYYY-MM-DD (eksklusif)")
+    parser.add_argument("--status", help="UNPAID / PAID / FAILED / EXPIRED / REFUND")
+    parser.add_argument("--method", help="Kode channel, mis. QRIS2")
+    parser.add_argument("--prefetch", type=int, default=PREFETCH_PAGES)
+    args = parser.parse_args(argv)
+
+    output_format = args.format or ("csv" if ".csv" in args.output else "ndjson")
+    transactions = iter_transactions(
+        since=parse_date(args.since) if args.since else None,
+        until=parse_date(args.until) if args.until else None,
+        prefetch=args.prefetch,
+        status=args.status,
+        method=args.method,
+    )
+    started = time.perf_counter()
+    output = open_output(args.output)
+    try:
+        count = (write_csv if output_format == "csv" else write_ndjson)(transactions, output)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    # Ringkasan ke stderr supaya stdout tetap bersih untuk pipe
+    print(f"✅ {count:,} transaksi diexport dalam {time.perf_counter() - started:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    run_cli()
@@ -1,10 +1,11 @@
 import os
+import sys
 import time
 import uuid
 import hmac
 import hashlib
 from dotenv import load_dotenv
-import httpx
+from gateway_client import get_client
 
 load_dotenv()  # Load environment variables from .env file
 
@@ -15,6 +16,13 @@ if not apiKey or not privateKey:
     print("Error: TRIPAY_API_KEY atau TRIPAY_PRIVATE_KEY tidak ditemukan")
     exit(1)
 
+# 📦 Batch mode: python tripay_transaksi.py orders.ndjson [-o hasil.ndjson] [--method BRIVA] ('-' = stdin)
+if len(sys.argv) > 1:
+    from tripay_batch import run_cli
+
+    run_cli(sys.argv[1:])
+    exit(0)
+
 
 merchant_code = os.getenv("TRIPAY_MERCHANT_CODE")
 merchant_ref = str(uuid.uuid4())  # Generate UUID otomatis
@@ -73,14 +81,8 @@ for item in order_items:
         payload["order_items[" + str(i) + "][" + str(k) + "]"] = item[k]
     i += 1
 
-headers = {"Authorization": "Bearer " + apiKey}
-
 try:
-    result = httpx.post(
-        url="https://tripay.co.id/api-sandbox/transaction/create",
-        data=payload,
-        headers=headers,
-    )
+    result = get_client("tripay").post("/transaction/create", data=payload)
     response = result.text
     print(response)
 except Exception as e:
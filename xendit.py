@@ -3,11 +3,15 @@
 
 import os
 import httpx
-import json
-import time
 from datetime import datetime
 import uuid
 from dotenv import load_dotenv
+from gateway_models import XenditPaymentRequest
+from gateway_resilience import DeadlineExceeded
+from json_codec import dumps_pretty, response_json
+from qr_render import get_qr
+from qris import validate_qris
+from xendit_payments import DEADLINE_SECONDS, HEDGE_ENABLED, create_payment_request, hedge_delay, payment_payload
 
 # Load environment variables from .env file
 load_dotenv()
@@ -17,58 +21,13 @@ def print_json_block(title: str, payload):
     print("\n" + "=" * 60)
     print(title)
     print("=" * 60)
-    print(json.dumps(payload, indent=2, ensure_ascii=False))
-
-
-def extract_urls(payload, key_path=""):
-    urls = []
-
-    if isinstance(payload, dict):
-        for key, value in payload.items():
-            next_path = f"{key_path}.{key}" if key_path else key
-            urls.extend(extract_urls(value, next_path))
-    elif isinstance(payload, list):
-        for idx, value in enumerate(payload):
-            next_path = f"{key_path}[{idx}]"
-            urls.extend(extract_urls(value, next_path))
-    elif isinstance(payload, str) and payload.startswith(("https://", "http://")):
-        urls.append((key_path, payload))
-
-    return urls
-
-
-def classify_action(action):
-    action_type = action.get("type", "-")
-    descriptor = action.get("descriptor", "-")
-    value = action.get("value")
-
-    if descriptor in ("WEB_URL", "DEEPLINK_URL"):
-        return ("redirect", action_type, descriptor, value)
-    if descriptor == "QR_STRING":
-        return ("qr_string", action_type, descriptor, value)
-    if action_type == "API_POST_REQUEST":
-        return ("api_post_request", action_type, descriptor, value)
-    return ("other", action_type, descriptor, value)
+    print(dumps_pretty(payload))
 
 
 def resolve_channel_code(raw_channel_code: str) -> str:
     return raw_channel_code.strip().upper()
 
 
-def extract_redirect_url_from_actions(actions):
-    for action in actions:
-        action_type = action.get("type")
-        descriptor = action.get("descriptor")
-        value = action.get("value")
-        if (
-            action_type == "REDIRECT_CUSTOMER"
-            and descriptor in ("WEB_URL", "DEEPLINK_URL")
-            and isinstance(value, str)
-            and value.startswith(("https://", "http://"))
-        ):
-            return value
-    return None
-
 print("=" * 60)
 print("🚀 MEMBUAT QRIS PAYMENT (UNIQUE REFERENCE)")
 print("=" * 60)
@@ -99,103 +58,51 @@ raw_channel_code = os.getenv("XENDIT_CHANNEL_CODE", "QRIS")
 channel_code = resolve_channel_code(raw_channel_code)
 request_timeout_seconds = float(os.getenv("XENDIT_REQUEST_TIMEOUT_SECONDS", "45"))
 max_retries = int(os.getenv("XENDIT_REQUEST_MAX_RETRIES", "2"))
-retry_delay_seconds = float(os.getenv("XENDIT_RETRY_DELAY_SECONDS", "1.5"))
 request_amount = int(os.getenv("XENDIT_REQUEST_AMOUNT", "500"))
+qr_output_dir = os.getenv("QR_OUTPUT_DIR", "qr_output")
 
 print(f"\n🆔 Reference ID: {reference_id}")
 print(f"🏦 Channel Code: {channel_code}")
 if raw_channel_code.strip().upper() != channel_code:
     print(f"↪️  Channel alias: {raw_channel_code} -> {channel_code}")
-print(f"⏱️  Timeout       : {request_timeout_seconds}s")
+print(f"⏱️  Timeout       : {request_timeout_seconds}s per percobaan, deadline total {DEADLINE_SECONDS}s")
 print(f"🔁 Max Retries   : {max_retries}")
+print(f"🪞 Hedged Request: {f'aktif (setelah {hedge_delay()}s)' if HEDGE_ENABLED else 'nonaktif'}")
 print(f"💸 Request Amount: Rp {request_amount:,}")
 print("📡 Mengirim request ke Xendit API...")
 
 try:
-    payload = {
-        "reference_id": reference_id,
-        "type": "PAY",
-        "country": "ID",
-        "currency": "IDR",
-        "request_amount": request_amount,
-        "capture_method": "AUTOMATIC",
-        "channel_code": channel_code,
-        "channel_properties": {
-            "success_return_url": "https://example.com/success",
-            "failure_return_url": "https://example.com/failure",
-        },
-        "description": f"Pembayaran {channel_code} {reference_id}",
-        "customer": {
-            "reference_id": f"cust_{uuid.uuid4().hex[:8]}",
-            "type": "INDIVIDUAL",
-            "individual_detail": {
-                "given_names": "John",
-                "surname": "Doe",
-                "email": "john.doe@example.com",
-                "mobile_number": "+6281234567890",
-            },
+    customer = {
+        "reference_id": f"cust_{uuid.uuid4().hex[:8]}",
+        "type": "INDIVIDUAL",
+        "individual_detail": {
+            "given_names": "John",
+            "surname": "Doe",
+            "email": "john.doe@example.com",
+            "mobile_number": "+6281234567890",
         },
     }
+    payload = payment_payload(reference_id, request_amount, channel_code, customer)
 
-    total_attempts = max_retries + 1
-    response = None
-    for attempt in range(1, total_attempts + 1):
-        try:
-            response = httpx.post(
-                "https://api.xendit.co/v3/payment_requests",
-                auth=httpx.BasicAuth(username=secret_key, password=""),
-                headers={"accept": "application/json", "api-version": "2024-11-11"},
-                json=payload,
-                timeout=request_timeout_seconds,
-            )
-            break
-        except (httpx.ReadTimeout, httpx.ConnectTimeout) as e:
-            if attempt >= total_attempts:
-                raise
-            wait_seconds = retry_delay_seconds * attempt
-            print(
-                f"\n⚠️ Timeout attempt {attempt}/{total_attempts}: {type(e).__name__}"
-            )
-            print(f"   Retry dalam {wait_seconds:.1f}s ...")
-            time.sleep(wait_seconds)
-
-    if response is None:
-        raise RuntimeError("Response kosong setelah retry")
+    # 🔁 Retry, deadline total & hedge ditangani xendit_payments / gateway_client;
+    # idempotency-key = reference_id supaya retry/hedge tidak membuat payment request ganda
+    response = create_payment_request(payload)
 
     print(f"\n✅ Status Code: {response.status_code}")
 
     if response.status_code == 201:
-        data = response.json()
-        payment_id = data["payment_request_id"]
-        status = data["status"]
-        amount = data["request_amount"]
-        actions = data.get("actions", [])
+        payment = XenditPaymentRequest.from_response(response)
+        payment_id = payment.payment_request_id
+        status = payment.status
+        amount = payment.request_amount
+        actions = payment.raw_actions
 
-        print_json_block("🔍 RAW RESPONSE XENDIT", data)
+        print_json_block("🔍 RAW RESPONSE XENDIT", payment.data)
         print_json_block("🔍 STRUKTUR ACTIONS", actions)
 
-        # Cari kandidat payment/redirect URL dari seluruh response
-        payment_url = extract_redirect_url_from_actions(actions)
-        if not payment_url:
-            payment_url = data.get("payment_url")
-        all_urls = extract_urls(data)
-        if not payment_url:
-            redirect_keywords = (
-                "actions",
-                "redirect",
-                "checkout",
-                "deeplink",
-                "payment_url",
-            )
-            for path, url in all_urls:
-                normalized_path = path.lower()
-                if "success_return_url" in normalized_path:
-                    continue
-                if "failure_return_url" in normalized_path:
-                    continue
-                if any(keyword in normalized_path for keyword in redirect_keywords):
-                    payment_url = url
-                    break
+        # Redirect action / payment_url / URL mirip redirect (action diklasifikasi sekali di model)
+        payment_url = payment.payment_url
+        all_urls = payment.urls() if not payment_url else []
 
         if payment_url:
             print(f"\n🔗 Payment URL/Redirect: {payment_url}")
@@ -207,22 +114,10 @@ try:
             print("\nℹ️ Tidak ada URL sama sekali di response.")
 
         if actions and len(actions) > 0:
-            redirects = []
-            qr_strings = []
-            api_actions = []
-            others = []
-
-            for action in actions:
-                category, action_type, descriptor, value = classify_action(action)
-                if category == "redirect":
-                    redirects.append((action_type, descriptor, value))
-                elif category == "qr_string":
-                    qr_strings.append((action_type, descriptor, value))
-                elif category == "api_post_request":
-                    api_actions.append((action_type, descriptor, value))
-                else:
-                    others.append((action_type, descriptor, value))
-
+            redirects = payment.actions.redirects
+            qr_strings = payment.actions.qr_strings
+            api_actions = payment.actions.api_posts
+            others = payment.actions.others
             print("\n" + "=" * 60)
             print("✅ PAYMENT REQUEST BERHASIL DIBUAT!")
             print("=" * 60)
@@ -237,11 +132,22 @@ try:
                     print(f"     value={value}")
 
             if qr_strings:
-                print("\n📱 QR actions (tanpa generate QR lokal):")
+                print("\n📱 QR actions:")
                 for action_type, descriptor, value in qr_strings:
                     length = len(value) if isinstance(value, str) else 0
                     print(f"   - type={action_type}, descriptor={descriptor}, len={length}")
                     print(f"     value={value}")
+                    if length:
+                        # Cek CRC & nominal QRIS sebelum ditampilkan ke customer
+                        qr_errors = validate_qris(value, amount)
+                        print(f"     qris={'valid' if not qr_errors else '; '.join(qr_errors)}")
+                        # PNG 1-bit ke QR_OUTPUT_DIR (bukan root repo); nama file = hash konten
+                        key, body = get_qr(value)
+                        os.makedirs(qr_output_dir, exist_ok=True)
+                        qr_path = os.path.join(qr_output_dir, f"qris_{key}")
+                        with open(qr_path, "wb") as f:
+                            f.write(body)
+                        print(f"     png={qr_path}")
 
             if api_actions:
                 print("\n🔌 API POST actions:")
@@ -257,19 +163,23 @@ try:
         else:
             print("\n❌ Tidak ada actions di response!")
             print("Response lengkap:")
-            print(json.dumps(data, indent=2, ensure_ascii=False))
+            print(dumps_pretty(payment.data))
 
     elif response.status_code == 409:
         print("\n❌ DUPLICATE_ERROR: Reference ID sudah dipakai")
-        print(json.dumps(response.json(), indent=2))
+        print(dumps_pretty(response_json(response)))
     else:
         print(f"\n❌ Error {response.status_code}:")
-        print(json.dumps(response.json(), indent=2))
+        print(dumps_pretty(response_json(response)))
 
+except DeadlineExceeded as e:
+    print(f"\n❌ Deadline Exceeded: {e}")
+    print(f"   Request tidak selesai dalam XENDIT_PAYMENT_DEADLINE_SECONDS={DEADLINE_SECONDS}s.")
+    print("   Ulangi dengan reference_id yang sama untuk cek hasilnya (idempotent).")
 except httpx.ReadTimeout as e:
     print(f"\n❌ Read Timeout: {e}")
     print("   Respons server terlalu lama.")
-    print("   Coba naikkan XENDIT_REQUEST_TIMEOUT_SECONDS atau ulangi request.")
+    print("   Coba naikkan XENDIT_REQUEST_TIMEOUT_SECONDS / XENDIT_PAYMENT_DEADLINE_SECONDS atau ulangi request.")
 except httpx.ConnectTimeout as e:
     print(f"\n❌ Connect Timeout: {e}")
     print("   Gagal konek ke Xendit API.")
@@ -1,5 +1,5 @@
 import os
-import httpx
+from gateway_client import get_client
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -23,10 +23,8 @@ if not secret_key:
 
 print(f"🌍 Environment: {env_label}")
 
-response = httpx.get(
-    "https://api.xendit.co/balance",
-    auth=httpx.BasicAuth(username=secret_key, password=""),
-    headers={"accept": "application/json"},
+response = get_client("xendit").get(
+    "/balance",
     params={"account_type": "CASH", "at_timestamp": "2024-01-01T00:00:00Z"},
 )
 
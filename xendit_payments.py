@@ -0,0 +1,177 @@
+# xendit_payments.py - Buat payment request Xendit dengan deadline total + hedged request opsional
+
+import os
+import threading
+import time
+from collections import deque
+from dotenv import load_dotenv
+from event_log import get_event_logger
+from gateway_client import get_async_client, get_client
+from gateway_resilience import GLOBAL_RETRY_BUDGET
+from json_codec import JSON_CONTENT_TYPE, dumps
+
+load_dotenv()
+
+log = get_event_logger("xendit")
+
+PAYMENT_REQUESTS_PATH = "/v3/payment_requests"
+
+# Batas waktu total checkout (semua percobaan + backoff), dibagi rata ke percobaan yang tersisa
+DEADLINE_SECONDS = float(os.getenv("XENDIT_PAYMENT_DEADLINE_SECONDS", 20))
+HEDGE_ENABLED = os.getenv("XENDIT_HEDGE_REQUESTS", "False").lower() == "true"
+# Delay hedge sebelum ada cukup sampel latency; setelahnya pakai p95 latency create
+HEDGE_DELAY_SECONDS = float(os.getenv("XENDIT_HEDGE_DELAY_SECONDS", 2))
+HEDGE_PERCENTILE = 0.95
+HEDGE_MIN_SAMPLES = 20
+
+
+class LatencyTracker:
+    """Latency N request terakhir yang dijawab gateway (bukan timeout/error jaringan)"""
+
+    def __init__(self, size=200):
+        self.samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, fraction):
+        with self._lock:
+            samples = sorted(self.samples)
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+CREATE_LATENCY = LatencyTracker()
+
+# Hedge jalan di satu event loop background (client async) supaya request yang kalah bisa benar-benar dibatalkan
+_hedge_loop = None
+_hedge_loop_lock = threading.Lock()
+
+
+def get_hedge_loop():
+    global _hedge_loop
+    if _hedge_loop is None:
+        with _hedge_loop_lock:
+            if _hedge_loop is None:
+                # Import lokal: jalur tanpa hedge tidak perlu memuat asyncio
+                import asyncio
+
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="xendit-hedge", daemon=True).start()
+                _hedge_loop = loop
+    return _hedge_loop
+
+
+def hedge_delay():
+    p95 = CREATE_LATENCY.percentile(HEDGE_PERCENTILE)
+    return p95 if p95 is not None else HEDGE_DELAY_SECONDS
+
+
+def is_decisive(response):
+    """Jawaban final; 409 (idempotency key sedang diproses percobaan lain), 429 dan 5xx ditunggu dulu"""
+    return response.status_code < 500 and response.status_code not in (409, 429)
+
+
+def payment_payload(reference_id, amount, channel_code="QRIS", customer=None):
+    """Body POST /v3/payment_requests (PAY, capture otomatis); customer opsional"""
+    payload = {
+        "reference_id": reference_id,
+        "type": "PAY",
+        "country": "ID",
+        "currency": "IDR",
+        "request_amount": amount,
+        "capture_method": "AUTOMATIC",
+        "channel_code": channel_code,
+        "channel_properties": {
+            "success_return_url": "https://example.com/success",
+            "failure_return_url": "https://example.com/failure",
+        },
+        "description": f"Pembayaran {channel_code} {reference_id}",
+    }
+    if customer:
+        payload["customer"] = customer
+    return payload
+
+
+def payment_request_options(payload, deadline):
+    return {
+        "content": dumps(payload),
+        # idempotency-key = reference_id: retry maupun hedge tidak membuat payment request ganda
+        "headers": {**JSON_CONTENT_TYPE, "idempotency-key": payload["reference_id"]},
+        "extensions": {"deadline": deadline, "priority": "live"},
+    }
+
+
+def send_payment_request(payload, deadline):
+    started = time.monotonic()
+    response = get_client("xendit").post(PAYMENT_REQUESTS_PATH, **payment_request_options(payload, deadline))
+    CREATE_LATENCY.add(time.monotonic() - started)
+    return response
+
+
+async def send_payment_request_async(payload, deadline):
+    started = time.monotonic()
+    response = await get_async_client("xendit").post(PAYMENT_REQUESTS_PATH, **payment_request_options(payload, deadline))
+    CREATE_LATENCY.add(time.monotonic() - started)
+    return response
+
+
+def create_payment_request(payload, deadline_seconds=DEADLINE_SECONDS, hedge=HEDGE_ENABLED):
+    """POST /v3/payment_requests selesai (atau DeadlineExceeded) dalam deadline_seconds.
+
+    Dengan hedge: kalau belum dijawab setelah delay p95, percobaan kedua dengan reference_id /
+    idempotency-key yang sama dikirim, jawaban final pertama yang dipakai dan yang lain dibatalkan.
+    """
+    if not hedge:
+        return send_payment_request(payload, time.monotonic() + deadline_seconds)
+    import asyncio
+
+    future = asyncio.run_coroutine_threadsafe(create_payment_request_async(payload, deadline_seconds, hedge), get_hedge_loop())
+    return future.result()
+
+
+async def create_payment_request_async(payload, deadline_seconds=DEADLINE_SECONDS, hedge=HEDGE_ENABLED):
+    """Versi asyncio create_payment_request (client async di event loop pemanggil)"""
+    import asyncio
+
+    deadline = time.monotonic() + deadline_seconds
+    if not hedge:
+        return await send_payment_request_async(payload, deadline)
+
+    primary = asyncio.ensure_future(send_payment_request_async(payload, deadline))
+    pending = {primary}
+    try:
+        delay = min(hedge_delay(), max(0.0, deadline - time.monotonic()))
+        done, _ = await asyncio.wait(pending, timeout=delay)
+        if done:
+            return primary.result()
+        # Hedge ikut budget retry global supaya saat Xendit lambat beban tidak otomatis jadi dua kali lipat
+        if not GLOBAL_RETRY_BUDGET.try_spend():
+            log.warning("hedge_budget_exhausted", reference_id=payload["reference_id"])
+            return await primary
+        log.info("hedge_sent", reference_id=payload["reference_id"], delay=round(delay, 3))
+
+        pending.add(asyncio.ensure_future(send_payment_request_async(payload, deadline)))
+        last_response = last_error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    response = task.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                if is_decisive(response):
+                    log.info("hedge_won" if task is not primary else "hedge_lost", reference_id=payload["reference_id"])
+                    return response
+                last_response = response
+        if last_response is not None:
+            return last_response
+        raise last_error
+    finally:
+        # Pemenang sudah ada (atau pemanggil batal/error): percobaan yang masih jalan dibatalkan, koneksinya ditutup
+        for task in pending:
+            task.cancel()
@@ -1,6 +1,6 @@
 # xendit_simulate_simple.py
 import os
-import httpx
+from gateway_client import get_client
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -26,10 +26,8 @@ print(f"🌍 Environment: {env_label}")
 
 payment_id = input("Masukkan payment_request_id (pr-...): ").strip()
 
-resp = httpx.post(
-    f"https://api.xendit.co/v3/payment_requests/{payment_id}/simulate",
-    auth=httpx.BasicAuth(secret_key, ""),
-    headers={"api-version": "2024-11-11"},
+resp = get_client("xendit").post(
+    f"/v3/payment_requests/{payment_id}/simulate",
     json={"amount": 10000},  # Sesuaikan amount
 )
 
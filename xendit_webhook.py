@@ -1,17 +1,22 @@
 #!/usr/bin/env python3
 # webhook.py - Webhook handler untuk Xendit Payment Requests V3
 
+import logging
 import os
 from flask import Flask, request, jsonify
-import hmac
-import hashlib
-import json
 from dotenv import load_dotenv
+from callback_dedup import get_dedup
+from callback_signature import HmacSha256Verifier
+from event_log import get_event_logger
+from ip_allowlist import IpGuard
+from json_codec import DECODE_ERRORS, loads
+from order_store import EXPIRED, FAILED, PAID, update_order_status
 
 # Load environment variables from .env file
 load_dotenv()
 
 app = Flask(__name__)
+log = get_event_logger("xendit")
 
 # Webhook verification token (dari Xendit Dashboard)
 WEBHOOK_TOKEN = os.getenv("XENDIT_WEBHOOK_TOKEN")
@@ -20,79 +25,99 @@ if not WEBHOOK_TOKEN:
     print("❌ Warning: XENDIT_WEBHOOK_TOKEN tidak ditemukan di environment variables!")
     print("   Pastikan file .env sudah dibuat dan berisi webhook token.")
 
+WEBHOOK_VERIFIER = HmacSha256Verifier(WEBHOOK_TOKEN) if WEBHOOK_TOKEN else None
 
-def verify_webhook_signature(payload, signature):
-    """Verify webhook signature dari Xendit"""
-    if not WEBHOOK_TOKEN:
-        print("⚠️  WEBHOOK_TOKEN not set, skipping signature verification")
-        return True
-    expected_signature = hmac.new(
-        WEBHOOK_TOKEN.encode(), payload.encode(), hashlib.sha256
-    ).hexdigest()
-    return hmac.compare_digest(expected_signature, signature)
+# IP whitelist opsional: XENDIT_IP_WHITELIST=True + XENDIT_IP_ALLOWLIST(_FILE)
+IP_GUARD = IpGuard("XENDIT")
 
 
-@app.route("/webhook/xendit", methods=["POST"])
-def handle_xendit_webhook():
-    print("\n" + "=" * 60)
-    print("📡 WEBHOOK RECEIVED")
-    print("=" * 60)
+def verify_webhook_signature(payload, signature):
+    """Verify webhook signature dari Xendit (payload = raw bytes)"""
+    if WEBHOOK_VERIFIER is None:
+        log.warning("signature_check_skipped", reason="XENDIT_WEBHOOK_TOKEN not set")
+        return True
+    return WEBHOOK_VERIFIER.verify(payload, signature)
 
-    # Get raw payload (untuk signature verification)
-    raw_payload = request.get_data(as_text=True)
-    signature = request.headers.get("x-xendit-signature")
 
-    # Verify signature (optional tapi recommended)
-    if signature:
-        if not verify_webhook_signature(raw_payload, signature):
-            print("❌ Signature verification failed!")
-            return jsonify({"error": "Invalid signature"}), 401
+def process_xendit_webhook(raw_payload, signature):
+    """Proses webhook Xendit dari raw payload (bytes) + header signature, return (body, status_code)"""
+    # Verify signature: wajib kalau XENDIT_WEBHOOK_TOKEN di-set, sebelum dedup & update order
+    if WEBHOOK_VERIFIER is not None and not signature:
+        log.warning("missing_signature")
+        return {"error": "Missing signature"}, 401
+    if not verify_webhook_signature(raw_payload, signature):
+        log.warning("invalid_signature", received=signature)
+        return {"error": "Invalid signature"}, 401
 
     # Parse JSON payload
     try:
-        data = json.loads(raw_payload)
-    except json.JSONDecodeError:
-        return jsonify({"error": "Invalid JSON"}), 400
-
-    print(f"Event: {data.get('event', 'N/A')}")
-    print(f"Data: {json.dumps(data, indent=2)}")
-
-    # Handle berdasarkan event type
-    event = data.get("event")
+        data = loads(raw_payload)
+    except DECODE_ERRORS:
+        log.warning("invalid_json", size=len(raw_payload))
+        return {"error": "Invalid JSON"}, 400
+
+    # 🔁 Xendit redeliver webhook yang sama -> cukup diproses sekali per event + payment
+    payment_data = data.get("data") or {}
+    dedup_key = None
+    if payment_data.get("id"):
+        dedup_key = f"xendit:{data.get('event')}:{payment_data['id']}"
+        if get_dedup().check_and_mark(dedup_key):
+            log.info("duplicate_webhook", webhook_event=data.get("event"), payment_id=payment_data["id"])
+            return {"status": "ok"}, 200
 
-    if event == "payment_request.succeeded":
-        print("\n✅ 💰 PAYMENT BERHASIL!")
-        payment_id = data["data"]["id"]
-        amount = data["data"]["amount"]
-        reference_id = data["data"].get("reference_id")
-
-        print(f"   Payment ID   : {payment_id}")
-        print(f"   Amount       : Rp {amount:,}")
-        print(f"   Reference ID : {reference_id}")
-
-        # 🎯 TODO: Update status di database kamu
-        # update_order_status(reference_id, "PAID")
-
-    elif event == "payment_request.failed":
-        print("\n❌ PAYMENT GAGAL!")
-        payment_id = data["data"]["id"]
-        reference_id = data["data"].get("reference_id")
+    try:
+        # Handle berdasarkan event type (payload lengkap hanya di level DEBUG)
+        event = data.get("event")
+        log.info("webhook_received", webhook_event=event, payment_id=payment_data.get("id"), payload=data)
+
+        if event == "payment_request.succeeded":
+            reference_id = data["data"].get("reference_id")
+            log.info(
+                "payment_success",
+                payment_id=data["data"]["id"],
+                amount=data["data"]["amount"],
+                reference_id=reference_id,
+            )
+            if reference_id:
+                update_order_status(reference_id, PAID, "xendit", data["data"]["id"])
+
+        elif event == "payment_request.failed":
+            reference_id = data["data"].get("reference_id")
+            log.info("payment_failed", payment_id=data["data"]["id"], reference_id=reference_id)
+            if reference_id:
+                update_order_status(reference_id, FAILED, "xendit", data["data"]["id"])
+
+        elif event == "payment_request.expired":
+            log.info("payment_expired", payment_id=payment_data.get("id"))
+            if payment_data.get("reference_id"):
+                update_order_status(payment_data["reference_id"], EXPIRED, "xendit", payment_data.get("id"))
+
+        else:
+            log.info("unhandled_event", webhook_event=event)
+    except Exception as e:
+        log.event("webhook_error", logging.ERROR, exc_info=True, error=str(e))
+        if dedup_key:
+            # Xendit redeliver kalau bukan 2xx, jangan sampai redelivery-nya dianggap duplikat
+            get_dedup().discard(dedup_key)
+        return {"error": str(e)}, 500
 
-        print(f"   Payment ID   : {payment_id}")
-        print(f"   Reference ID : {reference_id}")
+    # Return 200 OK untuk acknowledge webhook
+    return {"status": "ok"}, 200
 
-        # 🎯 TODO: Handle payment failed
-        # update_order_status(reference_id, "FAILED")
 
-    elif event == "payment_request.expired":
-        print("\n⏰ PAYMENT EXPIRED!")
-        # 🎯 TODO: Handle expired payment
+@app.route("/webhook/xendit", methods=["POST"])
+def handle_xendit_webhook():
+    allowed, client_ip = IP_GUARD.check(request.remote_addr, request.headers.get("X-Forwarded-For"))
+    if not allowed:
+        log.warning("ip_not_whitelisted", client_ip=client_ip)
+        return jsonify({"error": "Unauthorized IP"}), 403
 
-    else:
-        print(f"\nℹ️  Event lain: {event}")
+    # Get raw payload (untuk signature verification)
+    raw_payload = request.get_data()
+    signature = request.headers.get("x-xendit-signature")
 
-    # Return 200 OK untuk acknowledge webhook
-    return jsonify({"status": "ok"}), 200
+    body, status_code = process_xendit_webhook(raw_payload, signature)
+    return jsonify(body), status_code
 
 
 if __name__ == "__main__":